@@ -298,10 +298,10 @@ def get_dataframe_from_cursor(cursor, symbol_id, limit=200):
     تبدیل دیتای دیتابیس به DataFrame برای محاسبات
     """
     query = """
-        SELECT price as close, timestamp
+        SELECT price as close, ts_ms AS timestamp
         FROM rsi_data
         WHERE symbol_id = ?
-        ORDER BY timestamp DESC
+        ORDER BY ts_ms DESC
         LIMIT ?
     """
     cursor.execute(query, (symbol_id, limit))
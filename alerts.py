@@ -0,0 +1,240 @@
+"""
+ارسال هشدارها بدون بلاک کردن حلقه‌ی fetch
+
+قبلا main و همه‌ی save_signals* مستقیم winsound.Beep صدا میزدن که
+هر بار 200 تا 400 میلی‌ثانیه thread رو نگه میداشت و روی لینوکس
+اصلا import نمیشد. الان هشدار فقط توی یک صف محدود گذاشته میشه و
+یک thread جداگانه اون رو به sink ها (کنسول، فایل JSONL، webhook،
+صدا روی ویندوز) میفرسته.
+
+هشدارهای تکراری هر (نماد، نوع) یکی میشن:
+    - اگه هشدار قبلی هنوز توی صفه، فقط با هشدار جدید جایگزین میشه
+    - تا COALESCE_SECONDS بعد از ارسال، هشدار با سطح کمتر یا مساوی فرستاده نمیشه
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+import urllib.request
+from datetime import datetime
+
+import pytz
+
+try:
+    import winsound
+except ImportError:  # لینوکس / مک
+    winsound = None
+
+
+# حداکثر هشدار منتظر در صف (بیشتر از این دور ریخته میشه)
+MAX_QUEUE_SIZE = 1000
+# پنجره‌ی یکی کردن هشدارهای تکراری هر (نماد، نوع) - ثانیه
+COALESCE_SECONDS = 60
+
+ALERT_LOG_FILE = "alerts.jsonl"
+WEBHOOK_URL = os.environ.get("ALERT_WEBHOOK_URL")
+WEBHOOK_TIMEOUT = 5
+
+# سطح هشدار → (فرکانس، مدت) بوق - تعداد بوق = سطح
+SOUND_PATTERNS = {
+    1: (1200, 300),
+    2: (1600, 250),
+    3: (2000, 200),
+    4: (2200, 150),
+    5: (2400, 120),
+}
+
+tz_tehran = pytz.timezone("Asia/Tehran")
+
+
+# ─── sink ها ────────────────────────────────────────────────
+
+class ConsoleSink:
+    """چاپ یک خط خلاصه برای هر هشدار"""
+
+    def send(self, alert):
+        bells = "🔔" * alert['level']
+        repeat = f" (x{alert['count']})" if alert['count'] > 1 else ""
+        print(f"{bells} [{alert['kind']}] {alert['symbol']}: {alert['message']}{repeat}")
+
+
+class JsonlFileSink:
+    """اضافه کردن هر هشدار به صورت یک خط JSON به فایل (append-only)"""
+
+    def __init__(self, path=ALERT_LOG_FILE):
+        self.path = path
+
+    def send(self, alert):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alert, ensure_ascii=False, default=str) + "\n")
+
+
+class WebhookSink:
+    """POST کردن هشدار به صورت JSON به یک آدرس HTTP"""
+
+    def __init__(self, url, timeout=WEBHOOK_TIMEOUT):
+        self.url = url
+        self.timeout = timeout
+
+    def send(self, alert):
+        body = json.dumps(alert, ensure_ascii=False, default=str).encode("utf-8")
+        request = urllib.request.Request(
+            self.url, data=body, method="POST",
+            headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+class SoundSink:
+    """بوق روی ویندوز (همون الگوهای قبلی winsound)"""
+
+    def send(self, alert):
+        if winsound is None:
+            return
+        frequency, duration = SOUND_PATTERNS.get(alert['level'], SOUND_PATTERNS[1])
+        for _ in range(alert['level']):
+            winsound.Beep(frequency, duration)
+
+
+# ─── dispatcher ─────────────────────────────────────────────
+
+class AlertDispatcher(threading.Thread):
+    """صف محدود هشدارها + thread ارسال به sink ها"""
+
+    _STOP = object()
+
+    def __init__(self, sinks, max_queue_size=MAX_QUEUE_SIZE, coalesce_seconds=COALESCE_SECONDS):
+        super().__init__(name="alert-dispatcher", daemon=True)
+        self.sinks = list(sinks)
+        self.coalesce_seconds = coalesce_seconds
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self._pending = {}    # {(symbol, kind): alert} - هشدارهای توی صف
+        self._last_sent = {}  # {(symbol, kind): (time, level)}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        # آمار
+        self.sent = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.errors = 0
+
+    # ─── سمت producer ها (فقط یک enqueue) ──────────────────
+
+    def alert(self, symbol, kind, message, level=1, **data):
+        """
+        گذاشتن هشدار در صف - هیچوقت بلاک نمیکنه
+        خروجی: True اگه هشدار جدید در صف رفت، False اگه یکی شد یا دور ریخته شد
+        """
+        now = time.time()
+        key = (symbol, kind)
+        level = max(1, min(int(level), 5))
+        alert = {
+            'time': datetime.now(tz_tehran).strftime("%Y-%m-%d %H:%M:%S"),
+            'symbol': symbol,
+            'kind': kind,
+            'level': level,
+            'message': message,
+            'data': data,
+            'count': 1,
+        }
+
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                # هنوز ارسال نشده: آخرین مقدار جایگزین میشه
+                alert['count'] = pending['count'] + 1
+                alert['level'] = max(level, pending['level'])
+                self._pending[key] = alert
+                self.coalesced += 1
+                return False
+
+            last = self._last_sent.get(key)
+            if last is not None and now - last[0] < self.coalesce_seconds and level <= last[1]:
+                self.coalesced += 1
+                return False
+
+            try:
+                self.queue.put_nowait(key)
+            except queue.Full:
+                self.dropped += 1
+                return False
+            self._pending[key] = alert
+            return True
+
+    def stop(self, timeout=5):
+        """ارسال هشدارهای باقیمانده و بستن thread"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self.is_alive():
+            # صف ممکنه پر باشه؛ put بلاک‌کننده چون دیگه producer نداریم
+            self.queue.put(self._STOP)
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            'pending': self.queue.qsize(),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'errors': self.errors,
+        }
+
+    # ─── سمت worker ─────────────────────────────────────────
+
+    def run(self):
+        while True:
+            key = self.queue.get()
+            if key is self._STOP:
+                break
+
+            with self._lock:
+                alert = self._pending.pop(key, None)
+                if alert is None:
+                    continue
+                self._last_sent[key] = (time.time(), alert['level'])
+
+            for sink in self.sinks:
+                try:
+                    sink.send(alert)
+                except Exception as e:
+                    self.errors += 1
+                    print(f"⚠️ Alert sink error ({type(sink).__name__}): {e}")
+            self.sent += 1
+
+
+# ─── dispatcher پیش‌فرض برنامه ───────────────────────────────
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def default_sinks():
+    """کنسول + فایل JSONL + webhook (اگه ALERT_WEBHOOK_URL تنظیم شده) + صدا (ویندوز)"""
+    sinks = [ConsoleSink(), JsonlFileSink()]
+    if WEBHOOK_URL:
+        sinks.append(WebhookSink(WEBHOOK_URL))
+    if winsound is not None:
+        sinks.append(SoundSink())
+    return sinks
+
+
+def get_dispatcher():
+    """dispatcher مشترک (اولین بار ساخته و start میشه)"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = AlertDispatcher(default_sinks())
+            _dispatcher.start()
+            atexit.register(_dispatcher.stop)
+        return _dispatcher
+
+
+def send(symbol, kind, message, level=1, **data):
+    """میانبر: گذاشتن هشدار در صف dispatcher مشترک"""
+    return get_dispatcher().alert(symbol, kind, message, level, **data)
@@ -1,41 +1,49 @@
-from datetime import datetime, timezone
+from datetime import datetime
 from flask import Flask, render_template, request
 import sqlite3
+import json
 import pytz  # نصب کن: pip install pytz
 import scoring  # ✨ import کردن ماژول
+import db_connection
+import time_utils
+import rsi_rollup
+import history_store
 
 app = Flask(__name__)
 tehran_tz = pytz.timezone("Asia/Tehran")
 
-def get_data():
-    conn = sqlite3.connect("data.db")
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT * 
-        FROM market_info AS m
-        JOIN symbols AS s 
-            ON m.symbol_id = s.id
-        WHERE s.active = 1
-        ORDER BY ABS(advance_score) DESC,ABS(score) DESC, ABS(m.rsi_1m - 50) DESC
+def display_price(price, updated_ms, ticker_price, ticker_ms):
+    """قیمت snapshot (ticker_snapshot) اگه از قیمت مسیر کندل‌ها تازه‌تر باشه"""
+    if ticker_price is not None and ticker_ms and ticker_ms > (updated_ms or 0):
+        return ticker_price
+    return price
+
 
-    """)
-    rows = cursor.fetchall()
-    conn.close()
+def get_data():
+    with db_connection.readers.connection() as conn:  # فقط خواندنی (منتظر commit های fetcher نمیمونه)
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("""
+            SELECT * 
+            FROM market_info AS m
+            JOIN symbols AS s 
+                ON m.symbol_id = s.id
+            WHERE s.active = 1
+            ORDER BY ABS(advance_score) DESC,ABS(score) DESC, ABS(m.rsi_1m - 50) DESC
+
+        """)
+        rows = cursor.fetchall()
 
     
     # return rows
     
-    tz_tehran = pytz.timezone("Asia/Tehran")
-    now = datetime.now(tz_tehran)
+    now_ms = time_utils.now_ms()
     data = []
     for row in rows:
-        updated_at = row["updated_at"]
-        updated_at_dt = datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S")
-        updated_at_dt = updated_at_dt.replace(tzinfo=timezone.utc).astimezone(tz_tehran)
-        if updated_at_dt:
-            diff = now - updated_at_dt
-            minutes = diff.total_seconds() / 60
+        # updated_ms: epoch UTC (بدون strptime / pytz برای هر ردیف)
+        updated_ms = row["updated_ms"]
+        if updated_ms:
+            minutes = (now_ms - updated_ms) / time_utils.MINUTE_MS
             if minutes <= 2:
                 status = "✅"
                 color = "green"
@@ -49,14 +57,9 @@ def get_data():
             status = "⏳ بدون داده"
             color = "gray"
 
-        # فرض: updated_at به صورت ISO string (مثلا: 2025-09-24 14:22:10) در DB ذخیره شده   
-        dt_utc = datetime.strptime(updated_at, "%Y-%m-%d %H:%M:%S")  
-        dt_utc = pytz.utc.localize(dt_utc)  # به UTC تبدیل کنیم
-        dt_tehran = dt_utc.astimezone(tehran_tz)  # تبدیل به تهران
-
         data.append({
             "symbol": row["base_symbol"],
-            "price": row["price"],
+            "price": display_price(row["price"], updated_ms, row["ticker_price"], row["ticker_ms"]),
   # RSI + Trend + Change برای هر تایم‌فریم
             "rsi_1m": row["rsi_1m"],
             "rsi_trend_1m": row["rsi_trend_1m"],
@@ -76,7 +79,7 @@ def get_data():
             "price_change": row["price_change"],
             "score": row["score"],
             "advance_score": row["advance_score"],
-            "updated_at": dt_tehran.strftime("%Y-%m-%d %H:%M:%S"),
+            "updated_at": time_utils.format_ms(updated_ms),
             "status": status,
             "color": color
         })
@@ -84,15 +87,14 @@ def get_data():
     return data
 
 def get_data2():
-    conn = sqlite3.connect("data.db")
-    cursor = conn.cursor()
-    cursor.execute("""
-        SELECT symbol, price, rsi_1m, rsi_5m, rsi_15m, rsi_1h, rsi_4h, updated_at
-        FROM market_info
-        ORDER BY ABS(rsi_1m - 50) DESC
-    """)
-    rows = cursor.fetchall()
-    conn.close()
+    with db_connection.readers.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT symbol, price, rsi_1m, rsi_5m, rsi_15m, rsi_1h, rsi_4h, updated_at
+            FROM market_info
+            ORDER BY ABS(rsi_1m - 50) DESC
+        """)
+        rows = cursor.fetchall()
     return rows
 
 @app.template_filter("localtime")
@@ -123,16 +125,62 @@ def index2():
     return render_template("cryptos_show.html", data=data)
 
 
+def get_fetcher_status():
+    """وضعیت ذخیره شده‌ی fetcher ها (limiter، صف، ...) از جدول fetcher_status"""
+    with db_connection.readers.connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = sqlite3.Row
+        cursor.execute("SELECT name, data, updated_at FROM fetcher_status ORDER BY name")
+        rows = cursor.fetchall()
+
+    fetchers = []
+    for row in rows:
+        fetchers.append({
+            "name": row["name"],
+            "updated_at": row["updated_at"],
+            **json.loads(row["data"] or "{}"),
+        })
+    return fetchers
+
+
+@app.route("/status")
+def fetcher_status():
+    return render_template("fetcher_status.html", fetchers=get_fetcher_status())
+
+
 # if __name__ == "__main__":
 #     app.run(debug=True, port=5000) #called in run.py
 
 
+
+# نمودارهای صفحه‌ی نماد: {تایم‌فریم: (طول هر نقطه به دقیقه، تعداد نقطه)}
+CHART_BUCKETS = {
+    "1m": (1, 60),
+    "5m": (5, 50),
+    "15m": (15, 50),
+    "1h": (60, 50),
+    "4h": (240, 50),
+}
+
+
+def get_chart_data(cursor, symbol_id, timeframe):
+    """
+    آخرین RSI / قیمت هر بازه‌ی زمانی (یک نقطه برای هر bucket)
+    گروه‌بندی روی ts_ms (عدد صحیح UTC) و فقط در بازه‌ی نقطه‌های لازم از آخرین
+    ذخیره؛ بخش قدیمی‌تر از بازه‌ی خام از rsi_rollup خونده میشه
+    """
+    bucket_minutes, points = CHART_BUCKETS[timeframe]
+    bucket_ms = bucket_minutes * time_utils.MINUTE_MS
+    results = rsi_rollup.load_chart_series(cursor, symbol_id, timeframe, bucket_ms, points)
+    return {
+        "timestamps": [time_utils.format_ms(row[0]) for row in results],
+        "rsi_values": [row[1] for row in results],
+        "prices": [row[2] for row in results]
+    }
+
     
 @app.route("/symbol/<symbol>")
 def symbol_detail(symbol):
-    conn = sqlite3.connect("data.db")
-    cursor = conn.cursor()
-
     query = """
         SELECT 
             symbol_id,
@@ -149,28 +197,34 @@ def symbol_detail(symbol):
             m.rsi_4h, m.rsi_trend_4h, m.rsi_change_4h,
             m.price_change,
             m.score, m.advance_score,
-            m.updated_at
+            m.updated_at, m.updated_ms,
+            m.ticker_price, m.ticker_ms
         FROM market_info AS m
         JOIN symbols AS s 
             ON m.symbol_id = s.id
         WHERE s.base_symbol = ?
     """
-    cursor.execute(query, (symbol.upper(),))
-    row = cursor.fetchone()
-    # conn.close()
+    with db_connection.readers.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (symbol.upper(),))
+        row = cursor.fetchone()
+        columns = [desc[0] for desc in cursor.description]
+
+        # گرفتن داده‌های نمودار برای هر تایم‌فریم
+        chart_data = {}
+        if row:
+            symbol_id = row[0]
+            for timeframe in CHART_BUCKETS:
+                chart_data[timeframe] = get_chart_data(cursor, symbol_id, timeframe)
 
     if not row:
         return f"<h3>🚫 اطلاعاتی برای {symbol} یافت نشد.</h3>"
 
-    columns = [desc[0] for desc in cursor.description]
     data = dict(zip(columns, row))
-    if data["updated_at"]:
-        # تبدیل رشته به datetime
-        dt_utc = datetime.strptime(data["updated_at"], "%Y-%m-%d %H:%M:%S")
-        # منطقه زمانی تهران
-        tz_tehran = pytz.timezone("Asia/Tehran")
-        dt_tehran = pytz.utc.localize(dt_utc).astimezone(tz_tehran)
-        data["updated_at"] = dt_tehran.strftime("%Y-%m-%d %H:%M:%S")
+    data["price"] = display_price(data["price"], data["updated_ms"], data["ticker_price"], data["ticker_ms"])
+    if data["updated_ms"]:
+        # epoch UTC → وقت تهران
+        data["updated_at"] = time_utils.format_ms(data["updated_ms"])
 
         # 🔹 بررسی مقدار تغییر قیمت و فرمت آن
     price_change = data.get("price_change")
@@ -195,158 +249,6 @@ def symbol_detail(symbol):
         data['score_class'] = css_class
         data['score_description'] = scoring.get_score_description(data['advance_score'])
     
-    symbol_id = data['symbol_id']
-    
-    # گرفتن داده‌های نمودار برای هر تایم‌فریم
-    chart_data = {}
-    # timeframes = ["1m", "5m", "15m", "1h", "4h"]
-    
-    # 🔹 فقط 1m با کوئری جدید
-    query_1m = """
-        SELECT 
-            timestamp,
-            rsi,
-            price
-        FROM rsi_data
-        WHERE symbol_id = ? 
-            AND timeframe = '1m'
-            AND id IN (
-                SELECT MAX(id)
-                FROM rsi_data
-                WHERE symbol_id = ? AND timeframe = '1m'
-                GROUP BY 
-                    strftime('%Y-%m-%d %H', timestamp),
-                    CAST(strftime('%M', timestamp) AS INTEGER) / 1
-            )
-        ORDER BY timestamp DESC
-        LIMIT 60
-    """
-    
-    cursor.execute(query_1m, (symbol_id, symbol_id))
-    results_1m = cursor.fetchall()
-    
-    results_1m.reverse()  # از قدیم به جدید
-    chart_data['1m'] = {
-        "timestamps": [row[0] for row in results_1m],
-        "rsi_values": [row[1] for row in results_1m],
-        "prices": [row[2] for row in results_1m]
-    }
-    # 🔹 5m - هر 5 دقیقه یه نقطه
-    query_5m = """
-        SELECT 
-            timestamp,
-            rsi,
-            price
-        FROM rsi_data
-        WHERE symbol_id = ? 
-            AND timeframe = '5m'
-            AND id IN (
-                SELECT MAX(id)
-                FROM rsi_data
-                WHERE symbol_id = ? AND timeframe = '5m'
-                GROUP BY 
-                    strftime('%Y-%m-%d %H', timestamp),
-                    CAST(strftime('%M', timestamp) AS INTEGER) / 5
-            )
-        ORDER BY timestamp DESC
-        LIMIT 50
-    """
-    cursor.execute(query_5m, (symbol_id, symbol_id))
-    results_5m = cursor.fetchall()
-    results_5m.reverse()  # از قدیم به جدید
-
-    chart_data['5m'] = {
-        "timestamps": [row[0] for row in results_5m],
-        "rsi_values": [row[1] for row in results_5m],
-        "prices": [row[2] for row in results_5m]
-    }
-
-    # 🔹 15m - هر 15 دقیقه یه نقطه
-    query_15m = """
-        SELECT 
-            timestamp,
-            rsi,
-            price
-        FROM rsi_data
-        WHERE symbol_id = ? 
-            AND timeframe = '15m'
-            AND id IN (
-                SELECT MAX(id)
-                FROM rsi_data
-                WHERE symbol_id = ? AND timeframe = '15m'
-                GROUP BY 
-                    strftime('%Y-%m-%d %H', timestamp),
-                    CAST(strftime('%M', timestamp) AS INTEGER) / 15
-            )
-        ORDER BY timestamp DESC
-        LIMIT 50
-    """
-    cursor.execute(query_15m, (symbol_id, symbol_id))
-    results_15m = cursor.fetchall()
-    results_15m.reverse()  # از قدیم به جدید
-    chart_data['15m'] = {
-        "timestamps": [row[0] for row in results_15m],
-        "rsi_values": [row[1] for row in results_15m],
-        "prices": [row[2] for row in results_15m]
-    }
-
-    # 🔹 1h - هر 1 ساعت یه نقطه
-    query_1h = """
-        SELECT 
-            timestamp,
-            rsi,
-            price
-        FROM rsi_data
-        WHERE symbol_id = ? 
-            AND timeframe = '1h'
-            AND id IN (
-                SELECT MAX(id)
-                FROM rsi_data
-                WHERE symbol_id = ? AND timeframe = '1h'
-                GROUP BY 
-                    strftime('%Y-%m-%d %H', timestamp)
-            )
-        ORDER BY timestamp DESC
-        LIMIT 50
-    """
-    cursor.execute(query_1h, (symbol_id, symbol_id))
-    results_1h = cursor.fetchall()
-    results_1h.reverse()  # از قدیم به جدید
-    chart_data['1h'] = {
-        "timestamps": [row[0] for row in results_1h],
-        "rsi_values": [row[1] for row in results_1h],
-        "prices": [row[2] for row in results_1h]
-    }
-    # 🔹 4h - هر 4 ساعت یه نقطه
-    query_4h = """
-        SELECT 
-            timestamp,
-            rsi,
-            price
-        FROM rsi_data
-        WHERE symbol_id = ? 
-            AND timeframe = '4h'
-            AND id IN (
-                SELECT MAX(id)
-                FROM rsi_data
-                WHERE symbol_id = ? AND timeframe = '4h'
-                GROUP BY 
-                    strftime('%Y-%m-%d', timestamp),
-                    CAST(strftime('%H', timestamp) AS INTEGER) / 4
-            )
-        ORDER BY timestamp DESC
-        LIMIT 50
-    """
-    cursor.execute(query_4h, (symbol_id, symbol_id))
-    results_4h = cursor.fetchall()
-    results_4h.reverse()  # از قدیم به جدید
-    chart_data['4h'] = {
-        "timestamps": [row[0] for row in results_4h],
-        "rsi_values": [row[1] for row in results_4h],
-        "prices": [row[2] for row in results_4h]
-    }
-    
-    conn.close()
     return render_template("symbol_detail.html", data=data, chart_data=chart_data)
 
 
@@ -359,8 +261,6 @@ def show_signals(symbol_name=None):
     نمایش سیگنال‌ها
     اگر symbol داده شود، فقط همان ارز فیلتر می‌شود.
     """
-    conn = sqlite3.connect("data.db")
-    cursor = conn.cursor()
     strong_only = request.args.get('best')
     score = request.args.get('score')
     quality = request.args.get('quality')
@@ -381,7 +281,7 @@ def show_signals(symbol_name=None):
     s.time,
     s.signal_type, sym.base_symbol ,
     s.quality,  s.convergence_count ,s.testmode
-            FROM signals s
+            FROM {signals} s
             LEFT JOIN symbols sym ON s.symbol_id = sym.id
             WHERE 1=1     """
     params = []  # اصلاح: استفاده از list به جای tuple
@@ -402,8 +302,8 @@ def show_signals(symbol_name=None):
         params.extend([price_trend])
 
     if mode:
-        base_query += " AND (s.testmode Like %?%)"
-        params.extend([mode])
+        base_query += " AND (s.testmode LIKE ?)"
+        params.extend([f"%{mode}%"])
 
     if strong_only and strong_only.isdigit():
         if strong_only == '2':
@@ -413,10 +313,11 @@ def show_signals(symbol_name=None):
         else :
             base_query += " AND (s.advance_score >= 40 OR s.advance_score <= -40)"
 
-    base_query += " ORDER BY time DESC LIMIT 100"
-    cursor.execute(base_query, params)
-    rows = cursor.fetchall()
-    conn.close()
+    # اگه سیگنال‌های data.db کمتر از 100 تاست بقیه از فایل‌های history/ میاد
+    base_query += " ORDER BY s.time_ms DESC LIMIT ?"
+    with db_connection.readers.connection() as conn:
+        cursor = conn.cursor()
+        rows = history_store.execute_ordered(cursor, base_query, 100, params)
 
 
     return render_template("crypto_signal.html", data=rows, symbol_name=symbol_name)
@@ -0,0 +1,240 @@
+"""
+fetcher ناهمزمان (asyncio) برای گرفتن کندل‌ها
+
+به جای اینکه نمادها و تایم‌فریم‌ها یکی‌یکی با sleep گرفته بشن،
+همه‌ی job های سررسید شده‌ی زمان‌بند (main.job_scheduler) با هم فرستاده میشن
+و فقط تعداد درخواست‌های همزمان روی هر صرافی محدود میشه (Semaphore)
++ limiter مشترک (rate_limiter).
+
+ذخیره در rsi_data / market_info و امتیازدهی دقیقا همون توابع main.py هستن.
+این مرحله (process_symbol) روی thread جدای persist_executor اجرا میشه، چون
+writer.flush و امتیازدهی v3 تا v7 بلاک‌کننده‌ان (با RemoteWriter ـه sharded
+تا 30 ثانیه) و نباید بقیه‌ی درخواست‌ها یا WebSocket ها رو نگه دارن.
+یک thread کافیه (و لازمه): state های RSI مال همین یک thread هستن؛ خوندن‌های
+main.cursor در هر thread روی connection خواننده‌ی خود همون thread انجام میشن.
+
+اجرا:
+    python async_fetcher.py
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+import ccxt.async_support as ccxt_async
+import exchanges
+import main
+import ohlcv_store
+import resampler
+import ticker_snapshot
+
+
+# حداکثر درخواست همزمان روی هر صرافی
+MAX_CONCURRENT_REQUESTS = 8
+
+# thread ذخیره و امتیازدهی (ترتیب نمادها حفظ میشه)
+persist_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="persist")
+
+
+def read_cursor():
+    """cursor خوندن سمت event loop (connection خواننده‌ی همین thread)"""
+    return main.cursor
+
+
+def create_async_exchange():
+    """
+    ساخت کلاینت async صرافی همین fetcher (main.EXCHANGE_ID) پشت limiter مشترک
+    بازارها از کش دیسکی main.exchange خونده میشن (دانلود دوباره نمیشه)
+    """
+    exchange = exchanges.create_exchange(main.EXCHANGE_ID, asynchronous=True)
+    exchanges.start_market_cache(exchange, refresh=False)
+    return exchange
+
+
+async def fetch_bars(exchange, semaphore, symbol_id, SYMBOL, TIMEFRAME):
+    """
+    گرفتن کندل‌های جدید یک تایم‌فریم با رعایت محدودیت همزمانی
+    (فقط کندل‌های بعد از آخرین کندل ذخیره شده در ohlcv)
+    """
+    since = ohlcv_store.get_fetch_since(read_cursor(), symbol_id, TIMEFRAME, now_ms=exchange.milliseconds())
+    async with semaphore:
+        if since is None:
+            return await exchange.fetch_ohlcv(SYMBOL, timeframe=TIMEFRAME, limit=ohlcv_store.CANDLE_LIMIT)
+        return await exchange.fetch_ohlcv(SYMBOL, timeframe=TIMEFRAME, since=since)
+
+
+async def fetch_symbol(exchange, semaphore, symbol_id, SYMBOL, timeframes):
+    """
+    گرفتن تایم‌فریم‌های سررسید شده‌ی یک نماد به صورت همزمان
+    تایم‌فریم‌هایی که از 1m قابل ساختن فقط since شون برگردونده میشه
+    خروجی: (symbol_id, SYMBOL, {timeframe: کندل‌های جدید یا Exception}, {timeframe: since})
+    """
+    resample_since = {}
+    remote_timeframes = []
+    for tf in timeframes:
+        since = None
+        if tf in resampler.RESAMPLED_TIMEFRAMES:
+            since = resampler.get_resample_since(read_cursor(), symbol_id, tf, exchange.milliseconds())
+        if since is None:
+            remote_timeframes.append(tf)
+        else:
+            resample_since[tf] = since
+
+    results = await asyncio.gather(
+        *(fetch_bars(exchange, semaphore, symbol_id, SYMBOL, tf) for tf in remote_timeframes),
+        return_exceptions=True
+    )
+    return symbol_id, SYMBOL, dict(zip(remote_timeframes, results)), resample_since
+
+
+def process_symbol(symbol_id, SYMBOL, bars_by_timeframe, resample_since, exchange_now_ms=None):
+    """
+    ذخیره‌ی نتایج یک نماد با همون مسیر حلقه‌ی همزمان
+    (ترتیب تایم‌فریم‌ها مثل main.TIMEFRAMES حفظ میشه)
+    exchange_now_ms: زمان صرافی برای تشخیص کندل باز کندل‌های گرفته شده
+    بلاک‌کننده‌ست (flush + امتیازدهی): از event loop با run_persist صدا زده بشه
+    """
+    prev_price = main.get_last_price(symbol_id)
+
+    # اول کندل‌های گرفته شده ذخیره میشن و یک flush برای کل نماد
+    # (کندل‌های 1m همین دور باید قبل از resample توی دیتابیس باشن)
+    for TIMEFRAME, bars in bars_by_timeframe.items():
+        if bars is not None and not isinstance(bars, Exception):
+            ohlcv_store.save_candles(main.cursor, symbol_id, TIMEFRAME, bars)
+    if resample_since:
+        main.writer.flush()
+
+    rsi_values = {}
+    rsi_trends = {}
+    rsi_changes = {}
+    last_price = None
+
+    for TIMEFRAME in main.TIMEFRAMES:
+        now_ms = exchange_now_ms
+        if TIMEFRAME in resample_since:
+            bars, now_ms = resampler.resample_from_store(
+                main.cursor, symbol_id, TIMEFRAME, resample_since[TIMEFRAME]
+            )
+        else:
+            bars = bars_by_timeframe.get(TIMEFRAME)
+            if bars is None:
+                continue
+            if isinstance(bars, Exception):
+                print(f"⚠️ Error fetching {SYMBOL} {TIMEFRAME}:", bars)
+                continue
+
+        result = main.save_timeframe_data(symbol_id, SYMBOL, TIMEFRAME, bars, prev_price, now_ms)
+        if result is None:
+            continue
+        last_price, last_rsi, direction, rsi_change = result
+        rsi_values[TIMEFRAME] = last_rsi
+        rsi_trends[TIMEFRAME] = direction
+        rsi_changes[TIMEFRAME] = rsi_change
+
+    if rsi_values:
+        main.save_symbol_scores(symbol_id, SYMBOL, last_price, rsi_values, rsi_trends, rsi_changes)
+
+
+async def run_persist(func, *args):
+    """اجرای func (مثلا process_symbol) روی persist_executor بدون بلاک کردن event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(persist_executor, func, *args)
+
+
+async def run_due_jobs(exchange, semaphore, jobs):
+    """
+    اجرای همه‌ی job های سررسید شده (خروجی job_scheduler.pop_due) به صورت همزمان
+    هر نمادی که کندل‌هاش زودتر رسید، زودتر ذخیره و امتیازدهی میشه
+    نمادهایی که breaker شون بازه درخواست نمیزنن و تایم‌فریم‌های ناموفق
+    به صف retry (main.defer_failed_job) میرن
+    """
+    jobs = [job for job in jobs if main.allow_job(job[0], job[2])]
+    tasks = [
+        asyncio.create_task(fetch_symbol(exchange, semaphore, symbol_id, SYMBOL, timeframes))
+        for symbol_id, SYMBOL, timeframes in jobs
+    ]
+
+    countreq = 0
+    failed = {}  # {symbol_id: تایم‌فریم‌هایی که درخواستشون خطای صرافی داد}
+    for task in asyncio.as_completed(tasks):
+        try:
+            symbol_id, SYMBOL, bars_by_timeframe, resample_since = await task
+            countreq += len(bars_by_timeframe)
+            errors = [
+                (tf, bars) for tf, bars in bars_by_timeframe.items()
+                if isinstance(bars, ccxt_async.BaseError)
+            ]
+            if errors:
+                failed[symbol_id] = [tf for tf, error in errors]
+                main.defer_failed_job(symbol_id, SYMBOL, failed[symbol_id], errors[0][1])
+            else:
+                main.breakers.record_success(symbol_id)
+            await run_persist(process_symbol, symbol_id, SYMBOL, bars_by_timeframe, resample_since, exchange.milliseconds())
+        except Exception as e:
+            print("⚠️ Error:", e)
+
+    for symbol_id, SYMBOL, timeframes in jobs:
+        retrying = failed.get(symbol_id, ())
+        main.job_scheduler.reschedule(symbol_id, [tf for tf in timeframes if tf not in retrying])
+
+    return countreq
+
+
+async def run_ticker_stage(exchange, symbols):
+    """snapshot قیمت همه‌ی نمادهای فعال با یک fetch_tickers"""
+    main.last_ticker_time = time.time()
+    try:
+        count = await ticker_snapshot.fetch_ticker_snapshot_async(exchange, main.cursor, symbols)
+        print(f"💹 ticker snapshot : {count} prices updated")
+    except Exception as e:
+        print("⚠️ Ticker error:", e)
+
+
+async def run_fetcher_loop_async(get_symbols=None, get_ticker_symbols=None):
+    """
+    حلقه‌ی اصلی fetcher ناهمزمان (بیدار شدن با زمان‌بند کندل‌ها)
+    get_symbols: منبع نمادها (پیش‌فرض main.get_active_symbols؛ worker های
+    sharded_fetcher فقط shard خودشون رو برمیگردونن)
+    get_ticker_symbols: نمادهای snapshot قیمت (پیش‌فرض همون نمادها)
+    """
+    if get_symbols is None:
+        get_symbols = main.get_active_symbols
+    exchange = create_async_exchange()
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    countreq = 0
+    main.load_last_save_index()
+    try:
+        while True:
+            symbols = get_symbols()
+            main.job_scheduler.sync_symbols(symbols, main.last_save_index.get_symbol)
+            main.screener.sync_symbols(symbols)
+            main.breakers.sync_symbols(symbols)
+            main.adaptive_polling.rebalance([symbol[0] for symbol in symbols])
+
+            if main.seconds_until_ticker() == 0:
+                ticker_symbols = symbols if get_ticker_symbols is None else get_ticker_symbols()
+                if ticker_symbols:
+                    await run_ticker_stage(exchange, ticker_symbols)
+                else:
+                    main.last_ticker_time = time.time()
+
+            jobs = main.job_scheduler.pop_due()
+            if not jobs:
+                # heartbeat حتی وقتی کاری نیست (multi_exchange سلامت worker رو از fetcher_status میخونه)
+                main.save_fetcher_status()
+                await asyncio.sleep(main.get_idle_sleep())
+                continue
+
+            countreq += await run_due_jobs(exchange, semaphore, jobs)
+            main.print_scheduler_stats(countreq)
+    finally:
+        await exchange.close()
+
+
+def run_fetcher_loop(get_symbols=None, get_ticker_symbols=None):
+    """نقطه‌ی ورود همزمان (برای thread در run.py)"""
+    asyncio.run(run_fetcher_loop_async(get_symbols, get_ticker_symbols))
+
+
+if __name__ == "__main__":
+    main.start_market_cache()
+    run_fetcher_loop()
@@ -0,0 +1,308 @@
+"""
+ضبط و پخش دوباره‌ی جواب‌های صرافی (cassette)
+
+RecordingExchange دور exchange واقعی (main / async_fetcher / get_symbols)
+قرار میگیره و جواب هر fetch_ohlcv / fetch_tickers / load_markets رو با
+کلید (method, symbol, timeframe, since) توی یک فایل cassette می‌نویسه.
+ReplayingExchange بعدا همون جواب‌ها رو به همون ترتیب و بایت به بایت
+برمیگردونه (بدون شبکه)، پس اجرای دوباره‌ی یک باگ امتیازدهی یا مقایسه‌ی
+کارایی قطعیه. خطاهای ccxt هم ضبط و دوباره raise میشن و زمان صرافی
+(milliseconds) هم زمان ضبط هر جوابه.
+
+فرمت فایل (append-only، بعد از crash هم خونده میشه):
+    [طول header][طول payload][header JSON][payload فشرده با zlib] ...
+موقع پخش فایل mmap میشه و payload مستقیم از حافظه‌ی map شده
+(memoryview بدون کپی) decompress میشه.
+
+فعال کردن با متغیر محیطی:
+    CASSETTE_MODE=record|replay  CASSETTE_DIR=cassettes/
+"""
+
+import asyncio
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+import ccxt
+
+
+CASSETTE_MODE = os.environ.get("CASSETTE_MODE")  # "record" | "replay" | None
+CASSETTE_DIR = os.environ.get("CASSETTE_DIR", "cassettes")
+COMPRESS_LEVEL = 6
+
+_LENGTHS = struct.Struct(">II")
+
+
+class CassetteMiss(ccxt.ExchangeError):
+    """درخواستی که توی cassette ضبط نشده"""
+
+
+def make_key(method, symbol=None, timeframe=None, since=None):
+    return json.dumps([method, symbol, timeframe, since])
+
+
+def tickers_symbol(symbols):
+    """کلید لیست نمادهای fetch_tickers (لیست بلند → hash کوتاه)"""
+    if symbols is None:
+        return None
+    joined = ",".join(sorted(symbols))
+    if len(joined) <= 64:
+        return joined
+    return "sha1:" + hashlib.sha1(joined.encode("utf-8")).hexdigest()[:16]
+
+
+def cassette_path(exchange_id, directory=CASSETTE_DIR):
+    return os.path.join(directory, f"{exchange_id}.cassette")
+
+
+# ─── فایل cassette ──────────────────────────────────────────
+
+class CassetteWriter:
+    """
+    اضافه کردن جواب‌ها به فایل cassette
+    هر رکورد با یک write روی فایل O_APPEND نوشته میشه، پس چند exchange /
+    پردازه (main + async_fetcher، worker های sharded) میتونن روی یک فایل ضبط کنن
+    """
+
+    def __init__(self, path, level=COMPRESS_LEVEL):
+        self.path = path
+        self.level = level
+        self.file = None  # اولین رکورد فایل رو باز میکنه
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def record(self, key, t, response=None, error=None):
+        if error is not None:
+            header = {'key': key, 't': t, 'error': type(error).__name__}
+            raw = str(error).encode("utf-8")
+        else:
+            header = {'key': key, 't': t}
+            raw = json.dumps(response, separators=(",", ":"), default=str).encode("utf-8")
+        header_bytes = json.dumps(header).encode("utf-8")
+        payload = zlib.compress(raw, self.level)
+        record = _LENGTHS.pack(len(header_bytes), len(payload)) + header_bytes + payload
+        with self._lock:
+            if self.file is None:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                self.file = open(self.path, "ab", buffering=0)
+            self.file.write(record)
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+
+class Cassette:
+    """خوندن cassette با mmap؛ هر کلید صف جواب‌های خودش رو داره"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}    # {key: [(t, error_name, memoryview payload)]}
+        self.positions = {}  # {key: index جواب بعدی}
+        self.first_time = None
+        self._lock = threading.Lock()
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if self._map is not None:
+            self._index(memoryview(self._map), size)
+
+    def _index(self, view, size):
+        offset = 0
+        while offset + _LENGTHS.size <= size:
+            header_len, payload_len = _LENGTHS.unpack_from(view, offset)
+            start = offset + _LENGTHS.size
+            end = start + header_len + payload_len
+            if end > size:
+                break  # آخرین رکورد نصفه نوشته شده (crash موقع ضبط)
+            header = json.loads(bytes(view[start:start + header_len]))
+            payload = view[start + header_len:end]
+            self.entries.setdefault(header['key'], []).append((header['t'], header.get('error'), payload))
+            if self.first_time is None:
+                self.first_time = header['t']
+            offset = end
+
+    def play(self, key):
+        """
+        جواب بعدی یک کلید: (t, error_name, bytes)
+        وقتی جواب‌های ضبط شده‌ی کلید تموم بشه آخری تکرار میشه
+        """
+        with self._lock:
+            entries = self.entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"cassette: no recorded response for {key}")
+            index = self.positions.get(key, 0)
+            self.positions[key] = index + 1
+            t, error_name, payload = entries[min(index, len(entries) - 1)]
+        return t, error_name, zlib.decompress(payload)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.entries.values())
+
+
+# ─── proxy ضبط ──────────────────────────────────────────────
+
+class RecordingExchange:
+    """exchange واقعی + ضبط همه‌ی جواب‌ها"""
+
+    def __init__(self, exchange, writer):
+        self._exchange = exchange
+        self.writer = writer
+        self._markets_recorded = False
+
+    @property
+    def enableRateLimit(self):
+        return self._exchange.enableRateLimit
+
+    @enableRateLimit.setter
+    def enableRateLimit(self, value):
+        # LimitedExchange این رو خاموش میکنه؛ باید به exchange واقعی برسه
+        self._exchange.enableRateLimit = value
+
+    def _cached_markets(self):
+        """
+        بازارهای از قبل لود شده (مثلا از market_cache) یک بار ضبط میشن
+        تا load_markets موقع پخش هم جواب داشته باشه
+        """
+        if not self._markets_recorded:
+            self.writer.record(make_key("load_markets"), self._exchange.milliseconds(), self._exchange.markets)
+            self._markets_recorded = True
+        return self._exchange.markets
+
+    def _record(self, key, func, *args, **kwargs):
+        try:
+            response = func(*args, **kwargs)
+        except ccxt.BaseError as e:
+            self.writer.record(key, self._exchange.milliseconds(), error=e)
+            raise
+        self.writer.record(key, self._exchange.milliseconds(), response)
+        return response
+
+    def load_markets(self, reload=False, params={}):
+        if self._exchange.markets and not reload:
+            return self._cached_markets()
+        self._markets_recorded = True
+        return self._record(make_key("load_markets"), self._exchange.load_markets, reload, params)
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        key = make_key("fetch_ohlcv", symbol, timeframe, since)
+        return self._record(key, self._exchange.fetch_ohlcv, symbol, timeframe, since, limit, params)
+
+    def fetch_tickers(self, symbols=None, params={}):
+        key = make_key("fetch_tickers", tickers_symbol(symbols))
+        return self._record(key, self._exchange.fetch_tickers, symbols, params)
+
+    def __getattr__(self, name):
+        return getattr(self._exchange, name)
+
+
+class AsyncRecordingExchange(RecordingExchange):
+    """همون RecordingExchange برای ccxt.async_support"""
+
+    async def _record(self, key, func, *args, **kwargs):
+        try:
+            response = await func(*args, **kwargs)
+        except ccxt.BaseError as e:
+            self.writer.record(key, self._exchange.milliseconds(), error=e)
+            raise
+        self.writer.record(key, self._exchange.milliseconds(), response)
+        return response
+
+    async def load_markets(self, reload=False, params={}):
+        if self._exchange.markets and not reload:
+            return self._cached_markets()
+        self._markets_recorded = True
+        return await self._record(make_key("load_markets"), self._exchange.load_markets, reload, params)
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        key = make_key("fetch_ohlcv", symbol, timeframe, since)
+        return await self._record(key, self._exchange.fetch_ohlcv, symbol, timeframe, since, limit, params)
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        key = make_key("fetch_tickers", tickers_symbol(symbols))
+        return await self._record(key, self._exchange.fetch_tickers, symbols, params)
+
+
+# ─── proxy پخش ──────────────────────────────────────────────
+
+class ReplayingExchange:
+    """جواب‌ها فقط از cassette (بدون شبکه)؛ ساعت صرافی = زمان ضبط آخرین جواب"""
+
+    def __init__(self, cassette, exchange_id):
+        self.cassette = cassette
+        self.id = exchange_id
+        self.markets = None
+        self.enableRateLimit = False
+        self._now = cassette.first_time or 0
+
+    def milliseconds(self):
+        return self._now
+
+    def _play(self, key):
+        t, error_name, raw = self.cassette.play(key)
+        self._now = t
+        if error_name:
+            error_type = getattr(ccxt, error_name, ccxt.ExchangeError)
+            raise error_type(raw.decode("utf-8"))
+        return json.loads(raw)
+
+    def load_markets(self, reload=False, params={}):
+        if self.markets and not reload:
+            return self.markets
+        self.markets = self._play(make_key("load_markets"))
+        return self.markets
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        return self._play(make_key("fetch_ohlcv", symbol, timeframe, since))
+
+    def fetch_tickers(self, symbols=None, params={}):
+        return self._play(make_key("fetch_tickers", tickers_symbol(symbols)))
+
+    def close(self):
+        pass
+
+
+class AsyncReplayingExchange(ReplayingExchange):
+    """همون ReplayingExchange با رابط async"""
+
+    async def load_markets(self, reload=False, params={}):
+        await asyncio.sleep(0)
+        return ReplayingExchange.load_markets(self, reload, params)
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params={}):
+        await asyncio.sleep(0)
+        return ReplayingExchange.fetch_ohlcv(self, symbol, timeframe, since, limit, params)
+
+    async def fetch_tickers(self, symbols=None, params={}):
+        await asyncio.sleep(0)
+        return ReplayingExchange.fetch_tickers(self, symbols, params)
+
+    async def close(self):
+        pass
+
+
+def wrap(exchange, asynchronous=False, mode=CASSETTE_MODE, directory=CASSETTE_DIR):
+    """
+    پوشوندن exchange بر اساس CASSETTE_MODE
+    None → خود exchange | record → ضبط | replay → پخش از cassette
+    """
+    if not mode:
+        return exchange
+    path = cassette_path(exchange.id, directory)
+    if mode == "record":
+        print(f"⏺️ recording exchange responses : {path}")
+        recorder = AsyncRecordingExchange if asynchronous else RecordingExchange
+        return recorder(exchange, CassetteWriter(path))
+    if mode == "replay":
+        cassette = Cassette(path)
+        print(f"⏯️ replaying exchange responses : {path} ({len(cassette)} responses)")
+        player = AsyncReplayingExchange if asynchronous else ReplayingExchange
+        return player(cassette, exchange.id)
+    raise ValueError(f"unknown CASSETTE_MODE: {mode}")
@@ -0,0 +1,188 @@
+"""
+circuit breaker برای هر نماد + صف retry با تاخیر
+
+قبلا هر خطای fetch یک نماد فقط چاپ میشد و نماد سر نوبت بعدی دوباره
+درخواست میزد؛ نماد حذف شده از صرافی یا نماد اشتباه (مثلا future_symbol
+با tab اضافه) هر دور درخواست و زمان هدر میداد.
+
+حالت هر نماد:
+    closed    : عادی
+    open      : بعد از FAILURE_THRESHOLD خطای پشت سر هم (یا خطای دائمی مثل
+                BadSymbol)؛ هیچ درخواستی تا زمان probe زده نمیشه
+    half_open : بعد از open_seconds یک درخواست آزمایشی؛ موفق → closed،
+                ناموفق → دوباره open با فاصله‌ی دو برابر (تا MAX_OPEN_SECONDS)
+
+job های ناموفق به جای نوبت عادی با تاخیر RETRY_DELAYS دوباره توی
+زمان‌بند (job_scheduler.defer) قرار میگیرن، پس بقیه‌ی نمادها منتظرشون
+نمیمونن. خطاهای rate limit تقصیر نماد نیستن و شمرده نمیشن (فقط retry).
+"""
+
+import threading
+import time
+
+import ccxt
+
+import rate_limiter
+
+
+# تعداد خطای پشت سر هم تا باز شدن breaker
+FAILURE_THRESHOLD = 3
+# فاصله‌ی اولین probe بعد از باز شدن (ثانیه) و سقف آن بعد از probe های ناموفق
+OPEN_SECONDS = 5 * 60
+MAX_OPEN_SECONDS = 60 * 60
+# تاخیر retry بعد از خطای اول، دوم، ... (ثانیه)
+RETRY_DELAYS = [5, 20, 60]
+# خطاهایی که با تکرار درست نمیشن (breaker فوری باز میشه)
+PERMANENT_ERRORS = (ccxt.BadSymbol,)
+# حداکثر نمادهای باز که در وضعیت نشون داده میشن
+MAX_REPORTED = 20
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class SymbolBreakers:
+    """وضعیت circuit breaker همه‌ی نمادها"""
+
+    def __init__(self, threshold=FAILURE_THRESHOLD, open_seconds=OPEN_SECONDS):
+        self.threshold = threshold
+        self.open_seconds = open_seconds
+        self.states = {}  # {symbol_id: dict وضعیت} - فقط نمادهایی که خطا داشتن
+        self.last_success = {}  # {symbol_id: epoch آخرین fetch موفق}
+        self._lock = threading.Lock()
+
+        # آمار
+        self.failures = 0
+        self.retries = 0
+        self.skipped = 0
+        self.opened = 0
+
+    def _state(self, symbol_id, SYMBOL):
+        return self.states.setdefault(symbol_id, {
+            'symbol': SYMBOL,
+            'state': CLOSED,
+            'failures': 0,
+            'open_seconds': self.open_seconds,
+            'retry_at': 0.0,
+            'probing': False,
+            'error': None,
+        })
+
+    def allow(self, symbol_id, now=None):
+        """
+        اجازه‌ی درخواست برای نماد
+        open بعد از رسیدن زمان probe به half_open میره و فقط یک درخواست رد میشه
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            state = self.states.get(symbol_id)
+            if state is None or state['state'] == CLOSED:
+                return True
+            if state['probing'] or now < state['retry_at']:
+                self.skipped += 1
+                return False
+            state['state'] = HALF_OPEN
+            state['probing'] = True
+            return True
+
+    def retry_at(self, symbol_id):
+        """زمان (epoch) اجازه‌ی درخواست بعدی نماد"""
+        with self._lock:
+            state = self.states.get(symbol_id)
+            return state['retry_at'] if state else 0.0
+
+    def record_success(self, symbol_id):
+        with self._lock:
+            self.last_success[symbol_id] = time.time()
+            state = self.states.pop(symbol_id, None)
+        if state and state['state'] != CLOSED:
+            print(f"✅ circuit closed : {state['symbol']}")
+
+    def record_failure(self, symbol_id, SYMBOL, error, now=None):
+        """
+        ثبت خطای fetch نماد
+        خروجی: زمان (epoch) retry برای job های ناموفق
+        """
+        if now is None:
+            now = time.time()
+        with self._lock:
+            state = self._state(symbol_id, SYMBOL)
+            state['probing'] = False
+            state['error'] = f"{type(error).__name__}: {error}"[:200]
+
+            if isinstance(error, rate_limiter.RATE_LIMIT_ERRORS):
+                # تقصیر نماد نیست؛ limiter خودش backoff میکنه
+                self.retries += 1
+                return now + RETRY_DELAYS[0]
+
+            self.failures += 1
+            state['failures'] += 1
+            if state['state'] == HALF_OPEN:
+                state['open_seconds'] = min(state['open_seconds'] * 2, MAX_OPEN_SECONDS)
+                opening = True
+            else:
+                opening = state['failures'] >= self.threshold or isinstance(error, PERMANENT_ERRORS)
+
+            if opening:
+                if state['state'] != OPEN:
+                    self.opened += 1
+                state['state'] = OPEN
+                state['retry_at'] = now + state['open_seconds']
+                print(f"🔌 circuit open : {SYMBOL} ({state['failures']} failures) "
+                      f"- probe in {state['open_seconds']}s | {state['error']}")
+            else:
+                self.retries += 1
+                state['retry_at'] = now + RETRY_DELAYS[min(state['failures'], len(RETRY_DELAYS)) - 1]
+            return state['retry_at']
+
+    def sync_symbols(self, symbols):
+        """حذف وضعیت نمادهایی که دیگه فعال نیستن"""
+        active = {symbol[0] for symbol in symbols}
+        with self._lock:
+            for symbol_id in list(self.states):
+                if symbol_id not in active:
+                    del self.states[symbol_id]
+            for symbol_id in list(self.last_success):
+                if symbol_id not in active:
+                    del self.last_success[symbol_id]
+
+    def snapshot(self):
+        """{symbol_id: (آخرین fetch موفق, وضعیت, آخرین خطا)} - برای گزارش تازگی هر صرافی"""
+        with self._lock:
+            result = {symbol_id: (t, CLOSED, None) for symbol_id, t in self.last_success.items()}
+            for symbol_id, state in self.states.items():
+                result[symbol_id] = (self.last_success.get(symbol_id), state['state'], state['error'])
+            return result
+
+    def stats(self, now=None):
+        if now is None:
+            now = time.time()
+        with self._lock:
+            counts = {CLOSED: 0, OPEN: 0, HALF_OPEN: 0}
+            for state in self.states.values():
+                counts[state['state']] += 1
+            broken = sorted(
+                (s for s in self.states.values() if s['state'] != CLOSED),
+                key=lambda s: s['retry_at']
+            )[:MAX_REPORTED]
+            return {
+                'open': counts[OPEN],
+                'half_open': counts[HALF_OPEN],
+                'failing': counts[CLOSED],
+                'failures': self.failures,
+                'retries': self.retries,
+                'skipped': self.skipped,
+                'opened': self.opened,
+                'symbols': [
+                    {
+                        'symbol': s['symbol'],
+                        'state': s['state'],
+                        'failures': s['failures'],
+                        'retry_in': round(max(s['retry_at'] - now, 0.0)),
+                        'error': s['error'],
+                    }
+                    for s in broken
+                ],
+            }
@@ -0,0 +1,152 @@
+"""
+ساخت connection های دیتابیس (WAL + یک writer + pool خواننده‌ها)
+
+قبلا دیتابیس در حالت rollback journal بود (data.db-journal): هر commit
+fetcher کل فایل رو برای خواننده‌ها قفل میکرد و صفحه‌های داشبورد یا
+tracker_runner با "database is locked" منتظر میموندن.
+
+در حالت WAL نوشتن‌ها به فایل data.db-wal اضافه میشن و خواننده‌ها همزمان
+آخرین snapshot commit شده رو میخونن، پس خوندن هیچوقت منتظر نوشتن نمیمونه
+(فقط نوشتن‌ها پشت هم صف میشن).
+
+    connect_writer : connection نوشتن (thread نویسنده‌ی DBWriter، db_setup،
+                     tracker_runner، get_symbols)
+    connect_reader : connection فقط خواندنی (mode=ro + query_only)
+    readers        : pool خواننده‌ها برای درخواست‌های Flask و کوئری‌های کوتاه
+
+journal_mode=WAL روی خود فایل ذخیره میشه؛ اولین connection هر پردازه
+(prepare_database) اون رو فعال میکنه.
+"""
+
+import contextlib
+import os
+import queue
+import sqlite3
+import threading
+
+
+# دیتابیس اصلی (داشبورد و fetcher های واقعی)
+LIVE_DB_NAME = "data.db"
+# DB_PATH: دیتابیس جدا برای replay / benchmark (مثلا یک کپی از data.db)
+DB_NAME = os.environ.get("DB_PATH", LIVE_DB_NAME)
+
+# در WAL با NORMAL فقط commit های آخر موقع قطع برق ممکنه از دست برن (فایل خراب نمیشه)
+SYNCHRONOUS = "NORMAL"
+# حافظه‌ی cache هر connection (کیلوبایت)
+CACHE_SIZE_KB = 64 * 1024
+# بخشی از فایل که با mmap خونده میشه (بایت)
+MMAP_SIZE = 256 * 1024 * 1024
+# حداکثر انتظار برای قفل نوشتن (ثانیه)
+BUSY_TIMEOUT = 10
+# حداکثر تعداد connection های pool خواننده‌ها
+READ_POOL_SIZE = 8
+
+_prepared = set()
+_prepare_lock = threading.Lock()
+
+
+def is_live_database(db_name=DB_NAME):
+    """آیا db_name همون data.db اصلیه؟ (مسیر نسبی / لینک هم چک میشه)"""
+    if os.path.exists(db_name) and os.path.exists(LIVE_DB_NAME):
+        return os.path.samefile(db_name, LIVE_DB_NAME)
+    return os.path.abspath(db_name) == os.path.abspath(LIVE_DB_NAME)
+
+
+def apply_pragmas(conn):
+    """تنظیمات کارایی هر connection (روی فایل ذخیره نمیشن)"""
+    conn.execute(f"PRAGMA synchronous = {SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
+
+def enable_wal(conn):
+    mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+    if mode.lower() != "wal":
+        # مثلا فایل روی network file system یا قفل شده توسط پردازه‌ی دیگه
+        print(f"⚠️ SQLite journal mode is {mode} (WAL not enabled)")
+    return mode
+
+
+def prepare_database(db_name=DB_NAME):
+    """ساخت فایل (اگه نیست) و فعال کردن WAL - یک بار برای هر پردازه"""
+    with _prepare_lock:
+        if db_name in _prepared:
+            return
+        conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT)
+        try:
+            enable_wal(conn)
+        finally:
+            conn.close()
+        _prepared.add(db_name)
+
+
+def connect_writer(db_name=DB_NAME, check_same_thread=True):
+    """connection نوشتن با WAL و pragma های کارایی"""
+    conn = sqlite3.connect(db_name, timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread)
+    with _prepare_lock:
+        enable_wal(conn)
+        _prepared.add(db_name)
+    return apply_pragmas(conn)
+
+
+def connect_reader(db_name=DB_NAME, check_same_thread=True):
+    """connection فقط خواندنی؛ هیچ قفل نوشتنی نمیگیره"""
+    prepare_database(db_name)
+    conn = sqlite3.connect(
+        f"file:{db_name}?mode=ro", uri=True,
+        timeout=BUSY_TIMEOUT, check_same_thread=check_same_thread
+    )
+    conn.execute("PRAGMA query_only = ON")
+    return apply_pragmas(conn)
+
+
+class ReaderPool:
+    """
+    pool connection های فقط خواندنی (قابل استفاده در thread های مختلف)
+    connection ها موقع نیاز ساخته میشن و بعد از هر استفاده به pool برمیگردن.
+    اگه همه در حال استفاده باشن connection جدید ساخته میشه (صبر نمیکنه)
+    و بیشتر از size تا connection بیکار نگه داشته نمیشه؛ پس connection ای
+    که بعد از خطا برنگشته pool رو قفل نمیکنه.
+    """
+
+    def __init__(self, db_name=DB_NAME, size=READ_POOL_SIZE):
+        self.db_name = db_name
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self.created = 0
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            self.created += 1
+            return connect_reader(self.db_name, check_same_thread=False)
+
+    def release(self, conn):
+        conn.row_factory = None
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            conn.close()
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        with readers.connection() as conn: ...
+        (با خطا هم connection به pool برمیگرده؛ row_factory رو روی cursor
+        بذارید نه روی connection مشترک)
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        return {'size': self.size, 'created': self.created, 'idle': self._idle.qsize()}
+
+
+# pool مشترک پردازه برای data.db
+readers = ReaderPool()
@@ -1,9 +1,211 @@
-import sqlite3
+import db_connection
+import time_utils
+
+DB_NAME = db_connection.DB_NAME
+
+
+# ─── migration ها ───────────────────────────────────────────
+# هر تغییر schema یک مرحله‌ی جدید با شماره‌ی بزرگ‌تر به ته MIGRATIONS اضافه
+# میشه؛ مراحل اجرا شده هیچوقت عوض یا حذف نمیشن (فقط رو به جلو).
+# شماره‌ی آخرین مرحله‌ی اجرا شده در جدول schema_version ثبت میشه.
+
+def add_column(cursor, table, column, definition):
+    """اضافه کردن ستون اگه نیست (دیتابیس‌های قبل از schema_version بعضی ستون‌ها رو دارن)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if column not in [col[1] for col in cursor.fetchall()]:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def migration_1_columns(cursor):
+    """ستون‌هایی که قبلا با زنجیره‌ی PRAGMA table_info / ALTER TABLE اضافه میشدن"""
+    market_info_columns = [
+        ("price_change", "REAL DEFAULT 0"),
+        ("score", "REAL DEFAULT 0"),
+        ("rsi_trend_1m", "TEXT"),
+        ("rsi_trend_5m", "TEXT"),
+        ("rsi_trend_15m", "TEXT"),
+        ("rsi_trend_1h", "TEXT"),
+        ("rsi_trend_4h", "TEXT"),
+        ("rsi_change_1m", "REAL"),
+        ("rsi_change_5m", "REAL"),
+        ("rsi_change_15m", "REAL"),
+        ("rsi_change_1h", "REAL"),
+        ("rsi_change_4h", "REAL"),
+        ("advance_score", "REAL"),
+        ("volume_24h", "REAL"),  # حجم 24 ساعته (USDT) از fetch_tickers
+    ]
+    for column, definition in market_info_columns:
+        add_column(cursor, "market_info", column, definition)
+
+    add_column(cursor, "rsi_data", "rsi_trend", "TEXT")    # 'up', 'down', 'neutral'
+    add_column(cursor, "rsi_data", "rsi_change", "REAL")   # مقدار تغییر
+    add_column(cursor, "rsi_data", "volume", "REAL")
+
+    add_column(cursor, "signals", "quality", "INTEGER")
+    add_column(cursor, "signals", "convergence_count", "INTEGER")
+    add_column(cursor, "signals", "price_trend", "TEXT")
+    add_column(cursor, "signals", "testmode", "TEXT")
+
+
+def migration_2_rsi_data_indexes(cursor):
+    """
+    ایندکس‌های ترکیبی covering روی rsi_data (قبلا هیچ ایندکسی نداشت و هر
+    کوئری یک نماد کل جدول رو اسکن میکرد):
+        - (symbol_id, timeframe, timestamp, rsi, price): نمودارهای symbol_detail
+          و MAX(timestamp) هر (نماد، تایم‌فریم) در save_index
+        - (symbol_id, timestamp, price, volume): آخرین قیمت‌ها / حجم‌های یک نماد
+          (calculate_price_trend_*، get_dataframe_from_cursor، analyze_patterns،
+          analyze_statistical) و بازه‌ی زمانی get_price_at_time
+        - (timestamp): بازه‌ی اخیر همه‌ی نمادها (rsi_history.load)
+    """
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_rsi_data_symbol_tf_time
+        ON rsi_data(symbol_id, timeframe, timestamp, rsi, price)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_rsi_data_symbol_time
+        ON rsi_data(symbol_id, timestamp, price, volume)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rsi_data_time ON rsi_data(timestamp)")
+
+
+def migration_3_epoch_ms(cursor):
+    """
+    ستون‌های زمان عددی (epoch میلی‌ثانیه UTC) کنار ستون‌های متنی + پر کردن
+    ردیف‌های قبلی و جایگزینی ایندکس‌های migration 2 با نسخه‌ی ts_ms
+        rsi_data.timestamp    : وقت تهران بدون منطقه → - TEHRAN_OFFSET_MS
+        signals.time          : متن با منطقه ("+03:30") خودش UTC میشه؛ متن‌های
+                                قدیمی بدون منطقه وقت تهران حساب میشن
+        market_info.updated_at: UTC
+    """
+    add_column(cursor, "rsi_data", "ts_ms", "INTEGER")
+    add_column(cursor, "signals", "time_ms", "INTEGER")
+    add_column(cursor, "market_info", "updated_ms", "INTEGER")
+
+    cursor.execute(f"""
+        UPDATE rsi_data
+        SET ts_ms = {time_utils.sql_text_to_ms("timestamp", time_utils.TEHRAN_OFFSET_MS)}
+        WHERE ts_ms IS NULL AND timestamp IS NOT NULL
+    """)
+    cursor.execute(f"""
+        UPDATE signals
+        SET time_ms = CASE
+            WHEN substr(time, -6, 1) IN ('+', '-') THEN {time_utils.sql_text_to_ms("time")}
+            ELSE {time_utils.sql_text_to_ms("time", time_utils.TEHRAN_OFFSET_MS)}
+        END
+        WHERE time_ms IS NULL AND time IS NOT NULL
+    """)
+    cursor.execute(f"""
+        UPDATE market_info
+        SET updated_ms = {time_utils.sql_text_to_ms("updated_at")}
+        WHERE updated_ms IS NULL AND updated_at IS NOT NULL
+    """)
+
+    # کوئری‌ها الان روی ts_ms مرتب / فیلتر میشن
+    cursor.execute("DROP INDEX IF EXISTS idx_rsi_data_symbol_tf_time")
+    cursor.execute("DROP INDEX IF EXISTS idx_rsi_data_symbol_time")
+    cursor.execute("DROP INDEX IF EXISTS idx_rsi_data_time")
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_rsi_data_symbol_tf_ts
+        ON rsi_data(symbol_id, timeframe, ts_ms, rsi, price)
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_rsi_data_symbol_ts
+        ON rsi_data(symbol_id, ts_ms, price, volume)
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rsi_data_ts ON rsi_data(ts_ms)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_signals_time_ms ON signals(time_ms)")
+
+
+def migration_4_rsi_rollup(cursor):
+    """جدول خلاصه‌ی rsi_data های قدیمی (rsi_rollup.py)"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rsi_rollup (
+        symbol_id INTEGER NOT NULL,
+        timeframe TEXT NOT NULL,
+        bucket_ms INTEGER NOT NULL,    -- شروع bucket (epoch ms UTC)
+        rsi_last REAL,
+        rsi_min REAL,
+        rsi_max REAL,
+        price_open REAL,
+        price_high REAL,
+        price_low REAL,
+        price_close REAL,
+        volume REAL,
+        samples INTEGER,
+        PRIMARY KEY (symbol_id, timeframe, bucket_ms)
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_rsi_rollup_symbol_bucket
+        ON rsi_rollup(symbol_id, bucket_ms, price_close)
+    """)
+
+
+def migration_5_ticker_columns(cursor):
+    """ستون‌های جدای snapshot قیمت (ticker_snapshot) - updated_ms فقط مال مسیر RSI"""
+    add_column(cursor, "market_info", "ticker_price", "REAL")
+    add_column(cursor, "market_info", "ticker_ms", "INTEGER")
+
+
+def migration_6_rsi_rollup_bucket_index(cursor):
+    """MIN(bucket_ms) برای انتقال و router ـه history_store بدون اسکن کل جدول"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rsi_rollup_bucket ON rsi_rollup(bucket_ms)")
+
+
+MIGRATIONS = [
+    (1, "market_info / rsi_data / signals columns", migration_1_columns),
+    (2, "rsi_data covering indexes", migration_2_rsi_data_indexes),
+    (3, "epoch ms UTC time columns", migration_3_epoch_ms),
+    (4, "rsi_rollup table", migration_4_rsi_rollup),
+    (5, "market_info ticker columns", migration_5_ticker_columns),
+    (6, "rsi_rollup bucket index", migration_6_rsi_rollup_bucket_index),
+]
+
+
+def get_schema_version(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        description TEXT,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cursor.fetchone()[0]
+
+
+def run_migrations(conn, migrations=MIGRATIONS):
+    """
+    اجرای مراحلی که هنوز اجرا نشدن، به ترتیب و هر کدوم در یک تراکنش
+    (اگه مرحله‌ای خطا بده همون مرحله rollback میشه و بقیه اجرا نمیشن)
+    خروجی: تعداد مراحل اجرا شده
+    """
+    cursor = conn.cursor()
+    current = get_schema_version(cursor)
+    conn.commit()
+    applied = 0
+    for version, description, migrate in migrations:
+        if version <= current:
+            continue
+        print(f"🛠️ migration {version} : {description}")
+        cursor.execute("BEGIN")
+        try:
+            migrate(cursor)
+            cursor.execute(
+                "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                (version, description)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied += 1
+    return applied
 
-DB_NAME = "data.db"
 
 def create_tables():
-    conn = sqlite3.connect(DB_NAME)
+    conn = db_connection.connect_writer(DB_NAME)
     cursor = conn.cursor()
 
     # جدول گزارش (تمام دیتا)
@@ -37,6 +239,73 @@ def create_tables():
     """)
 
     
+    # جدول کندل‌ها (OHLCV) - برای fetch افزایشی با since
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ohlcv (
+        symbol_id INTEGER NOT NULL,
+        timeframe TEXT NOT NULL,
+        open_time INTEGER NOT NULL,  -- میلی‌ثانیه UTC (همون خروجی ccxt)
+        open REAL,
+        high REAL,
+        low REAL,
+        close REAL,
+        volume REAL,
+        PRIMARY KEY (symbol_id, timeframe, open_time),
+        FOREIGN KEY (symbol_id) REFERENCES symbols(id)
+    ) WITHOUT ROWID
+    """)
+
+    # state موتور RSI افزایشی (Wilder) برای هر نماد و تایم‌فریم
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rsi_state (
+        symbol_id INTEGER NOT NULL,
+        timeframe TEXT NOT NULL,
+        window INTEGER NOT NULL,
+        avg_gain REAL,
+        avg_loss REAL,
+        last_close REAL,
+        last_open_time INTEGER,  -- open_time آخرین کندل بسته شده (ms)
+        count INTEGER DEFAULT 0,
+        PRIMARY KEY (symbol_id, timeframe),
+        FOREIGN KEY (symbol_id) REFERENCES symbols(id)
+    )
+    """)
+
+    # وضعیت هر fetcher (limiter، صف، ...) برای نمایش در وب - data به صورت JSON
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS fetcher_status (
+        name TEXT PRIMARY KEY,
+        data TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    # نگاشت هر نماد (base_symbol) به بازار فیوچر USDT روی هر صرافی
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS symbol_markets (
+        symbol_id INTEGER NOT NULL,
+        exchange TEXT NOT NULL,        -- مثل bitget
+        market_symbol TEXT NOT NULL,   -- نماد ccxt مثل BTC/USDT:USDT
+        market_id TEXT,                -- id صرافی مثل BTCUSDT
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (symbol_id, exchange),
+        FOREIGN KEY (symbol_id) REFERENCES symbols(id)
+    )
+    """)
+
+    # تازگی دیتای هر نماد روی هر صرافی (برای انتخاب صرافی در multi_exchange)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS venue_status (
+        symbol_id INTEGER NOT NULL,
+        exchange TEXT NOT NULL,
+        last_success REAL,             -- epoch ثانیه آخرین fetch موفق
+        state TEXT,                    -- وضعیت circuit breaker
+        last_error TEXT,
+        updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (symbol_id, exchange)
+    )
+    """)
+
     # جدول ارزها (دینامیک)
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS symbols (
@@ -62,48 +331,6 @@ def create_tables():
     )
     """)
 
-    # بررسی وجود ستون price_change قبل از اضافه کردن
-    cursor.execute("PRAGMA table_info(market_info)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if "price_change" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN price_change REAL DEFAULT 0")
-    if "score" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN score REAL DEFAULT 0")
-    if "rsi_trend_1m" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_trend_1m TEXT")
-    if "rsi_trend_5m" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_trend_5m TEXT")
-    if "rsi_trend_15m" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_trend_15m TEXT")
-    if "rsi_trend_1h" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_trend_1h TEXT")
-    if "rsi_trend_4h" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_trend_4h TEXT")
-    
-    if "rsi_change_1m" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_change_1m REAL")
-    if "rsi_change_5m" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_change_5m REAL")
-    if "rsi_change_15m" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_change_15m REAL")
-    if "rsi_change_1h" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_change_1h REAL")
-    if "rsi_change_4h" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN rsi_change_4h REAL")
-    if "advance_score" not in columns:
-        cursor.execute("ALTER TABLE market_info ADD COLUMN advance_score REAL")
-    
-
-    # بررسی وجود ستون price_change قبل از اضافه کردن
-    cursor.execute("PRAGMA table_info(rsi_data)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if "rsi_trend" not in columns:
-        cursor.execute("ALTER TABLE rsi_data ADD COLUMN rsi_trend TEXT; -- 'up', 'down', 'neutral'")
-    if "rsi_change" not in columns:
-        cursor.execute("ALTER TABLE rsi_data ADD COLUMN rsi_change REAL; -- مقدار تغییر")
-    if "volume" not in columns:
-        cursor.execute("ALTER TABLE rsi_data ADD COLUMN volume REAL;")
-
     cursor.execute("SELECT COUNT(*) FROM symbols")
     count = cursor.fetchone()[0]
 
@@ -148,19 +375,11 @@ def create_tables():
     cursor.execute("""CREATE INDEX IF NOT EXISTS idx_signals_symbol_id ON signals(symbol_id);  """)
 
     cursor.execute("""CREATE INDEX IF NOT EXISTS idx_signals_score ON signals(advance_score);     """)
-    cursor.execute("PRAGMA table_info(signals)")
-    columns = [col[1] for col in cursor.fetchall()]
-    if "quality" not in columns:
-        cursor.execute("ALTER TABLE signals ADD COLUMN quality INTEGER")
-    if "convergence_count" not in columns:
-        cursor.execute("ALTER TABLE signals ADD COLUMN convergence_count INTEGER")
-    if "price_trend" not in columns:
-        cursor.execute("ALTER TABLE signals ADD COLUMN price_trend TEXT")
-    if "testmode" not in columns:
-        cursor.execute("ALTER TABLE signals ADD COLUMN testmode TEXT")
-
     conn.commit()
 
+    # تغییرات schema بعد از جدول‌های پایه (ستون‌ها، ایندکس‌ها، ...)
+    run_migrations(conn)
+
     conn.close()
 
 if __name__ == "__main__":
@@ -0,0 +1,250 @@
+"""
+thread نویسنده‌ی واحد دیتابیس (single writer)
+
+به جای اینکه fetcher و scoring بعد از هر تایم‌فریم/نماد commit کنن،
+همه‌ی دستورهای نوشتن (INSERT / UPDATE / ...) توی یک صف میرن و یک
+thread جداگانه اونا رو دسته‌ای (executemany) و در یک تراکنش برای هر
+دسته یا بازه‌ی زمانی می‌نویسه. پس تعداد fsync ها خیلی کمتر میشه و
+تاخیر دیتابیس از حلقه‌ی fetch بیرون میره.
+
+WriterCursor جای cursor معمولی استفاده میشه: خوندن‌ها مستقیم روی یک
+connection خواننده‌ی مخصوص همون thread (از db_connection.readers)،
+نوشتن‌ها توی صف writer. پس توابع scoring بدون تغییر کار میکنن.
+
+کارهای نگهداری (rsi_rollup، history_store) هم با call روی همین thread
+اجرا میشن تا پردازه فقط یک connection نوشتن داشته باشه.
+"""
+
+import queue
+import threading
+import time
+
+import db_connection
+
+
+# حداکثر تعداد دستور در هر تراکنش
+BATCH_SIZE = 1000
+# حداکثر زمان نگه داشتن دستورها قبل از نوشتن (ثانیه)
+FLUSH_INTERVAL = 0.5
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE", "REPLACE")
+
+
+def is_write_statement(sql):
+    """آیا دستور SQL از نوع نوشتنه؟"""
+    parts = sql.lstrip().split(None, 1)
+    return bool(parts) and parts[0].upper() in WRITE_STATEMENTS
+
+
+class WriterCall:
+    """یک تابع که روی thread نویسنده با connection خودش اجرا میشه (DBWriter.call)"""
+
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def run(self, conn):
+        try:
+            self.result = self.func(conn, *self.args)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+
+class DBWriter(threading.Thread):
+    """thread نویسنده: (sql, params) از صف → executemany در یک تراکنش"""
+
+    _STOP = object()
+
+    def __init__(self, db_name, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL):
+        super().__init__(name="db-writer", daemon=True)
+        self.db_name = db_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self._stopped = threading.Event()
+
+        # آمار
+        self.rows_written = 0
+        self.batches_written = 0
+        self.errors = 0
+
+    # ─── سمت producer ها ────────────────────────────────────
+
+    def put(self, sql, params=()):
+        """اضافه کردن یک دستور به صف"""
+        self.queue.put((sql, tuple(params)))
+
+    def put_many(self, sql, seq_of_params):
+        """اضافه کردن چند ردیف با یک دستور"""
+        for params in seq_of_params:
+            self.queue.put((sql, tuple(params)))
+
+    def flush(self, timeout=None):
+        """صبر تا همه‌ی دستورهای فعلی صف نوشته بشن"""
+        if not self.is_alive():
+            return
+        done = threading.Event()
+        self.queue.put(done)
+        done.wait(timeout)
+
+    def call(self, func, *args):
+        """
+        اجرای func(conn, *args) روی thread نویسنده بعد از دستورهای فعلی صف
+        (مثلا یک مرحله‌ی rsi_rollup / history_store) و برگردوندن خروجیش
+        بین دو call دسته‌های صف نوشته میشن؛ پس هر مرحله باید کوتاه باشه
+        """
+        if not self.is_alive():
+            raise RuntimeError("db writer is not running")
+        job = WriterCall(func, args)
+        self.queue.put(job)
+        job.done.wait()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
+    def stop(self, timeout=10):
+        """نوشتن همه‌ی دستورهای باقیمانده و بستن thread (flush-on-shutdown)"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self.is_alive():
+            self.queue.put(self._STOP)
+            self.join(timeout)
+
+    def stats(self):
+        return {
+            'pending': self.queue.qsize(),
+            'rows_written': self.rows_written,
+            'batches_written': self.batches_written,
+            'errors': self.errors,
+        }
+
+    # ─── سمت writer ─────────────────────────────────────────
+
+    def connect(self):
+        """connection مخصوص thread نویسنده (WAL)"""
+        return db_connection.connect_writer(self.db_name)
+
+    def run(self):
+        conn = self.connect()
+        try:
+            running = True
+            while running:
+                batch = []
+                markers = []
+                calls = []
+                item = self.queue.get()
+                deadline = time.time() + self.flush_interval
+
+                while True:
+                    if item is self._STOP:
+                        running = False
+                        break
+                    if isinstance(item, threading.Event):
+                        markers.append(item)
+                        break
+                    if isinstance(item, WriterCall):
+                        calls.append(item)
+                        break
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    timeout = deadline - time.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = self.queue.get(timeout=timeout)
+                    except queue.Empty:
+                        break
+
+                if batch:
+                    self._write_batch(conn, batch)
+                for call in calls:
+                    call.run(conn)
+                for marker in markers:
+                    marker.set()
+        finally:
+            if conn is not None:
+                conn.close()
+
+    def _write_batch(self, conn, batch):
+        """
+        نوشتن یک دسته در یک تراکنش
+        دستورهای پشت سر هم با SQL یکسان با executemany نوشته میشن
+        (ترتیب دستورها حفظ میشه)
+        """
+        groups = []
+        for sql, params in batch:
+            if groups and groups[-1][0] == sql:
+                groups[-1][1].append(params)
+            else:
+                groups.append((sql, [params]))
+
+        try:
+            with conn:
+                for sql, rows in groups:
+                    conn.executemany(sql, rows)
+        except Exception as e:
+            # اگه یک ردیف خراب باشه کل دسته رد نشه: تک‌تک
+            print(f"⚠️ DB writer batch error: {e} - retrying row by row")
+            for sql, rows in groups:
+                for params in rows:
+                    try:
+                        with conn:
+                            conn.execute(sql, params)
+                    except Exception as row_error:
+                        self.errors += 1
+                        print(f"⚠️ DB writer error: {row_error} | {sql.split()[0:3]}")
+
+        self.rows_written += len(batch)
+        self.batches_written += 1
+
+
+class WriterCursor:
+    """
+    cursor با همون رابط sqlite3: خوندن مستقیم، نوشتن از طریق DBWriter
+    هر thread (حلقه‌ی اصلی، event loop، persist، coordinator) connection
+    خواننده‌ی خودش رو از pool میگیره و تا آخر عمر thread نگهش میداره؛
+    پس execute / fetch دو thread روی یک connection قاطی نمیشن
+    """
+
+    def __init__(self, readers, writer):
+        self.readers = readers
+        self.writer = writer
+        self._local = threading.local()
+
+    @property
+    def _cursor(self):
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self.readers.acquire().cursor()
+        return cursor
+
+    def execute(self, sql, params=()):
+        if is_write_statement(sql):
+            self.writer.put(sql, params)
+            return self
+        self._cursor.execute(sql, params)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        if is_write_statement(sql):
+            self.writer.put_many(sql, seq_of_params)
+            return self
+        self._cursor.executemany(sql, seq_of_params)
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def __getattr__(self, name):
+        # description, connection, ...
+        return getattr(self._cursor, name)
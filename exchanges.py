@@ -0,0 +1,126 @@
+"""
+adapter های صرافی‌ها + نگاشت یکسان نمادها بین صرافی‌ها
+
+همه‌ی جاهایی که exchange میسازن (main، async_fetcher، get_symbols، worker های
+multi_exchange) از create_exchange استفاده میکنن، پس تنظیمات هر صرافی،
+limiter، replay / cassette و کش بازارها فقط همین‌جا تعریف شده.
+
+جدول symbol_markets برای هر base_symbol جدول symbols نماد و id بازار
+فیوچر USDT اون روی هر صرافی رو نگه میداره (sync_symbol_markets).
+ستون future_symbol جدول symbols همون نماد صرافی اصلی (PRIMARY_EXCHANGE) ـه.
+"""
+
+import ccxt
+import ccxt.async_support as ccxt_async
+
+import cassette
+import market_cache
+import rate_limiter
+import replay_exchange
+
+
+# تنظیمات هر صرافی: پارامترهای ccxt، نرخ limiter (وزن در ثانیه) و بودجه‌ی درخواست در دقیقه
+EXCHANGES = {
+    "bitget": {
+        'params': {'options': {'defaultType': 'future'}},
+        'rate': 15.0,
+        'burst': 30.0,
+        'budget': 600,
+    },
+    "bybit": {
+        'params': {'options': {'defaultType': 'future'}},
+        'rate': 10.0,
+        'burst': 20.0,
+        'budget': 400,
+    },
+}
+# صرافی اصلی (future_symbol جدول symbols و حلقه‌های تک صرافی)
+PRIMARY_EXCHANGE = "bitget"
+# ترتیب ترجیح وقتی تازگی دیتای دو صرافی یکیه
+EXCHANGE_PRIORITY = ["bitget", "bybit"]
+
+QUOTE = "USDT"
+
+# کش‌های بازاری که refresh شون شروع شده {id(exchange): MarketCache}
+market_caches = {}
+
+
+def create_exchange(name=PRIMARY_EXCHANGE, asynchronous=False, limiter=None):
+    """
+    ساخت exchange یک صرافی پشت limiter (پیش‌فرض limiter مشترک پردازه)
+    با REPLAY_SOURCE به جای صرافی واقعی از کندل‌های ضبط شده خونده میشه (آفلاین)
+    با CASSETTE_MODE جواب‌های صرافی واقعی ضبط / عینا پخش میشن (cassette.py)
+    بازارها فقط از فایل کش دیسکی خونده میشن (بدون درخواست شبکه، حتی با کش
+    خالی)؛ دانلود و refresh با start_market_cache از نقطه‌های ورود شروع میشه
+    تا import main (benchmark، cassette، worker ها) به صرافی نره
+    """
+    if limiter is None:
+        limiter = rate_limiter.limiter
+    limited_class = rate_limiter.AsyncLimitedExchange if asynchronous else rate_limiter.LimitedExchange
+    if replay_exchange.REPLAY_SOURCE:
+        return limited_class(replay_exchange.create_replay_exchange(asynchronous=asynchronous), limiter)
+
+    module = ccxt_async if asynchronous else ccxt
+    raw = getattr(module, name)(dict(EXCHANGES[name]['params']))
+    exchange = limited_class(cassette.wrap(raw, asynchronous=asynchronous), limiter)
+    market_cache.attach(exchange, refresh=False, start=False)
+    return exchange
+
+
+def start_market_cache(exchange, refresh=True):
+    """
+    شروع کش بازارهای exchange (فقط از نقطه‌های ورود واقعی: run.py، fetcher ها،
+    coordinator ها)؛ با کش خالی تا دانلود صبر میکنه و بعد thread پس‌زمینه
+    بعد از TTL دوباره میگیرتش
+    refresh=False: فقط فایل کش پایش میشه (پردازه‌ی دیگه‌ای دانلودش میکنه)
+    با REPLAY_SOURCE / CASSETTE_MODE کاری نمیکنه
+    """
+    if replay_exchange.REPLAY_SOURCE or cassette.CASSETTE_MODE:
+        return None
+    if id(exchange) not in market_caches:
+        market_caches[id(exchange)] = market_cache.attach(exchange, refresh=refresh)
+    return market_caches[id(exchange)]
+
+
+def swap_markets_by_base(markets, quote=QUOTE):
+    """{base: (market_symbol, market_id)} برای قراردادهای دائمی USDT فعال"""
+    result = {}
+    for symbol, market in markets.items():
+        if market.get('type') != "swap" or market.get('quote') != quote:
+            continue
+        if market.get('settle') not in (None, quote) or market.get('active') is False:
+            continue
+        result.setdefault(market['base'], (symbol, market['id']))
+    return result
+
+
+def sync_symbol_markets(cursor, name, markets):
+    """
+    آپدیت نگاشت base_symbol → بازار صرافی name در symbol_markets
+    خروجی: تعداد نمادهایی که روی این صرافی پیدا شدن
+    """
+    by_base = swap_markets_by_base(markets)
+    cursor.execute("SELECT id, base_symbol FROM symbols")
+    found = 0
+    for symbol_id, base_symbol in cursor.fetchall():
+        market = by_base.get(base_symbol.strip().upper())
+        if market is None:
+            cursor.execute(
+                "DELETE FROM symbol_markets WHERE symbol_id = ? AND exchange = ?", (symbol_id, name)
+            )
+            continue
+        found += 1
+        cursor.execute("""
+            INSERT OR REPLACE INTO symbol_markets (symbol_id, exchange, market_symbol, market_id, updated_at)
+            VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (symbol_id, name, market[0], market[1]))
+    return found
+
+
+def load_symbol_markets(cursor):
+    """{symbol_id: {exchange: market_symbol}}"""
+    cursor.execute("SELECT symbol_id, exchange, market_symbol FROM symbol_markets")
+    mapping = {}
+    for symbol_id, name, market_symbol in cursor.fetchall():
+        mapping.setdefault(symbol_id, {})[name] = market_symbol
+    return mapping
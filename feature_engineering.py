@@ -263,10 +263,10 @@ def export_processed_dataset(X, y, feature_names, filename='ml_ready_dataset.csv
 
 
 if __name__ == "__main__":
-    import sqlite3
+    import db_connection
     
     # Test
-    conn = sqlite3.connect("data.db")
+    conn = db_connection.connect_reader()
     cursor = conn.cursor()
     
     print("🚀 Creating ML Dataset...\n")
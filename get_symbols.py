@@ -1,11 +1,14 @@
 import time
-import ccxt
 import os
+import db_connection
+import db_setup
+import exchanges
 
 
-exchange = ccxt.bybit({
-    'options': {'defaultType': 'future'}
-})
+# لیست نمادها از صرافی اصلی (همون صرافی‌ای که fetcher ازش میخونه)
+# با کش دیسکی load_markets فقط وقتی کش نیست یا قدیمیه به صرافی میره
+exchange = exchanges.create_exchange(exchanges.PRIMARY_EXCHANGE)
+exchanges.start_market_cache(exchange)
 markets = exchange.load_markets()
 
 symbols = [
@@ -27,3 +30,18 @@ def clear_console():
 with open("allsymbols.txt", "w") as f:
     for symbol in symbols:
         f.write(symbol + "\n")
+
+
+# نگاشت base_symbol های جدول symbols به بازار هر صرافی (symbol_markets)
+conn = db_connection.connect_writer(db_setup.DB_NAME)
+cursor = conn.cursor()
+for name in exchanges.EXCHANGES:
+    try:
+        venue = exchange if name == exchanges.PRIMARY_EXCHANGE else exchanges.create_exchange(name)
+        exchanges.start_market_cache(venue)
+        found = exchanges.sync_symbol_markets(cursor, name, venue.load_markets())
+        print(f"🔗 {name} : {found} symbols mapped")
+    except Exception as e:
+        print(f"⚠️ {name} markets error:", e)
+conn.commit()
+conn.close()
@@ -0,0 +1,445 @@
+"""
+تاریخچه‌ی پارتیشن‌بندی شده بر اساس زمان (یک فایل SQLite برای هر دوره)
+
+data.db فقط HISTORY_HOT_DAYS اخیر rsi_data / rsi_rollup / signals رو نگه
+میداره. ردیف‌های قدیمی‌تر (دوره‌های کامل HISTORY_PARTITION_DAYS روزه، پیش‌فرض
+هفتگی از دوشنبه) به history/<تاریخ شروع دوره>.db منتقل میشن:
+    - VACUUM / backup ـه data.db کوچیک میمونه و فایل‌های بسته شده دیگه عوض نمیشن
+    - پاک کردن داده‌ی قدیمی = پاک کردن فایل (drop_before)
+
+انتقال (archive_step) تکه‌تکه‌ست: هر تکه اول در فایل دوره کپی میشه (قبلش
+همون بازه پاک میشه، پس تکرار بعد از قطع شدن تکراری نمیسازه) و بعد در
+تراکنش جدا از data.db حذف میشه. یک تراکنش مشترک کمکی نمیکرد: data.db در
+حالت WAL ـه و SQLite تراکنش چند فایلی رو فقط برای هر فایل جدا اتمی میکنه
+(حذف data.db زودتر دیده میشد و ردیف‌ها یه مدت گم میشدن).
+thread پس‌زمینه (start) هر تکه رو با DBWriter.call روی thread نویسنده‌ی
+fetcher اجرا میکنه (connection نوشتن دوم و رقابت سر قفل نوشتن نداره)؛
+اجرای دستی پایین یک پردازه‌ی جدا با connection نوشتن خودشه.
+
+خوندن با router: کوئری‌ها به جای اسم جدول {rsi_data} / {rsi_rollup} /
+{signals} دارن و یک بازه‌ی زمانی میدن؛ execute فقط فایل‌های دوره‌هایی که
+با بازه هم‌پوشانی دارن رو (فقط خواندنی) attach میکنه. اگه هیچ فایلی لازم
+نباشه کوئری مستقیم روی cursor خود caller اجرا میشه.
+    - انتقال از قدیمی‌ترین ردیف جلو میره، پس از فایل‌ها فقط ردیف‌های قدیمی‌تر
+      از قدیمی‌ترین ردیف data.db خونده میشن (همون snapshot)؛ ردیفی که بین
+      کپی و حذفه فقط یک بار (از data.db) دیده میشه
+    - ستون‌ها با جدول data.db تراز میشن؛ ستونی که فایل قدیمی نداره
+      (migration های بعدی) NULL برگردونده میشه
+
+اجرا:
+    python history_store.py                 (انتقال همه‌ی دوره‌های قدیمی)
+    python history_store.py drop 2025-01-01 (پاک کردن فایل‌های قبل از تاریخ)
+"""
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import db_connection
+import time_utils
+
+
+HISTORY_DIR = os.environ.get("HISTORY_DIR", "history")
+# طول هر دوره (1 = روزانه، 7 = هفتگی)
+HISTORY_PARTITION_DAYS = int(os.environ.get("HISTORY_PARTITION_DAYS", "7"))
+# ردیف‌های جدیدتر از این در data.db میمونن (tracker تا 30 روز عقب رو چک میکنه)
+HISTORY_HOT_DAYS = float(os.environ.get("HISTORY_HOT_DAYS", "35"))
+# طول هر تکه‌ی انتقال (میلی‌ثانیه)
+ARCHIVE_CHUNK_MS = time_utils.HOUR_MS
+# مکث بین دو تکه (ثانیه)
+STEP_PAUSE = 0.2
+# فاصله‌ی چک دوباره وقتی چیزی برای انتقال نیست (ثانیه)
+ARCHIVE_INTERVAL = 60 * 60
+# حداکثر فایل attach شده روی هر connection خواننده (سقف SQLite برای ATTACH ده تاست)
+MAX_ATTACHED = 8
+
+PARTITION_MS = HISTORY_PARTITION_DAYS * time_utils.DAY_MS
+# دوره‌ها از دوشنبه شروع میشن (1970-01-01 پنجشنبه بوده)
+PARTITION_ORIGIN_MS = -3 * time_utils.DAY_MS
+
+# جدول‌های منتقل شونده: {جدول: ستون زمان (epoch ms UTC)}
+ARCHIVED_TABLES = {
+    "rsi_data": "ts_ms",
+    "rsi_rollup": "bucket_ms",
+    "signals": "time_ms",
+}
+
+PARTITION_INDEXES = {
+    "rsi_data": [
+        "(symbol_id, timeframe, ts_ms, rsi, price)",
+        "(symbol_id, ts_ms, price, volume)",
+    ],
+    "rsi_rollup": [
+        "(symbol_id, timeframe, bucket_ms)",
+        "(symbol_id, bucket_ms, price_close)",
+    ],
+    "signals": [
+        "(time_ms)",
+        "(id)",
+    ],
+}
+
+# آمار
+stats = {'rows': 0, 'steps': 0, 'errors': 0}
+
+
+# ─── دوره‌ها و فایل‌ها ──────────────────────────────────────
+
+def partition_start(ms):
+    return ms - (ms - PARTITION_ORIGIN_MS) % PARTITION_MS
+
+
+def partition_path(start_ms, directory=HISTORY_DIR):
+    day = datetime.fromtimestamp(start_ms / 1000, timezone.utc).strftime("%Y-%m-%d")
+    return os.path.join(directory, f"{day}.db")
+
+
+def list_partitions(directory=HISTORY_DIR):
+    """[(start_ms, path)] فایل‌های موجود به ترتیب زمان"""
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return []
+    partitions = []
+    for name in names:
+        if not name.endswith(".db"):
+            continue
+        try:
+            day = datetime.strptime(name[:-3], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        except ValueError:
+            continue
+        partitions.append((int(day.timestamp() * 1000), os.path.join(directory, name)))
+    partitions.sort()
+    return partitions
+
+
+def partitions_for(start_ms, end_ms, directory=HISTORY_DIR):
+    """فایل‌هایی که دوره‌شون با [start_ms, end_ms] هم‌پوشانی داره"""
+    return [
+        (p_start, path) for p_start, path in list_partitions(directory)
+        if p_start <= end_ms and p_start + PARTITION_MS > start_ms
+    ]
+
+
+def hot_cutoff_ms(now_ms=None):
+    """ردیف‌های قبل از این زمان (شروع یک دوره) منتقل میشن"""
+    if now_ms is None:
+        now_ms = time_utils.now_ms()
+    return partition_start(now_ms - int(HISTORY_HOT_DAYS * time_utils.DAY_MS))
+
+
+def drop_before(before_ms, directory=HISTORY_DIR):
+    """پاک کردن فایل دوره‌هایی که کامل قبل از before_ms تموم شدن"""
+    dropped = []
+    for p_start, path in list_partitions(directory):
+        if p_start + PARTITION_MS <= before_ms:
+            os.remove(path)
+            dropped.append(path)
+    return dropped
+
+
+# ─── router (خوندن) ─────────────────────────────────────────
+
+_local = threading.local()
+
+
+def table_columns(conn, table, schema="main"):
+    cursor = conn.execute(f"PRAGMA {schema}.table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def _router_connection():
+    """connection خواننده‌ی مخصوص router در این thread: (conn, {path: alias})"""
+    state = getattr(_local, "state", None)
+    if state is None:
+        state = (db_connection.connect_reader(check_same_thread=False), OrderedDict())
+        _local.state = state
+    return state
+
+
+def _attach(conn, attached, path):
+    if path in attached:
+        attached.move_to_end(path)
+        return attached[path]
+    if len(attached) >= MAX_ATTACHED:
+        old_path, old_alias = attached.popitem(last=False)
+        conn.execute(f"DETACH DATABASE {old_alias}")
+    alias = "h_" + os.path.basename(path)[:-3].replace("-", "")
+    conn.execute("ATTACH DATABASE ? AS " + alias, (f"file:{path}?mode=ro",))
+    attached[path] = alias
+    return alias
+
+
+def _partition_select(conn, alias, table, columns, start_ms, end_ms, before):
+    """
+    SELECT ردیف‌های یک فایل دوره با ستون‌های data.db (ستون نبود → NULL)
+    before: فقط ردیف‌های قدیمی‌تر از این (SQL یا عدد؛ None = همه)
+    None اگه فایل این جدول رو نداره
+    """
+    existing = set(table_columns(conn, table, alias))
+    if not existing:
+        return None
+    time_column = ARCHIVED_TABLES[table]
+    select = ", ".join(column if column in existing else f"NULL AS {column}" for column in columns)
+    where = f"WHERE {time_column} BETWEEN {int(start_ms)} AND {int(end_ms)}"
+    if before is not None:
+        where += f" AND {time_column} < {before}"
+    return f"SELECT {select} FROM {alias}.{table} {where}"
+
+
+def _sources(conn, attached, partitions, start_ms, end_ms):
+    """{table: زیرکوئری UNION ALL روی main و فایل‌های دوره}"""
+    aliases = [_attach(conn, attached, path) for _, path in partitions]
+    sources = {}
+    for table, time_column in ARCHIVED_TABLES.items():
+        columns = table_columns(conn, table)
+        branches = [
+            f"SELECT {', '.join(columns)} FROM main.{table} "
+            f"WHERE {time_column} BETWEEN {int(start_ms)} AND {int(end_ms)}"
+        ]
+        # قدیمی‌ترین ردیف data.db در snapshot همین کوئری (جدول خالی = همه منتقل شدن)
+        before = f"COALESCE((SELECT MIN({time_column}) FROM main.{table}), {2 ** 62})"
+        for alias in aliases:
+            branch = _partition_select(conn, alias, table, columns, start_ms, end_ms, before)
+            if branch:
+                branches.append(branch)
+        sources[table] = "(" + " UNION ALL ".join(branches) + ")"
+    return sources
+
+
+def execute(cursor, sql, start_ms, end_ms, params=()):
+    """
+    اجرای کوئری روی بازه‌ی [start_ms, end_ms] (فقط فایل‌های لازم)
+    sql: {rsi_data} / {rsi_rollup} / {signals} به جای اسم جدول
+    خروجی: fetchall
+    """
+    partitions = partitions_for(start_ms, end_ms)
+    if not partitions:
+        cursor.execute(sql.format(**{table: table for table in ARCHIVED_TABLES}), params)
+        return cursor.fetchall()
+    if len(partitions) > MAX_ATTACHED:
+        raise ValueError(f"{len(partitions)} partitions in range - use execute_each")
+    conn, attached = _router_connection()
+    return conn.execute(sql.format(**_sources(conn, attached, partitions, start_ms, end_ms)), params).fetchall()
+
+
+def execute_each(cursor, sql, start_ms=0, end_ms=None, params=()):
+    """
+    اجرای کوئری جداگانه روی data.db و هر فایل دوره (برای بازه‌های بزرگ مثل
+    export؛ فقط برای کوئری‌های ردیفی بدون ORDER BY / LIMIT / تجمیع سراسری)
+    خروجی: (ستون‌ها، همه‌ی ردیف‌ها)
+    """
+    if end_ms is None:
+        end_ms = time_utils.now_ms()
+    main_sql = sql.format(**{table: table for table in ARCHIVED_TABLES})
+    partitions = partitions_for(start_ms, end_ms)
+    if not partitions:
+        cursor.execute(main_sql, params)
+        return [d[0] for d in cursor.description], cursor.fetchall()
+
+    # کوئری data.db و قدیمی‌ترین ردیف هر جدول در یک تراکنش خوندن (یک snapshot)
+    needed = [table for table in ARCHIVED_TABLES if "{" + table + "}" in sql]
+    with db_connection.readers.connection() as main_conn:
+        main_conn.execute("BEGIN")
+        try:
+            result = main_conn.execute(main_sql, params)
+            columns = [d[0] for d in result.description]
+            rows = result.fetchall()
+            before = {
+                table: main_conn.execute(f"SELECT MIN({ARCHIVED_TABLES[table]}) FROM {table}").fetchone()[0]
+                for table in needed
+            }
+        finally:
+            main_conn.rollback()
+
+    conn, attached = _router_connection()
+    for _, path in partitions:
+        sources = _partition_sources(conn, attached, path, needed, start_ms, end_ms, before)
+        if sources is not None:
+            rows.extend(conn.execute(sql.format(**sources), params).fetchall())
+    return columns, rows
+
+
+def execute_ordered(cursor, sql, limit, params=(), start_ms=0, end_ms=None, newest_first=True):
+    """
+    کوئری «اولین limit ردیف به ترتیب زمان» روی data.db و فایل‌های دوره
+    sql: {rsi_data} / {signals} ...، ORDER BY ستون زمان (DESC برای newest_first)
+    و LIMIT ? آخر (limit خودش به params اضافه میشه)
+    newest_first: اول data.db و فقط اگه ردیف کم بود فایل‌ها از جدید به قدیم
+    newest_first=False: اول فایل‌ها از قدیم به جدید، بعد data.db
+    خروجی: fetchall
+    """
+    main_sql = sql.format(**{table: table for table in ARCHIVED_TABLES})
+    if newest_first:
+        # حالت معمول: ردیف‌های data.db کافیه و سراغ فایل‌ها نمیریم
+        cursor.execute(main_sql, (*params, limit))
+        rows = cursor.fetchall()
+        if len(rows) >= limit:
+            return rows
+    if end_ms is None:
+        end_ms = time_utils.now_ms()
+    partitions = partitions_for(start_ms, end_ms)
+    if not partitions:
+        if newest_first:
+            return rows
+        cursor.execute(main_sql, (*params, limit))
+        return cursor.fetchall()
+
+    # ردیف‌های data.db و مرز قدیمی‌ترین ردیفش در یک snapshot (مثل execute_each)
+    needed = [table for table in ARCHIVED_TABLES if "{" + table + "}" in sql]
+    with db_connection.readers.connection() as main_conn:
+        main_conn.execute("BEGIN")
+        try:
+            main_rows = main_conn.execute(main_sql, (*params, limit)).fetchall()
+            before = {
+                table: main_conn.execute(f"SELECT MIN({ARCHIVED_TABLES[table]}) FROM {table}").fetchone()[0]
+                for table in needed
+            }
+        finally:
+            main_conn.rollback()
+
+    conn, attached = _router_connection()
+    rows = list(main_rows) if newest_first else []
+    for _, path in (reversed(partitions) if newest_first else partitions):
+        if len(rows) >= limit:
+            break
+        sources = _partition_sources(conn, attached, path, needed, start_ms, end_ms, before)
+        if sources is not None:
+            rows.extend(conn.execute(sql.format(**sources), (*params, limit - len(rows))).fetchall())
+    if not newest_first:
+        rows.extend(main_rows)
+    return rows[:limit]
+
+
+def _partition_sources(conn, attached, path, needed, start_ms, end_ms, before):
+    """{table: زیرکوئری یک فایل دوره} برای execute_each / execute_ordered؛ None اگه فایل جدول رو نداره"""
+    alias = _attach(conn, attached, path)
+    sources = {table: table for table in ARCHIVED_TABLES}
+    for table in needed:
+        branch = _partition_select(
+            conn, alias, table, table_columns(conn, table), start_ms, end_ms, before[table]
+        )
+        if branch is None:
+            return None
+        sources[table] = f"({branch})"
+    return sources
+
+
+# ─── انتقال (نوشتن) ─────────────────────────────────────────
+
+def ensure_partition_table(conn, alias, table):
+    """ساخت جدول در فایل دوره با ستون‌های جدول data.db (ستون‌های جدید اضافه میشن)"""
+    main_columns = table_columns(conn, table)
+    existing = table_columns(conn, table, alias)
+    if not existing:
+        conn.execute(f"CREATE TABLE {alias}.{table} AS SELECT * FROM main.{table} WHERE 0")
+        for i, columns in enumerate(PARTITION_INDEXES.get(table, [])):
+            conn.execute(f"CREATE INDEX IF NOT EXISTS {alias}.idx_{table}_{i} ON {table} {columns}")
+        conn.commit()
+        return main_columns
+    for column in main_columns:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE {alias}.{table} ADD COLUMN {column}")
+    conn.commit()
+    return main_columns
+
+
+def archive_step(conn, now_ms=None, directory=HISTORY_DIR):
+    """
+    انتقال قدیمی‌ترین تکه‌ی یکی از جدول‌ها به فایل دوره‌ش
+    conn: connection نوشتن (connect_writer یا connection ـه DBWriter.call)
+    خروجی: تعداد ردیف‌های منتقل شده (0 یعنی چیزی نمونده)
+    """
+    cutoff = hot_cutoff_ms(now_ms)
+    for table, time_column in ARCHIVED_TABLES.items():
+        oldest = conn.execute(
+            f"SELECT MIN({time_column}) FROM {table} WHERE {time_column} < ?", (cutoff,)
+        ).fetchone()[0]
+        if oldest is None:
+            continue
+        p_start = partition_start(oldest)
+        start = oldest - oldest % ARCHIVE_CHUNK_MS
+        end = min(start + ARCHIVE_CHUNK_MS, p_start + PARTITION_MS, cutoff)
+
+        os.makedirs(directory, exist_ok=True)
+        conn.execute("ATTACH DATABASE ? AS part", (partition_path(p_start, directory),))
+        try:
+            columns = ", ".join(ensure_partition_table(conn, "part", table))
+            # 1) کپی در فایل دوره (تکرار همون بازه ردیف تکراری نمیسازه)
+            conn.execute("BEGIN")
+            conn.execute(f"DELETE FROM part.{table} WHERE {time_column} >= ? AND {time_column} < ?", (start, end))
+            moved = conn.execute(f"""
+                INSERT INTO part.{table} ({columns})
+                SELECT {columns} FROM main.{table}
+                WHERE {time_column} >= ? AND {time_column} < ?
+            """, (start, end)).rowcount
+            conn.commit()
+            # 2) حذف از data.db
+            conn.execute("BEGIN")
+            conn.execute(f"DELETE FROM main.{table} WHERE {time_column} >= ? AND {time_column} < ?", (start, end))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute("DETACH DATABASE part")
+
+        stats['rows'] += moved
+        stats['steps'] += 1
+        return moved
+    return 0
+
+
+def archive(conn=None, max_steps=None, pause=STEP_PAUSE, writer=None):
+    """
+    انتقال تا وقتی ردیف قدیمی‌تر از HISTORY_HOT_DAYS هست
+    writer: هر تکه روی thread ـه DBWriter اجرا میشه (conn لازم نیست)
+    """
+    total = 0
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        moved = writer.call(archive_step) if writer is not None else archive_step(conn)
+        if not moved:
+            break
+        total += moved
+        steps += 1
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def run_archiver(writer):
+    """حلقه‌ی thread پس‌زمینه (نوشتن‌ها روی DBWriter ـه پردازه)"""
+    while True:
+        try:
+            total = archive(writer=writer)
+            if total:
+                print(f"📦 history archived : {total} rows → {HISTORY_DIR}/ "
+                      f"(hot {HISTORY_HOT_DAYS:g} days)")
+        except Exception as e:
+            stats['errors'] += 1
+            print("⚠️ history archive error:", e)
+        time.sleep(ARCHIVE_INTERVAL)
+
+
+def start(writer):
+    thread = threading.Thread(target=run_archiver, args=(writer,), name="history-archiver", daemon=True)
+    thread.start()
+    return thread
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "drop":
+        before = datetime.strptime(sys.argv[2], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        for path in drop_before(int(before.timestamp() * 1000)):
+            print(f"🗑️ {path}")
+    else:
+        conn = db_connection.connect_writer()
+        print(f"📦 archiving rows older than {HISTORY_HOT_DAYS:g} days "
+              f"into {HISTORY_PARTITION_DAYS}-day files in {HISTORY_DIR}/ ...")
+        total = archive(conn)
+        print(f"✅ {total} rows archived | {stats['steps']} steps")
+        conn.close()
@@ -1,34 +1,78 @@
 import time
-import winsound
 import ccxt
-import pandas as pd
-import ta
 import os
-import sqlite3
 import pytz
-from datetime import datetime, timedelta
+from datetime import datetime
 import scoring  # ✨ import کردن ماژول
+import ohlcv_store
+import rsi_engine
+import resampler
+import scheduler
+import ticker_snapshot
+import db_writer
+import db_connection
+import time_utils
+import save_index
+import rsi_history
+import atexit
+import json
+import rate_limiter
+import exchanges
+import alerts
+import screening
+import polling
+import circuit_breaker
 # import scoring2 as scoring
 
 
 
 
 COUNT_BEST = 0
-SLEEP_INTERVAL = 2   # 300 ثانیه = 5 دقیقه
 last_rsi = None
 last_best_C = ""
 tz_tehran = pytz.timezone("Asia/Tehran")
 
-exchange = ccxt.bitget({
-    'options': {'defaultType': 'future'}
-})
-# exchange = ccxt.bybit({
-#     'options': {'defaultType': 'future'}
-# })
+# صرافی این fetcher (worker های multi_exchange صرافی خودشون رو میذارن)
+# همه‌ی درخواست‌ها از limiter مشترک رد میشن (token bucket + backoff) - exchanges.create_exchange
+EXCHANGE_ID = os.environ.get("EXCHANGE_ID", exchanges.PRIMARY_EXCHANGE)
+exchange = exchanges.create_exchange(EXCHANGE_ID)
+
+
+def start_market_cache(refresh=True):
+    """کش بازارهای exchange این fetcher - فقط از نقطه‌های ورود (import به شبکه نمیره)"""
+    return exchanges.start_market_cache(exchange, refresh)
+
 
 TIMEFRAMES = ["1m", "5m", "15m", "1h", "4h"]
 rsi_values = {}
 
+# بیشترین زمان خواب وقتی کاری نیست (برای دیدن نمادهای تازه فعال شده)
+MAX_IDLE_SLEEP = 5
+
+# اسم این fetcher در جدول fetcher_status (worker های sharded اسم خودشون رو میذارن)
+FETCHER_NAME = "fetcher"
+# فاصله‌ی ذخیره‌ی وضعیت در fetcher_status (ثانیه)
+STATUS_INTERVAL = 5
+last_status_time = 0
+
+# زمان‌بند job ها: هر (نماد، تایم‌فریم) وقتی کندلش بسته شد یا وقت refresh ـشه
+job_scheduler = scheduler.CandleScheduler(TIMEFRAMES)
+# فرکانس refresh تطبیقی هر نماد (نزدیک باندها سریع‌تر) در بودجه‌ی درخواست
+adaptive_polling = polling.AdaptivePolling(
+    job_scheduler,
+    [tf for tf in TIMEFRAMES if tf not in resampler.RESAMPLED_TIMEFRAMES]
+)
+# آخرین زمان ذخیره‌ی rsi_data برای هر (نماد، تایم‌فریم) - در حافظه
+last_save_index = save_index.LastSaveIndex()
+# RSI های اخیر هر (نماد، تایم‌فریم) برای تشخیص روند - در حافظه
+recent_rsi = rsi_history.RsiHistory()
+# غربال دو مرحله‌ای: تحلیل سنگین (v3 تا v7) فقط برای نمادهای کاندید
+screener = screening.Screener()
+# circuit breaker هر نماد (نمادهای خراب درخواست هدر نمیدن)
+breakers = circuit_breaker.SymbolBreakers()
+# زمان آخرین snapshot قیمت‌ها (fetch_tickers)
+last_ticker_time = 0
+
 
 def clear_console():
     """Clears the console screen."""
@@ -41,89 +85,12 @@ def clear_console():
     
 
 def get_active_symbols():
-    conn = sqlite3.connect("data.db")
-    cursor = conn.cursor()
-    cursor.execute("SELECT id,future_symbol,base_symbol FROM symbols WHERE active = 1 AND future_symbol IS NOT NULL")
-    symbols = cursor.fetchall()
-    conn.close()
+    with db_connection.readers.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id,future_symbol,base_symbol FROM symbols WHERE active = 1 AND future_symbol IS NOT NULL")
+        symbols = cursor.fetchall()
     return symbols
 
-def get_lastrsi_save_times(cursor, symbol_id):
-    """
-    یه بار همه آخرین timestamp‌ها رو برای همه تایم‌فریم‌ها میگیره
-    """
-    cursor.execute("""
-        SELECT 
-            timeframe,
-            MAX(timestamp) as last_time
-        FROM rsi_data
-        WHERE symbol_id = ?
-        GROUP BY timeframe
-    """, (symbol_id,))
-    results = cursor.fetchall()
-    
-    # تبدیل به دیکشنری برای دسترسی سریع
-    return {row[0]: row[1] for row in results}
-
-
-def get_previous_rsi(cursor, symbol_id, timeframe):
-    """
-    برمی‌گردونه آخرین مقدار RSI از تایم‌فریم قبلی در بازه [target ± tolerance]
-    خروجی: dict با فیلدهای rsi، timestamp یا None اگه چیزی پیدا نشد
-    """
-    intervals = {
-        "1m":  {"target": 1,   "tolerance": 0.5},   # ±30 ثانیه
-        "5m":  {"target": 5,   "tolerance": 2},     # ±2 دقیقه
-        "15m": {"target": 15,  "tolerance": 5},
-        "1h":  {"target": 60,  "tolerance": 15},
-        "4h":  {"target": 240, "tolerance": 60}
-    }
-
-    cfg = intervals.get(timeframe, {"target": 5, "tolerance": 2})
-
-    # هدف: زمان تقریبی بازه قبلی
-    target_time = datetime.now(tz_tehran) - timedelta(minutes=cfg["target"])
-    min_time = target_time - timedelta(minutes=cfg["tolerance"])
-    max_time = target_time + timedelta(minutes=cfg["tolerance"])
-    
-
-    # جست‌وجو در بازه مجاز
-    query = """
-        SELECT rsi, timestamp 
-        FROM rsi_data
-        WHERE symbol_id = ? AND timeframe = ?
-        AND timestamp BETWEEN ? AND ?
-        ORDER BY timestamp DESC
-        LIMIT 1
-    """
-    cursor.execute(query, (
-        symbol_id,
-        timeframe,
-        min_time.strftime("%Y-%m-%d %H:%M:%S"),
-        max_time.strftime("%Y-%m-%d %H:%M:%S")
-    ))
-    row = cursor.fetchone()
-
-    # اگر در بازه چیزی پیدا نشد، نزدیک‌ترین رکورد ممکن رو بیار
-    if not row:
-        fallback_query = """
-            SELECT rsi, timestamp 
-            FROM rsi_data
-            WHERE symbol_id = ? AND timeframe = ?
-            ORDER BY ABS((julianday(?) - julianday(timestamp)) * 24 * 60)
-            LIMIT 1
-        """
-        cursor.execute(fallback_query, (
-            symbol_id,
-            timeframe,
-            datetime.now(tz_tehran).strftime("%Y-%m-%d %H:%M:%S")
-        ))
-        row = cursor.fetchone()
-
-    if row:
-        return {"rsi": row[0], "timestamp": row[1]}
-    return None
-
 def detect_rsi_trend(current_rsi, previous_rsi, threshold=0.1 ):
     """
     تشخیص جهت روند RSI
@@ -141,41 +108,6 @@ def detect_rsi_trend(current_rsi, previous_rsi, threshold=0.1 ):
     else:
         return "down", change
 
-def is_allowed_to_save(last_save_times, timeframe):
-    """
-    چک میکنه که آیا مجاز به ذخیره هستیم یا نه
-    """
-    
-    # تعیین حد مجاز برای هر تایم‌فریم (به دقیقه)
-    intervals = {
-        "1m": 30,
-        "5m": 2,
-        "15m": 5,
-        "1h": 20,
-        "4h": 60
-    }
-    
-    # اگه تایم‌فریم توی دیکشنری نیست یا None هست، مجازه
-    if timeframe not in last_save_times or last_save_times[timeframe] is None:
-        return True
-    
-    # گرفتن آخرین زمان ذخیره
-    last_timestamp = last_save_times[timeframe]
-    last_time = datetime.strptime(last_timestamp, "%Y-%m-%d %H:%M:%S")
-    now = datetime.now()
-    # محاسبه اختلاف زمانی (به دقیقه)
-    time_diff = (now - last_time).total_seconds()
-    if (timeframe == "1m"):
-        return time_diff >= intervals.get("1m")
-
-    else :
-        # //به دقیقه
-        time_diff = time_diff / 60 
-        
-        # بررسی اینکه آیا زمان کافی گذشته
-        allowed_interval = intervals.get(timeframe, 5)
-        return time_diff >= allowed_interval
-
 def calculate_score(rsi_values):
     """
     ورودی: دیکشنری از RSIهای تایم‌فریم‌ها
@@ -208,194 +140,395 @@ def calculate_score(rsi_values):
     return round(score, 2)
 
 # اتصال به دیتابیس
-conn = sqlite3.connect("data.db", check_same_thread=False)
-cursor = conn.cursor()
+# خوندن روی connection فقط خواندنی هر thread (WAL، از readers)، نوشتن‌ها از
+# طریق thread نویسنده (تنها connection نوشتن پردازه، دسته‌ای در یک تراکنش)
+writer = db_writer.DBWriter(db_connection.DB_NAME)
+writer.start()
+atexit.register(writer.stop)  # نوشتن باقیمانده‌ی صف موقع خروج
+cursor = db_writer.WriterCursor(db_connection.readers, writer)
+
+
+def use_writer(new_writer):
+    """
+    جایگزینی writer (مثلا worker های sharded_fetcher که نوشتن‌ها رو
+    برای coordinator میفرستن تا همه از یک مسیر ذخیره بشن)
+    """
+    global writer, cursor
+    writer.stop()
+    writer = new_writer
+    writer.start()
+    atexit.register(writer.stop)
+    cursor = db_writer.WriterCursor(db_connection.readers, writer)
  
 
 
+def get_timeframe_bars(symbol_id, SYMBOL, TIMEFRAME):
+    """
+    کندل‌های جدید یک تایم‌فریم:
+    5m/15m/1h/4h اگه ممکن باشه از 1m ذخیره شده ساخته میشن، وگرنه از صرافی
+    خروجی: (bars, now_ms, fetched) - fetched یعنی درخواست به صرافی زده شد
+    """
+    if TIMEFRAME in resampler.RESAMPLED_TIMEFRAMES:
+        # کندل‌های 1m همین دور قبلا (یک بار برای کل نماد) flush شدن - fetch_and_save_symbol
+        since = resampler.get_resample_since(cursor, symbol_id, TIMEFRAME, exchange.milliseconds())
+        if since is not None:
+            bars, as_of_ms = resampler.resample_from_store(cursor, symbol_id, TIMEFRAME, since)
+            return bars, as_of_ms, False
+
+    bars = ohlcv_store.fetch_ohlcv_incremental(exchange, cursor, symbol_id, SYMBOL, TIMEFRAME)
+    return bars, exchange.milliseconds(), True
+
+
+def save_timeframe_data(symbol_id, SYMBOL, TIMEFRAME, bars, prev_price, now_ms=None):
+    """
+    پردازش کندل‌های یک تایم‌فریم: محاسبه RSI، ذخیره در rsi_data و آپدیت market_info
+    هم حلقه‌ی همزمان (sync) و هم fetcher ناهمزمان (async_fetcher) از این تابع استفاده میکنن
+    bars: کندل‌های جدید (خروجی fetch_ohlcv یا resampler)
+    now_ms: زمان مرجع برای تشخیص کندل باز (برای کندل‌های resample شده)
+    خروجی: (last_price, last_rsi, direction, rsi_change) یا None اگه RSI هنوز آماده نیست
+    """
+    global last_best_C, COUNT_BEST
+
+    # RSI افزایشی: فقط کندل‌های جدید به state اعمال میشن
+    tf_ms = ohlcv_store.TIMEFRAME_MS[TIMEFRAME]
+    rsi_state = rsi_engine.get_state(cursor, symbol_id, TIMEFRAME)
+    if rsi_state.needs_warmup(bars, tf_ms):
+        # state خالی یا عقب افتاده → گرم کردن از کندل‌های ذخیره شده
+        # (کندل‌های همین دور شاید هنوز در صف writer باشن، پس در حافظه اضافه میشن)
+        rsi_state.reset()
+        bars = ohlcv_store.merge_candles(ohlcv_store.load_candles(cursor, symbol_id, TIMEFRAME), bars)
+    if not bars:
+        return None
+
+    print(f"crypto name : {SYMBOL}" )
+
+    rsi = rsi_state.apply_candles(bars, tf_ms, now_ms)
+    rsi_engine.save_state(cursor, rsi_state)
+    if rsi is None:
+        print(f"⏳ Not enough candles for RSI : {SYMBOL} | "+TIMEFRAME)
+        return None
+
+    last_price = bars[-1][4]
+    last_rsi = round(rsi, 2)
+    last_volume = bars[-1][5]
+
+    now = datetime.now(tz_tehran)
+    now_tehran = now.strftime("%Y-%m-%d %H:%M:%S")
+
+    prev_data = recent_rsi.get_previous_rsi(symbol_id, TIMEFRAME, now.timestamp())
+    if prev_data:
+        prev_rsi = prev_data["rsi"]
+    else : prev_rsi = None
+
+    direction, rsi_change = detect_rsi_trend(last_rsi, prev_rsi, threshold=0.1)
+
+    cursor.execute(
+        "INSERT INTO rsi_data (symbol_id, price, rsi, timeframe, timestamp, ts_ms, rsi_change ,rsi_trend , volume ) VALUES (?, ?, ?, ?, ?, ?, ?,?,?)",
+        (symbol_id, last_price, last_rsi, TIMEFRAME, now_tehran, time_utils.to_ms(now), rsi_change ,direction,last_volume )
+    )
+    last_save_index.mark(symbol_id, TIMEFRAME, now.timestamp())
+    recent_rsi.append(symbol_id, TIMEFRAME, now.timestamp(), last_rsi)
+    
+
+    # انتخاب ستون مناسب بر اساس تایم‌فریم
+    col_name = {
+        "1m": "rsi_1m",
+        "5m": "rsi_5m",
+        "15m": "rsi_15m",
+        "1h": "rsi_1h",
+        "4h": "rsi_4h"
+    }[TIMEFRAME]
+    col_trend = {
+        "1m": "rsi_trend_1m",
+        "5m": "rsi_trend_5m",
+        "15m": "rsi_trend_15m",
+        "1h": "rsi_trend_1h",
+        "4h": "rsi_trend_4h"
+    }[TIMEFRAME]
+    
+    col_change = {
+        "1m": "rsi_change_1m",
+        "5m": "rsi_change_5m",
+        "15m": "rsi_change_15m",
+        "1h": "rsi_change_1h",
+        "4h": "rsi_change_4h"
+    }[TIMEFRAME]
+
+    # اول اگه نبود اضافه کن
+    cursor.execute("INSERT OR IGNORE INTO market_info (symbol_id) VALUES (?)", (symbol_id,))
+
+    if prev_price is not None:
+        price_change = round(last_price - prev_price, 4)
+    else:
+        price_change = 0
+    # بعد ستون مربوطه رو آپدیت کن
+
+    cursor.execute(f"""
+        UPDATE market_info
+        SET price=?, {col_name}=?, {col_trend}=?, {col_change}=?, price_change=?, updated_at=CURRENT_TIMESTAMP, updated_ms={time_utils.SQL_NOW_MS}
+        WHERE symbol_id=?
+    """, (last_price, last_rsi, direction, rsi_change, price_change, symbol_id))
+
+    # هشدار هم میشه اضافه کرد
+    if last_rsi > 75 :
+        COUNT_BEST +=1
+        alerts.send(SYMBOL, "rsi_high", f"RSI {last_rsi:.2f} | {TIMEFRAME}",
+                    timeframe=TIMEFRAME, rsi=round(last_rsi, 2), price=last_price)
+        print("🚨 RSI is high! "+TIMEFRAME)
+        print(f"Price: {last_price:.4f}")
+        print(f"RSI  : {last_rsi:.2f}")
+        last_best_C += f'{SYMBOL}    '
+
+    elif last_rsi < 30 :
+        COUNT_BEST+=1
+        alerts.send(SYMBOL, "rsi_low", f"RSI {last_rsi:.2f} | {TIMEFRAME}",
+                    timeframe=TIMEFRAME, rsi=round(last_rsi, 2), price=last_price)
+        print("📉 RSI is low! " +TIMEFRAME)
+        print(f"Price: {last_price:.4f}")
+        print(f"RSI  : {last_rsi:.2f}")
+        last_best_C += f'{SYMBOL}   '
+    else :
+        print(f"RSI is normal : {last_rsi:.2f} | "+TIMEFRAME)
+
+    return last_price, last_rsi, direction, rsi_change
+
+
+def save_symbol_scores(symbol_id, SYMBOL, last_price, rsi_values, rsi_trends, rsi_changes):
+    """
+    محاسبه امتیاز و اجرای نسخه‌های ذخیره سیگنال برای یک نماد
+    مرحله‌ی 1 (score / advance_score / v1 / v2) همیشه، مرحله‌ی 2 (v3 تا v7)
+    فقط اگه screener نماد رو کاندید بدونه
+    تحلیل‌ها rsi_data / market_info رو از reader میخونن، پس ردیف‌های همین دور
+    که هنوز در صف writer ـن اول نوشته میشن (یک flush برای هر نماد)
+    """
+    writer.flush()
+    if rsi_values:
+        score = calculate_score(rsi_values)
+        cursor.execute("UPDATE market_info SET score=? WHERE symbol_id=?", (score, symbol_id))
+    if rsi_values and rsi_trends and rsi_changes:
+        advanced_score = scoring.calculate_advanced_score(
+            rsi_values,
+            rsi_trends,
+            rsi_changes
+        )
+
+        # آپدیت در دیتابیس
+        cursor.execute(
+            "UPDATE market_info SET advance_score=? WHERE symbol_id=?",
+            (advanced_score, symbol_id)
+        )
+        scoring.save_signals(cursor , symbol_id , SYMBOL , last_price, rsi_values, rsi_trends, advanced_score , score)
+        scoring.save_signals_v2(cursor , symbol_id , SYMBOL , last_price, rsi_values, rsi_trends, rsi_changes , score)
+
+        adaptive_polling.update(symbol_id, rsi_values, advanced_score)
+
+        # مرحله‌ی 2: تحلیل سنگین فقط برای کاندیدها
+        screener.update(symbol_id, score, advanced_score)
+        if not screener.is_candidate(symbol_id):
+            return
+
+        # ✅ نسخه 3 (جدید)
+        scoring.save_signals_v3(
+            cursor, symbol_id, SYMBOL, last_price,
+            rsi_values, rsi_trends, rsi_changes, score
+        )
+        scoring.save_signals_v4(cursor, symbol_id, SYMBOL, last_price,
+                  rsi_values, rsi_trends, rsi_changes, score)
+
+
+        scoring.save_signals_v5(
+            cursor, symbol_id, SYMBOL, last_price,
+            rsi_values, rsi_trends, rsi_changes, score
+        )
+        
+        scoring.save_signals_v6_sell_only(cursor, symbol_id, SYMBOL, last_price,rsi_values, rsi_trends, rsi_changes, score)  # testmode: v6_sell_only
+        scoring.save_signals_v7_ultra_premium(cursor, symbol_id, SYMBOL, last_price,rsi_values, rsi_trends, rsi_changes, score)  # testmode: v7_ultra
+
+
+def get_last_price(symbol_id):
+    """آخرین قیمت ذخیره شده در market_info (برای محاسبه price_change)"""
+    cursor.execute("SELECT price FROM market_info WHERE symbol_id=?", (symbol_id,))
+    row = cursor.fetchone()
+    if row and row[0] is not None:
+        return row[0]
+    return None
+
+
+def fetch_and_save_symbol(symbol_id, SYMBOL, timeframes):
+    """
+    گرفتن و ذخیره‌ی تایم‌فریم‌های سررسید شده‌ی یک نماد + امتیازدهی
+    خروجی: تعداد درخواست‌های زده شده به صرافی
+    """
+    print(SYMBOL)
+    countreq = 0
+    prev_price = get_last_price(symbol_id)
+
+    rsi_values = {}
+    rsi_trends = {}
+    rsi_changes = {}
+    flushed = False
+
+    for TIMEFRAME in timeframes:
+        if TIMEFRAME in resampler.RESAMPLED_TIMEFRAMES and not flushed:
+            # یک flush برای کل نماد: کندل‌های 1m همین دور باید قبل از resample توی دیتابیس باشن
+            writer.flush()
+            flushed = True
+        # گرفتن کندل‌ها (فقط کندل‌های جدید، بقیه از جدول ohlcv / resample از 1m)
+        bars, now_ms, fetched = get_timeframe_bars(symbol_id, SYMBOL, TIMEFRAME)
+        if fetched:
+            countreq += 1
+        result = save_timeframe_data(symbol_id, SYMBOL, TIMEFRAME, bars, prev_price, now_ms)
+        if result is not None:
+            last_price, last_rsi, direction, rsi_change = result
+
+            rsi_values[TIMEFRAME] = last_rsi
+            rsi_trends[TIMEFRAME] = direction
+            rsi_changes[TIMEFRAME] = rsi_change 
+    # print("----------------------------------------------")
+    if rsi_values:
+        save_symbol_scores(symbol_id, SYMBOL, last_price, rsi_values, rsi_trends, rsi_changes)
+
+    return countreq
+
+
+def print_scheduler_stats(countreq):
+    global last_best_C
+    print(f"count best position rmi : {COUNT_BEST} \n **************************")
+    if last_best_C :
+        print(last_best_C)
+        last_best_C = ""
+    stats = job_scheduler.stats()
+    writer_stats = writer.stats()
+    screen_stats = screener.stats()
+    polling_stats = adaptive_polling.stats()
+    limiter_stats = rate_limiter.limiter.stats()
+    breaker_stats = breakers.stats()
+    print(f"count request : {countreq} | queue : {stats['queue_depth']} | overdue : {stats['overdue']} "
+          f"| lateness : {stats['last_lateness']}s (max {stats['max_lateness']}s) "
+          f"| db pending : {writer_stats['pending']} "
+          f"| deep : {screen_stats['deep']}/{screen_stats['screened']} (skipped {screen_stats['skipped']}) "
+          f"| hot/quiet : {polling_stats['hot']}/{polling_stats['quiet']} "
+          f"| req/min : {polling_stats['estimated_rate']} (scale {polling_stats['scale']}) "
+          f"| circuit open : {breaker_stats['open']} (retries {breaker_stats['retries']}) "
+          f"| limiter : {limiter_stats['rate']}/s, 429 x{limiter_stats['rate_limited']} --- now : {time.strftime('%H:%M:%S')}\n")
+    save_fetcher_status()
+
+
+def save_fetcher_status(force=False, extra=None):
+    """
+    ذخیره‌ی وضعیت fetcher (limiter، زمان‌بند، writer، ...) در fetcher_status
+    تا وب‌اپ (حتی در پردازه‌ی جدا) بتونه نشونش بده
+    extra: بخش‌های اضافه‌ی وضعیت (مثلا آمار ws_stream)
+    """
+    global last_status_time
+    now = time.time()
+    if not force and now - last_status_time < STATUS_INTERVAL:
+        return
+    last_status_time = now
+    status = {
+        'limiter': rate_limiter.limiter.stats(),
+        'scheduler': job_scheduler.stats(),
+        'polling': adaptive_polling.stats(),
+        'screening': screener.stats(),
+        'breakers': breakers.stats(),
+        'writer': writer.stats(),
+    }
+    if extra:
+        status.update(extra)
+    cursor.execute("""
+        INSERT OR REPLACE INTO fetcher_status (name, data, updated_at)
+        VALUES (?, ?, CURRENT_TIMESTAMP)
+    """, (FETCHER_NAME, json.dumps(status)))
+
+
+def seconds_until_ticker():
+    """ثانیه تا snapshot بعدی قیمت‌ها"""
+    return max(last_ticker_time + ticker_snapshot.TICKER_INTERVAL - time.time(), 0.0)
+
+
+def get_idle_sleep():
+    """خواب تا بسته شدن کندل بعدی / سررسید refresh / snapshot قیمت"""
+    wait = job_scheduler.seconds_until_next()
+    if wait is None:
+        wait = MAX_IDLE_SLEEP
+    return min(wait, seconds_until_ticker(), MAX_IDLE_SLEEP)
+
+
+def run_ticker_stage(symbols):
+    """snapshot قیمت همه‌ی نمادهای فعال با یک fetch_tickers"""
+    global last_ticker_time
+    last_ticker_time = time.time()
+    try:
+        count = ticker_snapshot.fetch_ticker_snapshot(exchange, cursor, symbols)
+        print(f"💹 ticker snapshot : {count} prices updated")
+    except Exception as e:
+        print("⚠️ Ticker error:", e)
+
+
+def load_last_save_index():
+    """
+    پر کردن ایندکس آخرین ذخیره‌ها و بافرهای RSI اخیر
+    (هر کدوم یک کوئری، فقط بار اول)
+    """
+    if not last_save_index.loaded:
+        count = last_save_index.load(cursor)
+        print(f"🗂️ last save index loaded : {count} (symbol, timeframe)")
+        count = recent_rsi.load(cursor)
+        print(f"🗂️ recent rsi history loaded : {count} rows")
+
+
+def allow_job(symbol_id, timeframes):
+    """اگه breaker نماد باز باشه job ها تا زمان probe عقب میفتن و False برمیگرده"""
+    if breakers.allow(symbol_id):
+        return True
+    retry_at = max(breakers.retry_at(symbol_id), time.time() + circuit_breaker.RETRY_DELAYS[0])
+    job_scheduler.defer(symbol_id, timeframes, retry_at)
+    return False
+
+
+def defer_failed_job(symbol_id, SYMBOL, timeframes, error):
+    """ثبت خطای صرافی در breaker و گذاشتن job ها در صف retry"""
+    job_scheduler.defer(symbol_id, timeframes, breakers.record_failure(symbol_id, SYMBOL, error))
+
+
 def run_fetcher_loop():
-    tz_tehran = pytz.timezone("Asia/Tehran")
-    global last_best_C, COUNT_BEST, last_rsi
-    frequency =2222
-    duration =200
     countreq = 0
+    load_last_save_index()
     while True:
         symbols = get_active_symbols()
+        job_scheduler.sync_symbols(symbols, last_save_index.get_symbol)
+        screener.sync_symbols(symbols)
+        breakers.sync_symbols(symbols)
+        adaptive_polling.rebalance([symbol[0] for symbol in symbols])
+
+        if seconds_until_ticker() == 0:
+            run_ticker_stage(symbols)
+
+        jobs = job_scheduler.pop_due()
+        if not jobs:
+            save_fetcher_status()  # heartbeat حتی وقتی کاری نیست
+            time.sleep(get_idle_sleep())
+            continue
 
-        print(f"count best position rmi : {COUNT_BEST} \n **************************")
-        if last_best_C :
-            print(last_best_C)
-            last_best_C = ""
-        for id,future_symbol,base_symbol in symbols:
+        for symbol_id, SYMBOL, timeframes in jobs:
+            if not allow_job(symbol_id, timeframes):
+                continue
             try:
-                symbol_id = id
-                
-                SYMBOL = future_symbol
-                print(SYMBOL)
-                
-                cursor.execute("SELECT price FROM market_info WHERE symbol_id=?", (symbol_id,))
-                row = cursor.fetchone()
-
-                rsi_values = {}
-                rsi_trends = {}
-                rsi_changes = {}
-
-                for TIMEFRAME in TIMEFRAMES:
-                    last_save_times = get_lastrsi_save_times(cursor, symbol_id)
-                    if is_allowed_to_save(last_save_times, TIMEFRAME):
-                        countreq += 1
-                        
-                        # گرفتن کندل‌ها
-                        bars = exchange.fetch_ohlcv(SYMBOL, timeframe=TIMEFRAME, limit=200)
-                        df = pd.DataFrame(bars, columns=["timestamp", "open", "high", "low", "close", "volume"])
-
-                        df["RSI_EMA"] = ta.momentum.RSIIndicator(df["close"], window=14, fillna=False).rsi()  # ta خودش EMA استفاده میکنه
-                        
-
-                        print(f"crypto name : {SYMBOL}" )
-
-                        df["RSI"] = ta.momentum.RSIIndicator(df["close"], window=14).rsi()
-
-                        last_price = df["close"].iloc[-1]
-                        last_rsi = round(df["RSI"].iloc[-1], 2)
-                        last_volume = df["volume"].iloc[-1]
-
-                        last_rsi_ema = df["RSI_EMA"].iloc[-1]
-
-                        # print(f"Price: {last_price:.4f}")
-                        # print(f"RSI Wilder: {last_rsi_wilder:.2f}")
-                        # print(f"RSI EMA: {last_rsi_ema:.2f}")
-                        # print(f"RSI  : {last_rsi:.2f}")
-                        now_tehran = datetime.now(tz_tehran).strftime("%Y-%m-%d %H:%M:%S")
-
-                        prev_data = get_previous_rsi(cursor, symbol_id, TIMEFRAME)
-                        if prev_data:
-                            prev_rsi = prev_data["rsi"]
-                        else : prev_rsi = None
-
-                        direction, rsi_change = detect_rsi_trend(last_rsi, prev_rsi, threshold=0.1)
-
-                        cursor.execute(
-                            "INSERT INTO rsi_data (symbol_id, price, rsi, timeframe, timestamp,rsi_change ,rsi_trend , volume ) VALUES (?, ?, ?, ?, ?, ?,?,?)",
-                            (symbol_id, last_price, last_rsi, TIMEFRAME, now_tehran,rsi_change ,direction,last_volume )
-                        )
-                        
-
-                        # انتخاب ستون مناسب بر اساس تایم‌فریم
-                        col_name = {
-                            "1m": "rsi_1m",
-                            "5m": "rsi_5m",
-                            "15m": "rsi_15m",
-                            "1h": "rsi_1h",
-                            "4h": "rsi_4h"
-                        }[TIMEFRAME]
-                        col_trend = {
-                            "1m": "rsi_trend_1m",
-                            "5m": "rsi_trend_5m",
-                            "15m": "rsi_trend_15m",
-                            "1h": "rsi_trend_1h",
-                            "4h": "rsi_trend_4h"
-                        }[TIMEFRAME]
-                        
-                        col_change = {
-                            "1m": "rsi_change_1m",
-                            "5m": "rsi_change_5m",
-                            "15m": "rsi_change_15m",
-                            "1h": "rsi_change_1h",
-                            "4h": "rsi_change_4h"
-                        }[TIMEFRAME]
-
-                        rsi_values[TIMEFRAME] = last_rsi
-                        rsi_trends[TIMEFRAME] = direction
-                        rsi_changes[TIMEFRAME] = rsi_change 
-
-                        # اول اگه نبود اضافه کن
-                        cursor.execute("INSERT OR IGNORE INTO market_info (symbol_id) VALUES (?)", (symbol_id,))
-
-                        if row and row[0] is not None:
-                            prev_price = row[0]
-                            price_change = round(last_price - prev_price, 4)
-                        else:
-                            price_change = 0
-                        # بعد ستون مربوطه رو آپدیت کن
-
-                        cursor.execute(f"""
-                            UPDATE market_info
-                            SET price=?, {col_name}=?, {col_trend}=?, {col_change}=?, price_change=?, updated_at=CURRENT_TIMESTAMP 
-                            WHERE symbol_id=?
-                        """, (last_price, last_rsi, direction, rsi_change, price_change, symbol_id))
-
-
-                        conn.commit()
-                        # هشدار هم میشه اضافه کرد
-                        if last_rsi > 75 :
-                            COUNT_BEST +=1
-                            winsound.Beep(frequency, duration) # frequency in Hz, duration in milliseconds
-                            print("🚨 RSI is high! "+TIMEFRAME)
-                            print(f"Price: {last_price:.4f}")
-                            print(f"RSI  : {last_rsi:.2f}")
-                            last_best_C += f'{SYMBOL}    '
-
-                        elif last_rsi < 30 :
-                            COUNT_BEST+=1
-                            winsound.Beep(frequency, duration) # frequency in Hz, duration in milliseconds
-                            print("📉 RSI is low! " +TIMEFRAME)
-                            print(f"Price: {last_price:.4f}")
-                            print(f"RSI  : {last_rsi:.2f}")
-                            last_best_C += f'{SYMBOL}   '
-                        else :
-                            print(f"RSI is normal : {last_rsi:.2f} | "+TIMEFRAME)
-                        time.sleep(1) 
-                    else:
-                        print(" --------------- not need to fetch data because we have data in this time frame")
-                    print("count request : "+ str(countreq))
-                # print("----------------------------------------------")
-                if rsi_values:
-                    score = calculate_score(rsi_values)
-                    cursor.execute("UPDATE market_info SET score=? WHERE symbol_id=?", (score, symbol_id))
-                    conn.commit()
-                if rsi_values and rsi_trends and rsi_changes:
-                    advanced_score = scoring.calculate_advanced_score(
-                        rsi_values,
-                        rsi_trends,
-                        rsi_changes
-                    )
-
-                    # آپدیت در دیتابیس
-                    cursor.execute(
-                        "UPDATE market_info SET advance_score=? WHERE symbol_id=?",
-                        (advanced_score, symbol_id)
-                    )
-                    scoring.save_signals(cursor , symbol_id , SYMBOL , last_price, rsi_values, rsi_trends, advanced_score , score)
-                    scoring.save_signals_v2(cursor , symbol_id , SYMBOL , last_price, rsi_values, rsi_trends, rsi_changes , score)
-
-                    # ✅ نسخه 3 (جدید)
-                    scoring.save_signals_v3(
-                        cursor, symbol_id, SYMBOL, last_price,
-                        rsi_values, rsi_trends, rsi_changes, score
-                    )
-                    scoring.save_signals_v4(cursor, symbol_id, SYMBOL, last_price,
-                              rsi_values, rsi_trends, rsi_changes, score)
-
-
-                    scoring.save_signals_v5(
-        cursor, symbol_id, SYMBOL, last_price,
-        rsi_values, rsi_trends, rsi_changes, score
-    )
-                    
-                    scoring.save_signals_v6_sell_only(cursor, symbol_id, SYMBOL, last_price,rsi_values, rsi_trends, rsi_changes, score)  # testmode: v6_sell_only
-                    scoring.save_signals_v7_ultra_premium(cursor, symbol_id, SYMBOL, last_price,rsi_values, rsi_trends, rsi_changes, score)  # testmode: v7_ultra
-
-                    conn.commit()
-
+                countreq += fetch_and_save_symbol(symbol_id, SYMBOL, timeframes)
+            except ccxt.BaseError as e:
+                print(f"⚠️ Error {SYMBOL}:", e)
+                defer_failed_job(symbol_id, SYMBOL, timeframes, e)
+                continue
             except Exception as e:
+                # خطای داخلی (امتیازدهی، دیتابیس) - درخواست صرافی موفق بوده
                 print("⚠️ Error:", e)
+            breakers.record_success(symbol_id)
+            job_scheduler.reschedule(symbol_id, timeframes)
+
+        print_scheduler_stats(countreq)
+
 
-            print(f"--- waiting {SLEEP_INTERVAL}sec to reload --- now : {time.strftime('%H:%M:%S')}\n")
-            time.sleep(SLEEP_INTERVAL) 
-        
-        clear_console()
-    time.sleep(1) 
 if __name__ == "__main__":
+    start_market_cache()
     run_fetcher_loop()
  
\ No newline at end of file
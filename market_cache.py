@@ -0,0 +1,176 @@
+"""
+کش دیسکی اطلاعات بازارهای صرافی (load_markets)
+
+load_markets صرافی‌ها جواب بزرگ و کندیه و قبلا هر پردازه (get_symbols،
+fetcher، هر worker ـه sharded) یک بار کامل دانلودش میکرد. الان:
+    - اگه فایل کش هست همون لحظه با set_markets روی exchange میشینه (حتی
+      اگه قدیمیه) و استارت منتظر صرافی نمیمونه
+    - یک thread پس‌زمینه وقتی کش از MARKET_CACHE_TTL قدیمی‌تر شد دوباره
+      میگیرتش؛ با فایل lock فقط یک پردازه دانلود میکنه و بقیه فقط فایل
+      جدید رو میخونن
+    - فقط بار اول (وقتی هیچ کشی نیست) استارت منتظر دانلود میمونه
+
+فایل‌ها: market_cache/<exchange_id>.json
+"""
+
+import json
+import os
+import threading
+import time
+
+
+MARKET_CACHE_DIR = os.environ.get("MARKET_CACHE_DIR", "market_cache")
+# عمر کش (ثانیه)
+MARKET_CACHE_TTL = 6 * 60 * 60
+# فاصله‌ی چک کش توسط thread پس‌زمینه (ثانیه)
+CHECK_INTERVAL = 60
+# lock رها شده (پردازه‌ی مرده) بعد از این مدت نادیده گرفته میشه (ثانیه)
+LOCK_TIMEOUT = 5 * 60
+# حداکثر انتظار بار اول برای دانلود پردازه‌ی دیگه (ثانیه)
+FIRST_LOAD_WAIT = 120
+
+
+def cache_path(exchange_id, directory=MARKET_CACHE_DIR):
+    return os.path.join(directory, f"{exchange_id}.json")
+
+
+def read_cache(path):
+    """خوندن فایل کش؛ None اگه نیست یا خرابه"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(path, markets, currencies=None):
+    """نوشتن اتمیک (فایل موقت + replace) تا خواننده‌ها فایل نصفه نبینن"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({'fetched_at': time.time(), 'markets': markets, 'currencies': currencies}, f, default=str)
+    os.replace(tmp_path, path)
+
+
+def acquire_lock(lock_path):
+    """lock بین پردازه‌ای با O_EXCL؛ lock قدیمی‌تر از LOCK_TIMEOUT شکسته میشه"""
+    os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+    for _ in range(2):
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(lock_path) < LOCK_TIMEOUT:
+                    return False
+                os.remove(lock_path)
+            except OSError:
+                return False
+    return False
+
+
+def release_lock(lock_path):
+    try:
+        os.remove(lock_path)
+    except OSError:
+        pass
+
+
+class MarketCache:
+    """
+    کش بازارهای یک exchange
+    refresh=False: فقط فایل خونده میشه (مثلا exchange async که exchange
+    همزمان همون پردازه دانلودش میکنه)
+    """
+
+    def __init__(self, exchange, ttl=MARKET_CACHE_TTL, refresh=True, directory=MARKET_CACHE_DIR):
+        self.exchange = exchange
+        self.ttl = ttl
+        self.refresh = refresh
+        self.path = cache_path(exchange.id, directory)
+        self.lock_path = self.path + ".lock"
+        self.fetched_at = 0.0
+        self.downloads = 0
+        self.thread = None
+
+    def apply(self, cached=None):
+        """نشوندن کش روی exchange (اگه از نسخه‌ی فعلی جدیدتره)"""
+        if cached is None:
+            cached = read_cache(self.path)
+        if not cached or cached['fetched_at'] <= self.fetched_at:
+            return False
+        self.exchange.set_markets(cached['markets'], cached.get('currencies'))
+        self.fetched_at = cached['fetched_at']
+        return True
+
+    def is_stale(self):
+        return time.time() - self.fetched_at > self.ttl
+
+    def download(self):
+        """دانلود از صرافی و ذخیره (فقط پردازه‌ای که lock رو گرفته)"""
+        if not acquire_lock(self.lock_path):
+            return False
+        try:
+            cached = read_cache(self.path)
+            if cached and time.time() - cached['fetched_at'] <= self.ttl:
+                return self.apply(cached)  # پردازه‌ی دیگه همین الان گرفته
+            markets = self.exchange.load_markets(True)
+            write_cache(self.path, markets, getattr(self.exchange, 'currencies', None))
+            self.fetched_at = read_cache(self.path)['fetched_at']
+            self.downloads += 1
+            print(f"🗃️ market cache updated : {self.exchange.id} ({len(markets)} markets)")
+            return True
+        finally:
+            release_lock(self.lock_path)
+
+    def load(self):
+        """
+        استارت: کش موجود فوری اعمال میشه؛ اگه هیچ کشی نیست یا دانلود میشه یا
+        منتظر پردازه‌ای که داره دانلود میکنه میمونیم
+        """
+        if self.apply():
+            return True
+        if not self.refresh:
+            return False
+        deadline = time.time() + FIRST_LOAD_WAIT
+        while time.time() < deadline:
+            if self.download() or self.apply():
+                return True
+            time.sleep(1)
+        return False
+
+    def _run(self):
+        while True:
+            try:
+                if not self.apply() and self.refresh and self.is_stale():
+                    self.download()
+            except Exception as e:
+                print(f"⚠️ market cache refresh error ({self.exchange.id}):", e)
+            time.sleep(CHECK_INTERVAL)
+
+    def start(self):
+        """thread پس‌زمینه‌ی چک فایل / دانلود دوباره بعد از TTL"""
+        if self.thread is None:
+            self.thread = threading.Thread(
+                target=self._run, name=f"market-cache-{self.exchange.id}", daemon=True
+            )
+            self.thread.start()
+        return self
+
+
+def attach(exchange, refresh=True, ttl=MARKET_CACHE_TTL, start=True):
+    """
+    وصل کردن کش دیسکی به exchange (همزمان، پشت limiter)
+    exchange هایی که set_markets ندارن (replay / cassette) بدون تغییر میمونن
+    start=False: فقط یک بار load (بدون thread پس‌زمینه)
+    """
+    if not hasattr(exchange, "set_markets"):
+        return None
+    cache = MarketCache(exchange, ttl=ttl, refresh=refresh)
+    try:
+        if cache.load() and cache.is_stale():
+            print(f"🗃️ market cache is stale ({exchange.id}) - refreshing in background")
+    except Exception as e:
+        # بدون کش هم کار میکنه (ccxt موقع اولین درخواست خودش میگیره)
+        print(f"⚠️ market cache load error ({exchange.id}):", e)
+    return cache.start() if start else cache
@@ -0,0 +1,259 @@
+"""
+دریافت همزمان از چند صرافی (یک پردازه‌ی worker برای هر صرافی)
+
+هر worker همون حلقه‌ی async_fetcher رو با exchange و limiter خودش (نرخ و
+بودجه‌ی درخواست همون صرافی از exchanges.EXCHANGES) اجرا میکنه، پس کند
+شدن یا rate limit یک صرافی بقیه رو متوقف نمیکنه.
+
+coordinator هر نماد فعال رو فقط به یک صرافی میده (روی جدول‌های ohlcv /
+rsi_data / market_info همچنان یک سری داده برای هر نماد هست):
+    - فقط صرافی‌هایی که نماد رو دارن (symbol_markets) و worker شون سالمه
+    - صرافی فعلی تا وقتی دیتاش تازه‌ست (venue_status) عوض نمیشه
+    - اگه دیتای صرافی فعلی از VENUE_STALE_SECONDS قدیمی‌تر بشه (قطعی،
+      circuit breaker باز، عقب افتادن صف) نماد به تازه‌ترین صرافی دیگه
+      (و با تازگی برابر به ترتیب EXCHANGE_PRIORITY) منتقل میشه
+    - سلامت worker ها از heartbeat شون در fetcher_status (هر دور حلقه، حتی بیکار)
+    - نماد منتقل شده یک دور (VENUE_SYNC_INTERVAL) به هیچ worker ای داده نمیشه
+      تا کار نیمه‌تموم worker قبلی نوشته بشه؛ بعد کندل‌های ohlcv و rsi_state ـش
+      پاک میشن تا کندل‌های صرافی جدید به سری صرافی قبلی نچسبن (worker جدید از
+      اول گرم میکنه)
+
+نوشتن‌ها مثل sharded_fetcher از صف به DBWriter همین coordinator میرن.
+
+اجرا:
+    python multi_exchange.py
+"""
+
+import multiprocessing
+import threading
+import time
+
+import async_fetcher
+import exchanges
+import main
+import rate_limiter
+import screening
+import sharded_fetcher
+
+
+# بعد از این مدت بدون fetch موفق، دیتای نماد روی یک صرافی قدیمی حساب میشه (ثانیه)
+VENUE_STALE_SECONDS = 180
+# فاصله‌ی انتخاب دوباره‌ی صرافی‌ها و چک worker ها (ثانیه)
+VENUE_SYNC_INTERVAL = 10
+# فاصله‌ی گزارش تازگی از worker به venue_status (ثانیه)
+FRESHNESS_INTERVAL = 10
+# فاصله‌ی آپدیت نگاشت symbol_markets از بازارهای کش شده (ثانیه)
+MAPPING_SYNC_INTERVAL = 60 * 60
+
+
+def worker_name(name):
+    return f"exchange-{name}"
+
+
+# ─── سمت worker ─────────────────────────────────────────────
+
+def report_freshness(name):
+    """نوشتن تازگی نمادهای این صرافی (از circuit breaker) در venue_status"""
+    reported = {}
+    while True:
+        time.sleep(FRESHNESS_INTERVAL)
+        for symbol_id, row in main.breakers.snapshot().items():
+            if reported.get(symbol_id) == row:
+                continue
+            reported[symbol_id] = row
+            last_success, state, error = row
+            main.writer.put("""
+                INSERT OR REPLACE INTO venue_status (symbol_id, exchange, last_success, state, last_error, updated_at)
+                VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (symbol_id, name, last_success, state, error))
+
+
+def worker_main(name, worker_id, num_workers, control_queue, write_queue, ack_queue):
+    """نقطه‌ی ورود پردازه‌ی worker یک صرافی"""
+    config = exchanges.EXCHANGES[name]
+    main.use_writer(sharded_fetcher.RemoteWriter(worker_id, write_queue, ack_queue))
+    main.FETCHER_NAME = worker_name(name)
+    main.EXCHANGE_ID = name
+    # limiter این پردازه فقط مال همین صرافیه
+    rate_limiter.limiter.set_rate(config['rate'], config['burst'])
+    main.exchange = exchanges.create_exchange(name)
+    # کش بازارهای همه‌ی صرافی‌ها رو coordinator (sync_mappings) refresh میکنه
+    main.start_market_cache(refresh=False)
+    main.adaptive_polling.budget = config['budget']
+    main.screener.top_k = max(1, screening.TOP_K // num_workers)
+
+    threading.Thread(target=report_freshness, args=(name,), name="venue-freshness", daemon=True).start()
+
+    shard = sharded_fetcher.ShardState(control_queue)
+    shard.wait()
+    print(f"🏦 {name} worker started : {len(shard.symbols)} symbols")
+    async_fetcher.run_fetcher_loop(shard.get_symbols, shard.get_ticker_symbols)
+
+
+# ─── سمت coordinator ────────────────────────────────────────
+
+def sync_mappings(cursor, market_exchanges):
+    """
+    آپدیت symbol_markets همه‌ی صرافی‌ها از بازارهای (کش شده‌ی) هر صرافی
+    market_exchanges: {name: exchange} - یک بار ساخته میشن (کش بازارها refresh میشه)
+    """
+    for name in exchanges.EXCHANGES:
+        try:
+            if name not in market_exchanges:
+                market_exchanges[name] = (
+                    main.exchange if name == main.EXCHANGE_ID else exchanges.create_exchange(name)
+                )
+                exchanges.start_market_cache(market_exchanges[name])
+            found = exchanges.sync_symbol_markets(cursor, name, market_exchanges[name].load_markets())
+            print(f"🔗 {name} : {found} symbols mapped")
+        except Exception as e:
+            print(f"⚠️ {name} markets error:", e)
+    main.writer.flush()
+
+
+def load_venue_status(cursor):
+    """{(symbol_id, exchange): epoch آخرین fetch موفق}"""
+    cursor.execute("SELECT symbol_id, exchange, last_success FROM venue_status WHERE last_success IS NOT NULL")
+    return {(symbol_id, name): last_success for symbol_id, name, last_success in cursor.fetchall()}
+
+
+def healthy_venues(cursor, started, now):
+    """صرافی‌هایی که worker شون وضعیت تازه ثبت کرده (یا تازه شروع شده)"""
+    cursor.execute(
+        "SELECT name FROM fetcher_status WHERE updated_at >= datetime('now', ?)",
+        (f"-{VENUE_STALE_SECONDS} seconds",)
+    )
+    reporting = {row[0] for row in cursor.fetchall()}
+    return {
+        name for name in exchanges.EXCHANGES
+        if worker_name(name) in reporting or now - started.get(name, 0) < VENUE_STALE_SECONDS
+    }
+
+
+def choose_venues(symbols, mapping, freshness, healthy, current, assigned_at, now):
+    """
+    انتخاب صرافی هر نماد
+    خروجی: {symbol_id: (exchange, market_symbol)}
+    """
+    priority = {name: i for i, name in enumerate(exchanges.EXCHANGE_PRIORITY)}
+    venues = {}
+    for symbol_id, future_symbol, base_symbol in symbols:
+        candidates = mapping.get(symbol_id) or {exchanges.PRIMARY_EXCHANGE: future_symbol}
+        usable = {name: s for name, s in candidates.items() if name in healthy} or candidates
+
+        previous = current.get(symbol_id)
+        if previous in usable:
+            last = max(freshness.get((symbol_id, previous), 0), assigned_at.get(symbol_id, 0))
+            if now - last < VENUE_STALE_SECONDS or len(usable) == 1:
+                venues[symbol_id] = (previous, usable[previous])
+                continue
+            del usable[previous]  # دیتای صرافی فعلی قدیمی شده
+
+        best = max(
+            usable,
+            key=lambda name: (freshness.get((symbol_id, name), 0), -priority.get(name, len(priority)))
+        )
+        venues[symbol_id] = (best, usable[best])
+    return venues
+
+
+def reset_symbol_series(symbol_ids):
+    """پاک کردن سری کندل و state RSI نمادهای منتقل شده (قبل از فرستادن shard جدید)"""
+    for symbol_id in symbol_ids:
+        main.writer.put("DELETE FROM ohlcv WHERE symbol_id = ?", (symbol_id,))
+        main.writer.put("DELETE FROM rsi_state WHERE symbol_id = ?", (symbol_id,))
+    main.writer.flush()
+
+
+def run_coordinator():
+    """اجرای worker هر صرافی، انتخاب صرافی نمادها و راه‌اندازی دوباره‌ی worker های مرده"""
+    names = list(exchanges.EXCHANGES)
+    ctx = multiprocessing.get_context("spawn")
+    write_queue = ctx.Queue()
+    ack_queues = [ctx.Queue() for _ in names]
+    control_queues = [ctx.Queue() for _ in names]
+
+    threading.Thread(
+        target=sharded_fetcher.drain_writes, args=(write_queue, ack_queues),
+        name="exchange-writes", daemon=True
+    ).start()
+
+    workers = [None] * len(names)
+    sent_shards = [None] * len(names)
+    started = {}
+    current = {}       # {symbol_id: exchange}
+    assigned_at = {}   # {symbol_id: زمان انتقال به صرافی فعلی}
+    handoff = {}       # {symbol_id: زمان انتقال} - هنوز به worker جدید داده نشده
+    market_exchanges = {}
+    last_mapping_sync = 0
+
+    while True:
+        now = time.time()
+        if now - last_mapping_sync > MAPPING_SYNC_INTERVAL:
+            sync_mappings(main.cursor, market_exchanges)
+            last_mapping_sync = now
+
+        symbols = main.get_active_symbols()
+        venues = choose_venues(
+            symbols,
+            exchanges.load_symbol_markets(main.cursor),
+            load_venue_status(main.cursor),
+            healthy_venues(main.cursor, started, now),
+            current, assigned_at, now
+        )
+        moved = 0
+        for symbol_id, (name, market_symbol) in venues.items():
+            if current.get(symbol_id) != name:
+                if symbol_id in current:
+                    moved += 1
+                    handoff[symbol_id] = now
+                current[symbol_id] = name
+                assigned_at[symbol_id] = now
+        for symbol_id in set(current) - set(venues):
+            del current[symbol_id]
+            assigned_at.pop(symbol_id, None)
+            handoff.pop(symbol_id, None)
+        if moved:
+            print(f"🔀 {moved} symbols moved to a fresher exchange")
+        ready = [symbol_id for symbol_id, moved_at in handoff.items() if now - moved_at >= VENUE_SYNC_INTERVAL]
+        if ready:
+            reset_symbol_series(ready)
+            for symbol_id in ready:
+                del handoff[symbol_id]
+
+        shards = {name: [] for name in names}
+        for symbol_id, future_symbol, base_symbol in symbols:
+            if symbol_id in handoff:
+                continue
+            name, market_symbol = venues[symbol_id]
+            shards[name].append((symbol_id, market_symbol, base_symbol))
+
+        for worker_id, name in enumerate(names):
+            process = workers[worker_id]
+            if process is None or not process.is_alive():
+                if process is not None:
+                    print(f"⚠️ {name} worker exited ({process.exitcode}) - restarting")
+                process = ctx.Process(
+                    target=worker_main,
+                    args=(name, worker_id, len(names), control_queues[worker_id],
+                          write_queue, ack_queues[worker_id]),
+                    name=f"exchange-worker-{name}", daemon=True
+                )
+                process.start()
+                workers[worker_id] = process
+                started[name] = now
+                sent_shards[worker_id] = None
+
+            if shards[name] != sent_shards[worker_id]:
+                # هر worker قیمت‌های (fetch_tickers) نمادهای خودش رو میگیره
+                control_queues[worker_id].put(("shard", shards[name], shards[name]))
+                sent_shards[worker_id] = shards[name]
+
+        sizes = " ".join(f"{name}:{len(shards[name])}" for name in names)
+        print(f"🏦 venues : [{sizes}] | db pending : {main.writer.stats()['pending']} "
+              f"--- now : {time.strftime('%H:%M:%S')}")
+        time.sleep(VENUE_SYNC_INTERVAL)
+
+
+if __name__ == "__main__":
+    run_coordinator()
@@ -0,0 +1,136 @@
+"""
+ذخیره‌سازی کندل‌ها (OHLCV) و fetch افزایشی
+
+به جای اینکه هر بار 200 کندل کامل از صرافی گرفته بشه، کندل‌ها توی
+جدول ohlcv نگه داشته میشن و فقط کندل‌های جدیدتر از آخرین کندل ذخیره
+شده (since) درخواست میشه. آخرین کندل ذخیره شده هم دوباره گرفته میشه
+چون ممکنه هنوز بسته نشده باشه.
+"""
+
+import time
+
+
+# طول هر تایم‌فریم به میلی‌ثانیه
+TIMEFRAME_MS = {
+    "1m": 60 * 1000,
+    "5m": 5 * 60 * 1000,
+    "15m": 15 * 60 * 1000,
+    "1h": 60 * 60 * 1000,
+    "4h": 4 * 60 * 60 * 1000,
+}
+
+# تعداد کندلی که برای محاسبات برگردونده میشه
+CANDLE_LIMIT = 200
+
+
+def get_last_open_time(cursor, symbol_id, timeframe):
+    """آخرین open_time ذخیره شده برای (نماد، تایم‌فریم) یا None"""
+    cursor.execute("""
+        SELECT MAX(open_time)
+        FROM ohlcv
+        WHERE symbol_id = ? AND timeframe = ?
+    """, (symbol_id, timeframe))
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def get_fetch_since(cursor, symbol_id, timeframe, limit=CANDLE_LIMIT, now_ms=None):
+    """
+    مقدار since برای درخواست بعدی
+    None یعنی باید تاریخچه‌ی کامل (limit کندل) گرفته بشه:
+    - هنوز کندلی ذخیره نشده
+    - فاصله از آخرین کندل بیشتر از limit کندله (مثلا بعد از خاموشی طولانی)
+    """
+    last_open_time = get_last_open_time(cursor, symbol_id, timeframe)
+    if last_open_time is None:
+        return None
+
+    if now_ms is None:
+        now_ms = int(time.time() * 1000)
+    tf_ms = TIMEFRAME_MS.get(timeframe, 60 * 1000)
+    if now_ms - last_open_time > limit * tf_ms:
+        return None
+
+    return last_open_time
+
+
+def save_candles(cursor, symbol_id, timeframe, bars):
+    """
+    ذخیره کندل‌ها (خروجی fetch_ohlcv)
+    کندل تکراری (مثلا کندل باز قبلی) جایگزین میشه
+    """
+    if not bars:
+        return 0
+    cursor.executemany("""
+        INSERT OR REPLACE INTO ohlcv
+        (symbol_id, timeframe, open_time, open, high, low, close, volume)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(symbol_id, timeframe, int(b[0]), b[1], b[2], b[3], b[4], b[5]) for b in bars])
+    return len(bars)
+
+
+def load_candles(cursor, symbol_id, timeframe, limit=CANDLE_LIMIT):
+    """
+    آخرین limit کندل (از قدیم به جدید) با همون فرمت fetch_ohlcv:
+    [[timestamp, open, high, low, close, volume], ...]
+    """
+    cursor.execute("""
+        SELECT open_time, open, high, low, close, volume
+        FROM ohlcv
+        WHERE symbol_id = ? AND timeframe = ?
+        ORDER BY open_time DESC
+        LIMIT ?
+    """, (symbol_id, timeframe, limit))
+    rows = cursor.fetchall()
+    rows.reverse()
+    return [list(r) for r in rows]
+
+
+def merge_candles(stored, bars, limit=CANDLE_LIMIT):
+    """
+    کندل‌های ذخیره شده + کندل‌های جدید (که شاید هنوز در صف writer باشن)
+    کندل جدید با همون open_time جایگزین قبلی میشه؛ خروجی آخرین limit کندل
+    """
+    merged = {candle[0]: candle for candle in stored}
+    for candle in bars or []:
+        merged[candle[0]] = list(candle)
+    return [merged[t] for t in sorted(merged)][-limit:]
+
+
+def load_candles_since(cursor, symbol_id, timeframe, since):
+    """همه‌ی کندل‌ها از open_time >= since (از قدیم به جدید)"""
+    cursor.execute("""
+        SELECT open_time, open, high, low, close, volume
+        FROM ohlcv
+        WHERE symbol_id = ? AND timeframe = ? AND open_time >= ?
+        ORDER BY open_time ASC
+    """, (symbol_id, timeframe, since))
+    return [list(r) for r in cursor.fetchall()]
+
+
+def has_candle(cursor, symbol_id, timeframe, open_time):
+    """آیا کندل با این open_time ذخیره شده؟"""
+    cursor.execute("""
+        SELECT 1
+        FROM ohlcv
+        WHERE symbol_id = ? AND timeframe = ? AND open_time = ?
+    """, (symbol_id, timeframe, open_time))
+    return cursor.fetchone() is not None
+
+
+def fetch_ohlcv_incremental(exchange, cursor, symbol_id, SYMBOL, timeframe, limit=CANDLE_LIMIT):
+    """
+    گرفتن فقط کندل‌های جدید از صرافی و ذخیره در ohlcv
+    زمان فعلی از ساعت خود exchange (milliseconds) خونده میشه تا با
+    replay_exchange هم درست کار کنه
+    خروجی: همون کندل‌های جدید (موتور RSI فقط به اینا نیاز داره،
+    تاریخچه در صورت نیاز با load_candles خونده میشه)
+    """
+    since = get_fetch_since(cursor, symbol_id, timeframe, limit, exchange.milliseconds())
+    if since is None:
+        new_bars = exchange.fetch_ohlcv(SYMBOL, timeframe=timeframe, limit=limit)
+    else:
+        new_bars = exchange.fetch_ohlcv(SYMBOL, timeframe=timeframe, since=since)
+
+    save_candles(cursor, symbol_id, timeframe, new_bars)
+    return new_bars
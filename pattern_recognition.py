@@ -305,10 +305,10 @@ def analyze_patterns(cursor, symbol_id, current_price):
     """
     # دریافت دیتا
     query = """
-        SELECT price as close, price as open, price as high, price as low, timestamp
+        SELECT price as close, price as open, price as high, price as low, ts_ms AS timestamp
         FROM rsi_data
         WHERE symbol_id = ?
-        ORDER BY timestamp DESC
+        ORDER BY ts_ms DESC
         LIMIT 100
     """
     cursor.execute(query, (symbol_id,))
@@ -14,6 +14,9 @@ from datetime import datetime, timedelta
 import pandas as pd
 import json
 import pytz
+import time_utils
+import rsi_rollup
+import history_store
 
 tz_tehran = pytz.timezone("Asia/Tehran")
 
@@ -79,24 +82,29 @@ def get_price_at_time(cursor, symbol_id, target_time):
     Returns:
         float or None
     """
-    # جستجوی نزدیک‌ترین قیمت به زمان مورد نظر (±5 دقیقه)
-    time_min = (target_time - timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S")
-    time_max = (target_time + timedelta(minutes=5)).strftime("%Y-%m-%d %H:%M:%S")
+    # جستجوی نزدیک‌ترین قیمت به زمان مورد نظر (±5 دقیقه) - بازه‌ی عددی روی ts_ms
+    # (datetime بدون منطقه مثل timestamp متنی rsi_data وقت تهران حساب میشه)
+    target_ms = time_utils.to_ms(target_time, tz_tehran)
+    window_ms = 5 * time_utils.MINUTE_MS
     
+    # (history_store فقط فایل دوره‌ی همون بازه رو attach میکنه)
     query = """
-        SELECT price, timestamp
-        FROM rsi_data
+        SELECT price, ts_ms
+        FROM {rsi_data}
         WHERE symbol_id = ? 
-        AND timestamp BETWEEN ? AND ?
-        ORDER BY ABS(julianday(?) - julianday(timestamp))
+        AND ts_ms BETWEEN ? AND ?
+        ORDER BY ABS(ts_ms - ?)
         LIMIT 1
     """
     
-    cursor.execute(query, (symbol_id, time_min, time_max, 
-                          target_time.strftime("%Y-%m-%d %H:%M:%S")))
-    result = cursor.fetchone()
+    start_ms, end_ms = target_ms - window_ms, target_ms + window_ms
+    results = history_store.execute(cursor, query, start_ms, end_ms,
+                                    (symbol_id, start_ms, end_ms, target_ms))
+    if results:
+        return results[0][0]
     
-    return result[0] if result else None
+    # قدیمی‌تر از بازه‌ی خام: از خلاصه‌ها (rsi_rollup)
+    return rsi_rollup.get_price_near(cursor, symbol_id, target_ms, window_ms)
 
 
 def track_signal_performance(cursor, signal_id, symbol_id, symbol_name, 
@@ -192,16 +200,19 @@ def track_old_signals(cursor, hours_ago=24, batch_size=500):
     query = """
         SELECT s.id, s.symbol_id, s.symbol_name, s.price, s.time, 
                s.advance_score, s.quality, s.testmode
-        FROM signals s
+        FROM {signals} s
         LEFT JOIN signal_performance sp ON s.id = sp.signal_id
         WHERE sp.signal_id IS NULL
-        AND s.time < ?
-        ORDER BY s.time ASC
+        AND s.time_ms < ?
+        ORDER BY s.time_ms ASC
         LIMIT ?
     """
     
-    cursor.execute(query, (cutoff_time.strftime("%Y-%m-%d %H:%M:%S"), batch_size))
-    old_signals = cursor.fetchall()
+    # سیگنال‌های منتقل شده به history/ هم (از قدیمی‌ترین) ردیابی میشن
+    cutoff_ms = time_utils.to_ms(cutoff_time)
+    old_signals = history_store.execute_ordered(
+        cursor, query, batch_size, (cutoff_ms,), end_ms=cutoff_ms, newest_first=False
+    )
     if not old_signals:
         print(f"✅ No more signals to track (older than {hours_ago}h)")
         return 0
@@ -378,11 +389,13 @@ def export_for_ml(cursor, output_file='ml_dataset.csv'):
             s.convergence_count,
             s.price_trend
         FROM signal_performance sp
-        JOIN signals s ON sp.signal_id = s.id
+        JOIN {signals} s ON sp.signal_id = s.id
         WHERE sp.change_1h IS NOT NULL
     """
     
-    df = pd.read_sql_query(query, cursor.connection)
+    # سیگنال‌های قدیمی در فایل‌های history هستن (history_store)
+    columns, rows = history_store.execute_each(cursor, query)
+    df = pd.DataFrame(rows, columns=columns)
     
     # استخراج feature ها
     if not df.empty:
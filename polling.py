@@ -0,0 +1,147 @@
+"""
+فرکانس polling تطبیقی برای هر نماد
+
+همه‌ی نمادها قبلا با یک فاصله‌ی refresh گرفته میشدن، چه RSI یک دقیقه‌ای
+50 باشه چه 28. الان هر نماد یک کلاس داره:
+    - hot:   نزدیک باندهای اشباع خرید/فروش (همون 30 / 75 هشدارهای main)
+             یا |advance_score| بزرگ (خرید/فروش در get_score_label) → refresh سریع‌تر
+    - quiet: همه‌ی RSI ها نزدیک 50 و امتیاز خنثی → refresh کندتر
+    - normal: بقیه
+ضریب هر کلاس روی فاصله‌ی refresh داخل کندل (scheduler.INTRA_CANDLE_REFRESH)
+اعمال میشه. بسته شدن کندل‌ها همیشه سر وقت گرفته میشه.
+
+بودجه‌ی سراسری: تعداد درخواست تخمینی در دقیقه (فقط تایم‌فریم‌هایی که از
+صرافی گرفته میشن) از REQUEST_BUDGET_PER_MINUTE بیشتر نمیشه؛ اگه بشه
+فاصله‌ی refresh همه با یک ضریب سراسری (scale) بیشتر میشه.
+"""
+
+import math
+import threading
+from collections import Counter
+
+import scheduler
+
+
+# باندهای RSI (مثل هشدارهای main.py)
+OVERSOLD = 30
+OVERBOUGHT = 75
+# فاصله از باند که نماد hot حساب میشه
+BAND_MARGIN = 5
+# محدوده‌ی RSI آروم (quiet)
+QUIET_LOW = 42
+QUIET_HIGH = 58
+# |advance_score| (مرزهای get_score_label)
+HOT_ADVANCED_SCORE = 40
+QUIET_ADVANCED_SCORE = 10
+# تایم‌فریم‌هایی که برای تشخیص نزدیکی به باند نگاه میشن
+WATCH_TIMEFRAMES = ("1m", "5m")
+
+# ضریب refresh هر کلاس
+CLASS_FACTORS = {
+    "hot": 0.5,
+    "normal": 1.0,
+    "quiet": 3.0,
+}
+
+# بودجه‌ی درخواست به صرافی در دقیقه (کل نمادها)
+REQUEST_BUDGET_PER_MINUTE = 600
+# بیشترین ضریب سراسری (بیشتر از این فقط بسته شدن کندل‌ها میمونه)
+MAX_SCALE = 32.0
+
+
+def classify(rsi_values, advanced_score=None):
+    """کلاس polling یک نماد از RSI ها و advance_score"""
+    watched = [rsi_values.get(tf) for tf in WATCH_TIMEFRAMES if rsi_values.get(tf) is not None]
+    score = abs(advanced_score or 0)
+
+    if score >= HOT_ADVANCED_SCORE:
+        return "hot"
+    for rsi in watched:
+        if rsi <= OVERSOLD + BAND_MARGIN or rsi >= OVERBOUGHT - BAND_MARGIN:
+            return "hot"
+
+    if watched and score < QUIET_ADVANCED_SCORE and all(QUIET_LOW <= rsi <= QUIET_HIGH for rsi in watched):
+        return "quiet"
+    return "normal"
+
+
+def requests_per_minute(timeframe, refresh, factor):
+    """تعداد اجرای تخمینی در دقیقه برای یک (نماد، تایم‌فریم)"""
+    tf_seconds = scheduler.TIMEFRAME_SECONDS[timeframe]
+    runs_per_candle = 1
+    if refresh:
+        interval = refresh * factor
+        if interval < tf_seconds:
+            runs_per_candle = math.ceil(tf_seconds / interval)
+    return runs_per_candle * 60 / tf_seconds
+
+
+class AdaptivePolling:
+    """کلاس هر نماد → ضریب refresh در CandleScheduler + ضریب سراسری بودجه"""
+
+    def __init__(self, job_scheduler, remote_timeframes, budget=REQUEST_BUDGET_PER_MINUTE):
+        self.scheduler = job_scheduler
+        self.remote_timeframes = list(remote_timeframes)
+        self.budget = budget
+        self.classes = {}    # {symbol_id: "hot" | "normal" | "quiet"}
+        self.estimated_rate = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, symbol_id, rsi_values, advanced_score=None):
+        """کلاس جدید یک نماد بعد از امتیازدهی"""
+        symbol_class = classify(rsi_values, advanced_score)
+        with self._lock:
+            self.classes[symbol_id] = symbol_class
+        self.scheduler.set_factor(symbol_id, CLASS_FACTORS[symbol_class])
+        return symbol_class
+
+    def _rate(self, counts, scale):
+        rate = 0.0
+        for symbol_class, count in counts.items():
+            factor = CLASS_FACTORS[symbol_class] * scale
+            for tf in self.remote_timeframes:
+                rate += count * requests_per_minute(tf, self.scheduler.refresh.get(tf), factor)
+        return rate
+
+    def rebalance(self, symbol_ids=None):
+        """
+        محاسبه‌ی ضریب سراسری برای ماندن در بودجه
+        symbol_ids: نمادهای فعال (کلاس نمادهای حذف شده پاک میشه)
+        نمادهایی که هنوز امتیاز نگرفتن normal حساب میشن
+        """
+        with self._lock:
+            if symbol_ids is None:
+                symbol_ids = list(self.scheduler.symbols)
+            active = set(symbol_ids)
+            for symbol_id in list(self.classes):
+                if symbol_id not in active:
+                    del self.classes[symbol_id]
+            counts = Counter(self.classes.get(symbol_id, "normal") for symbol_id in active)
+
+        scale = 1.0
+        if self._rate(counts, scale) > self.budget:
+            # جستجوی دودویی کوچکترین scale که در بودجه جا میشه
+            low, high = 1.0, MAX_SCALE
+            for _ in range(20):
+                mid = (low + high) / 2
+                if self._rate(counts, mid) > self.budget:
+                    low = mid
+                else:
+                    high = mid
+            scale = high
+
+        self.estimated_rate = self._rate(counts, scale)
+        self.scheduler.set_scale(scale)
+        return scale
+
+    def stats(self):
+        with self._lock:
+            counts = Counter(self.classes.values())
+        return {
+            'hot': counts.get("hot", 0),
+            'normal': counts.get("normal", 0),
+            'quiet': counts.get("quiet", 0),
+            'scale': round(self.scheduler.scale, 2),
+            'estimated_rate': round(self.estimated_rate, 1),
+            'budget': self.budget,
+        }
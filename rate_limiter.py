@@ -0,0 +1,225 @@
+"""
+محدودکننده‌ی نرخ درخواست به صرافی (token bucket) + backoff روی 429
+
+قبلا تنها کنترل، rate limit داخلی ccxt و sleep های ثابت بود. الان همه‌ی
+مسیرهای fetch (main، async_fetcher، ticker_snapshot، worker های sharded)
+از یک limiter مشترک در هر پردازه رد میشن:
+    - هر endpoint وزن خودش رو داره (ENDPOINT_WEIGHTS)
+    - توکن‌ها با نرخ rate در ثانیه پر میشن تا سقف capacity
+    - روی RateLimitExceeded / DDoSProtection ccxt: صبر نمایی با jitter و
+      کم کردن نرخ؛ با درخواست‌های موفق نرخ کم‌کم به سقف برمیگرده (AIMD)
+
+exchange ها با LimitedExchange / AsyncLimitedExchange پوشونده میشن و
+enableRateLimit خود ccxt خاموش میشه تا دو بار throttle نشه.
+"""
+
+import asyncio
+import random
+import threading
+import time
+
+import ccxt
+
+
+# نرخ پایه (وزن در ثانیه) و ظرفیت انفجاری
+RATE_PER_SECOND = 15.0
+BURST_CAPACITY = 30.0
+# کمترین نرخ بعد از خطاهای پشت سر هم
+MIN_RATE_PER_SECOND = 2.0
+
+# وزن هر endpoint (endpoint های ناشناخته وزن 1)
+ENDPOINT_WEIGHTS = {
+    "fetch_ohlcv": 1,
+    "fetch_tickers": 5,
+    "load_markets": 10,
+}
+
+# backoff نمایی روی خطای rate limit (ثانیه)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+MAX_RETRIES = 5
+# ضریب کاهش نرخ روی هر خطا و افزایش نرخ روی هر موفقیت (کسری از نرخ پایه)
+RATE_DECREASE = 0.7
+RATE_RECOVERY = 0.02
+
+RATE_LIMIT_ERRORS = (ccxt.RateLimitExceeded, ccxt.DDoSProtection)
+
+
+class TokenBucket:
+    """سطل توکن thread-safe؛ reserve زمان انتظار رو برمیگردونه (sync و async)"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def reserve(self, weight):
+        """
+        برداشتن weight توکن (ممکنه منفی بشه = صف)
+        خروجی: چند ثانیه باید صبر کرد تا نوبت این درخواست بشه
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            self.tokens -= weight
+            if self.tokens >= 0:
+                return 0.0
+            return -self.tokens / self.rate
+
+    def available(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            return self.tokens
+
+
+class RateLimiter:
+    """token bucket + backoff مشترک برای همه‌ی درخواست‌های یک پردازه"""
+
+    def __init__(self, rate=RATE_PER_SECOND, capacity=BURST_CAPACITY, weights=None):
+        self.max_rate = rate
+        self.bucket = TokenBucket(rate, capacity)
+        self.weights = dict(ENDPOINT_WEIGHTS if weights is None else weights)
+        self.backoff_until = 0.0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+        # آمار
+        self.requests = {}        # {endpoint: تعداد}
+        self.weight_used = 0
+        self.wait_seconds = 0.0
+        self.rate_limited = 0
+        self.started = time.time()
+
+    def set_rate(self, rate, capacity=None):
+        """تغییر نرخ پایه (مثلا تقسیم بودجه بین worker های sharded)"""
+        with self._lock:
+            self.max_rate = rate
+            self.bucket.rate = rate
+            if capacity is not None:
+                self.bucket.capacity = capacity
+
+    def acquire(self, endpoint):
+        """ثبت درخواست و زمان انتظار لازم (token bucket + backoff فعلی)"""
+        weight = self.weights.get(endpoint, 1)
+        wait = self.bucket.reserve(weight)
+        with self._lock:
+            wait = max(wait, self.backoff_until - time.time())
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.weight_used += weight
+            self.wait_seconds += max(wait, 0.0)
+        return max(wait, 0.0)
+
+    def on_success(self):
+        with self._lock:
+            self.failures = 0
+            if self.bucket.rate < self.max_rate:
+                self.bucket.rate = min(self.max_rate, self.bucket.rate + self.max_rate * RATE_RECOVERY)
+
+    def on_rate_limited(self, endpoint, error):
+        """backoff نمایی با jitter + کاهش نرخ؛ خروجی: ثانیه‌ی انتظار"""
+        with self._lock:
+            self.failures += 1
+            self.rate_limited += 1
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.failures - 1))
+            delay = random.uniform(delay / 2, delay)
+            self.backoff_until = max(self.backoff_until, time.time() + delay)
+            self.bucket.rate = max(MIN_RATE_PER_SECOND, self.bucket.rate * RATE_DECREASE)
+        print(f"⏳ rate limited on {endpoint} ({type(error).__name__}) - backoff {delay:.1f}s")
+        return delay
+
+    def call(self, endpoint, func, *args, **kwargs):
+        """اجرای درخواست همزمان (sync) با limiter و retry"""
+        for attempt in range(MAX_RETRIES + 1):
+            wait = self.acquire(endpoint)
+            if wait > 0:
+                time.sleep(wait)
+            try:
+                result = func(*args, **kwargs)
+            except RATE_LIMIT_ERRORS as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.on_rate_limited(endpoint, e)
+                continue
+            self.on_success()
+            return result
+
+    async def call_async(self, endpoint, func, *args, **kwargs):
+        """اجرای درخواست async با limiter و retry"""
+        for attempt in range(MAX_RETRIES + 1):
+            wait = self.acquire(endpoint)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                result = await func(*args, **kwargs)
+            except RATE_LIMIT_ERRORS as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                self.on_rate_limited(endpoint, e)
+                continue
+            self.on_success()
+            return result
+
+    def stats(self):
+        with self._lock:
+            elapsed = max(time.time() - self.started, 1.0)
+            return {
+                'rate': round(self.bucket.rate, 2),
+                'max_rate': self.max_rate,
+                'tokens': round(self.bucket.available(), 2),
+                'capacity': self.bucket.capacity,
+                'requests': dict(self.requests),
+                'weight_used': self.weight_used,
+                'weight_per_minute': round(self.weight_used * 60 / elapsed, 1),
+                'wait_seconds': round(self.wait_seconds, 1),
+                'rate_limited': self.rate_limited,
+                'backoff': round(max(self.backoff_until - time.time(), 0.0), 1),
+            }
+
+
+class LimitedExchange:
+    """exchange ccxt همزمان که endpoint های fetch از limiter رد میشن"""
+
+    def __init__(self, exchange, limiter):
+        exchange.enableRateLimit = False
+        self._exchange = exchange
+        self.limiter = limiter
+
+    def fetch_ohlcv(self, *args, **kwargs):
+        return self.limiter.call("fetch_ohlcv", self._exchange.fetch_ohlcv, *args, **kwargs)
+
+    def fetch_tickers(self, *args, **kwargs):
+        return self.limiter.call("fetch_tickers", self._exchange.fetch_tickers, *args, **kwargs)
+
+    def load_markets(self, *args, **kwargs):
+        # بعد از بار اول ccxt از کش میخونه و درخواستی نمیزنه
+        if self._exchange.markets and not kwargs.get('reload') and not args:
+            return self._exchange.markets
+        return self.limiter.call("load_markets", self._exchange.load_markets, *args, **kwargs)
+
+    def __getattr__(self, name):
+        # markets, id, close, ...
+        return getattr(self._exchange, name)
+
+
+class AsyncLimitedExchange(LimitedExchange):
+    """همون LimitedExchange برای ccxt.async_support"""
+
+    async def fetch_ohlcv(self, *args, **kwargs):
+        return await self.limiter.call_async("fetch_ohlcv", self._exchange.fetch_ohlcv, *args, **kwargs)
+
+    async def fetch_tickers(self, *args, **kwargs):
+        return await self.limiter.call_async("fetch_tickers", self._exchange.fetch_tickers, *args, **kwargs)
+
+    async def load_markets(self, *args, **kwargs):
+        if self._exchange.markets and not kwargs.get('reload') and not args:
+            return self._exchange.markets
+        return await self.limiter.call_async("load_markets", self._exchange.load_markets, *args, **kwargs)
+
+
+# limiter مشترک پردازه (همه‌ی exchange های sync و async)
+limiter = RateLimiter()
@@ -0,0 +1,128 @@
+"""
+benchmark کل مسیر fetch → امتیازدهی → ذخیره روی صرافی replay
+
+زمان مجازی صرافی دقیقه به دقیقه جلو میره و برای هر دقیقه، تایم‌فریم‌هایی
+که کندلشون بسته شده برای همه‌ی نمادهای فعال (که در منبع replay هستن) با
+همون main.fetch_and_save_symbol پردازش میشن. نوشتن‌ها (کندل با ساعت
+مجازی، rsi_data، signals) فقط روی دیتابیس جدای DB_PATH انجام میشن و
+روی data.db اصلی اجرا نمیشه.
+
+اجرا:
+    cp data.db /tmp/replay.db
+    DB_PATH=/tmp/replay.db python replay_benchmark.py <recordings_dir | replay.db> [minutes] [speed]
+speed: سرعت هدف نسبت به زمان واقعی (مثلا 10 یا 100)، 0 = با حداکثر سرعت
+"""
+
+import contextlib
+import os
+import sys
+import time
+
+import db_connection
+import db_setup
+import main
+import replay_exchange
+import scheduler
+
+
+def require_separate_database():
+    """benchmark روی data.db اصلی اجرا نمیشه (ردیف‌های ساعت مجازی وارد جدول‌ها میشن)"""
+    if db_connection.is_live_database(db_connection.DB_NAME):
+        raise RuntimeError(
+            f"replay benchmark refuses to write into the live database ({db_connection.LIVE_DB_NAME}); "
+            f"set DB_PATH to a copy, e.g. cp data.db /tmp/replay.db && DB_PATH=/tmp/replay.db"
+        )
+
+
+def due_timeframes(now_ms, first):
+    """تایم‌فریم‌هایی که کندلشون در این دقیقه بسته شده (دور اول همه)"""
+    if first:
+        return list(main.TIMEFRAMES)
+    now_s = now_ms // 1000
+    return [tf for tf in main.TIMEFRAMES if now_s % scheduler.TIMEFRAME_SECONDS[tf] < 60]
+
+
+def run_benchmark(source, minutes=60, speed=0, quiet=True):
+    """
+    اجرای benchmark و برگردوندن آمار
+    speed: اگه بیشتر از 0 باشه هر دقیقه‌ی مجازی 60/speed ثانیه‌ی واقعی طول میکشه
+    و بیشترین عقب افتادن (lag) گزارش میشه
+    """
+    require_separate_database()
+    db_setup.create_tables()  # migration های کپی
+    exchange = replay_exchange.ReplayExchange(replay_exchange.open_source(source), speed=0)
+    main.exchange = exchange  # بدون limiter: فقط هزینه‌ی خود pipeline اندازه گرفته میشه
+    exchange.load_markets()
+
+    symbols = [
+        (symbol_id, future_symbol.strip())
+        for symbol_id, future_symbol, base_symbol in main.get_active_symbols()
+        if future_symbol.strip() in exchange.markets
+    ]
+    if not symbols:
+        print("⚠️ no active symbol found in replay source")
+        return None
+    main.load_last_save_index()
+
+    jobs = 0
+    updates = 0
+    max_lag = 0.0
+    started = time.perf_counter()
+    output = open(os.devnull, "w") if quiet else None
+
+    for step in range(minutes):
+        exchange.clock.advance(replay_exchange.MINUTE_MS)
+        timeframes = due_timeframes(exchange.milliseconds(), step == 0)
+
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            for symbol_id, SYMBOL in symbols:
+                try:
+                    main.fetch_and_save_symbol(symbol_id, SYMBOL, timeframes)
+                except Exception as e:
+                    print(f"⚠️ Error {SYMBOL}:", e, file=sys.stderr)
+                jobs += 1
+                updates += len(timeframes)
+
+        if speed:
+            target = started + (step + 1) * 60 / speed
+            lag = time.perf_counter() - target
+            if lag < 0:
+                time.sleep(-lag)
+            max_lag = max(max_lag, lag)
+
+    main.writer.flush()
+    elapsed = time.perf_counter() - started
+    if output:
+        output.close()
+
+    return {
+        'symbols': len(symbols),
+        'virtual_minutes': minutes,
+        'wall_seconds': round(elapsed, 2),
+        'speed': round(minutes * 60 / elapsed, 1),
+        'jobs_per_second': round(jobs / elapsed, 1),
+        'timeframe_updates_per_second': round(updates / elapsed, 1),
+        'max_lag': round(max_lag, 2),
+        'exchange_calls': dict(exchange.calls),
+        'rows_written': main.writer.stats()['rows_written'],
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: DB_PATH=<copy of data.db> python replay_benchmark.py <recordings_dir | replay.db> [minutes] [speed]")
+        sys.exit(1)
+    try:
+        require_separate_database()
+    except RuntimeError as e:
+        print("⛔", e)
+        sys.exit(1)
+    result = run_benchmark(
+        sys.argv[1],
+        int(sys.argv[2]) if len(sys.argv) > 2 else 60,
+        float(sys.argv[3]) if len(sys.argv) > 3 else 0,
+    )
+    if result:
+        print("📈 replay benchmark")
+        for key, value in result.items():
+            print(f"   {key:<30} {value}")
@@ -0,0 +1,353 @@
+"""
+صرافی جایگزین (replay) برای اجرای آفلاین
+
+همون رابطی که main.exchange استفاده میکنه (fetch_ohlcv، fetch_tickers،
+load_markets، markets، milliseconds) رو داره ولی کندل‌ها رو از فایل‌های
+ضبط شده یا از جدول ohlcv یک دیتابیس میخونه. ساعت صرافی مجازیه:
+    - speed > 0: زمان مجازی با ضریب speed جلو میره (مثلا 10 یا 100 برابر)
+    - speed = 0: زمان فقط با clock.advance جلو میره (برای benchmark قدم به قدم)
+فقط کندل‌هایی برگردونده میشن که open_time شون از زمان مجازی گذشته.
+
+تاخیر شبکه (latency) و خطای تصادفی (error_rate) هم قابل تنظیمه تا
+limiter و مسیر خطاها هم تست بشن.
+
+فعال کردن در main / async_fetcher / get_symbols با متغیر محیطی:
+    REPLAY_SOURCE=recordings/   (پوشه‌ی فایل‌ها) یا REPLAY_SOURCE=replay.db
+    REPLAY_SPEED=10  REPLAY_LATENCY=0.05  REPLAY_ERROR_RATE=0.01  REPLAY_START=<ms>
+
+ساختن فایل‌های ضبط شده از جدول ohlcv:
+    python replay_exchange.py export data.db recordings/
+"""
+
+import asyncio
+import bisect
+import csv
+import os
+import random
+import sqlite3
+import sys
+import threading
+import time
+
+import ccxt
+
+import resampler
+
+
+REPLAY_SOURCE = os.environ.get("REPLAY_SOURCE")
+REPLAY_SPEED = float(os.environ.get("REPLAY_SPEED", "1"))
+REPLAY_LATENCY = float(os.environ.get("REPLAY_LATENCY", "0"))
+REPLAY_ERROR_RATE = float(os.environ.get("REPLAY_ERROR_RATE", "0"))
+REPLAY_START = os.environ.get("REPLAY_START")
+
+# تعداد کندل 1m قبل از زمان شروع پیش‌فرض (برای گرم شدن RSI)
+WARMUP_CANDLES = 200
+# حداکثر کندل در هر fetch_ohlcv (مثل محدودیت صرافی)
+MAX_LIMIT = 1000
+DEFAULT_LIMIT = 100
+# خطاهایی که به صورت تصادفی شبیه‌سازی میشن
+ERROR_TYPES = (ccxt.NetworkError, ccxt.RequestTimeout, ccxt.RateLimitExceeded)
+
+MINUTE_MS = 60 * 1000
+DAY_MS = 24 * 60 * MINUTE_MS
+
+
+# ─── منبع کندل‌ها ────────────────────────────────────────────
+
+def file_name(symbol, timeframe):
+    """اسم فایل ضبط شده‌ی (نماد، تایم‌فریم): BTC/USDT:USDT → BTC-USDT_USDT__1m.csv"""
+    return f"{symbol.replace('/', '-').replace(':', '_')}__{timeframe}.csv"
+
+
+def parse_file_name(name):
+    """برعکس file_name → (symbol, timeframe) یا None"""
+    if not name.endswith(".csv") or "__" not in name:
+        return None
+    key, timeframe = name[:-4].rsplit("__", 1)
+    return key.replace('_', ':').replace('-', '/'), timeframe
+
+
+class FileSource:
+    """کندل‌ها از فایل‌های CSV (هر خط: timestamp,open,high,low,close,volume)"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.files = {}  # {(symbol, timeframe): path}
+        for name in os.listdir(directory):
+            parsed = parse_file_name(name)
+            if parsed:
+                self.files[parsed] = os.path.join(directory, name)
+
+    def symbols(self):
+        return sorted({symbol for symbol, timeframe in self.files})
+
+    def load(self, symbol, timeframe):
+        path = self.files.get((symbol, timeframe))
+        if path is None:
+            return None
+        with open(path, newline="") as f:
+            return [[int(row[0])] + [float(v) for v in row[1:6]] for row in csv.reader(f) if row]
+
+
+class StoreSource:
+    """کندل‌ها از جدول ohlcv یک دیتابیس (نگاشت نماد با جدول symbols)"""
+
+    def __init__(self, db_name):
+        self.conn = sqlite3.connect(f"file:{db_name}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT id, future_symbol FROM symbols
+                WHERE id IN (SELECT DISTINCT symbol_id FROM ohlcv)
+            """).fetchall()
+        self.symbol_ids = {future_symbol.strip(): symbol_id for symbol_id, future_symbol in rows if future_symbol}
+
+    def symbols(self):
+        return sorted(self.symbol_ids)
+
+    def load(self, symbol, timeframe):
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            return None
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT open_time, open, high, low, close, volume
+                FROM ohlcv
+                WHERE symbol_id = ? AND timeframe = ?
+                ORDER BY open_time ASC
+            """, (symbol_id, timeframe)).fetchall()
+        return [list(r) for r in rows] or None
+
+
+def open_source(path):
+    """پوشه → FileSource، فایل دیتابیس → StoreSource"""
+    if os.path.isdir(path):
+        return FileSource(path)
+    return StoreSource(path)
+
+
+def save_recording(directory, symbol, timeframe, bars):
+    """ذخیره‌ی کندل‌ها (فرمت fetch_ohlcv) در فایل ضبط شده"""
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, file_name(symbol, timeframe)), "w", newline="") as f:
+        csv.writer(f).writerows(bars)
+
+
+def export_store(db_name, directory):
+    """تبدیل همه‌ی کندل‌های جدول ohlcv به فایل‌های ضبط شده"""
+    source = StoreSource(db_name)
+    count = 0
+    for symbol in source.symbols():
+        for timeframe in ["1m"] + resampler.RESAMPLED_TIMEFRAMES:
+            bars = source.load(symbol, timeframe)
+            if bars:
+                save_recording(directory, symbol, timeframe, bars)
+                count += 1
+    return count
+
+
+# ─── ساعت مجازی ─────────────────────────────────────────────
+
+class ReplayClock:
+    """زمان مجازی صرافی (میلی‌ثانیه)"""
+
+    def __init__(self, start_ms, speed=1.0):
+        self.start_ms = start_ms
+        self.speed = speed
+        self._started = time.monotonic()
+        self._offset = 0
+
+    def now_ms(self):
+        elapsed = (time.monotonic() - self._started) * 1000 * self.speed if self.speed else 0
+        return int(self.start_ms + elapsed + self._offset)
+
+    def advance(self, ms):
+        """جلو بردن دستی زمان (برای speed = 0)"""
+        self._offset += ms
+
+
+# ─── صرافی ──────────────────────────────────────────────────
+
+class ReplayExchange:
+    """صرافی آفلاین با رابط ccxt (همون متدهایی که fetcher ها صدا میزنن)"""
+
+    id = "replay"
+
+    def __init__(self, source, start_ms=None, speed=REPLAY_SPEED, latency=REPLAY_LATENCY,
+                 error_rate=REPLAY_ERROR_RATE, seed=None):
+        self.source = source
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.markets = None
+        self.enableRateLimit = False
+
+        self._bars = {}          # {(symbol, timeframe): [bars]}
+        self._open_times = {}    # {(symbol, timeframe): [open_time]}
+        self._quote_volume = {}  # {symbol: prefix sum حجم دلاری 1m}
+        self._lock = threading.Lock()
+
+        if start_ms is None:
+            start_ms = self.default_start_ms()
+        self.clock = ReplayClock(start_ms, speed)
+
+        # آمار
+        self.calls = {}
+        self.errors = 0
+
+    def default_start_ms(self):
+        """اولین زمانی که همه‌ی نمادها WARMUP_CANDLES کندل 1m قبلش دارن"""
+        starts = []
+        for symbol in self.source.symbols():
+            open_times = self._series(symbol, "1m")[1]
+            if open_times:
+                starts.append(open_times[min(WARMUP_CANDLES, len(open_times) - 1)])
+        return max(starts) if starts else int(time.time() * 1000)
+
+    def milliseconds(self):
+        return self.clock.now_ms()
+
+    def _series(self, symbol, timeframe):
+        """کندل‌ها و open_time های (نماد، تایم‌فریم)؛ اگه ضبط نشده از 1m ساخته میشه"""
+        key = (symbol, timeframe)
+        with self._lock:
+            if key not in self._bars:
+                bars = self.source.load(symbol, timeframe)
+                if bars is None and timeframe != resampler.BASE_TIMEFRAME:
+                    base = self.source.load(symbol, resampler.BASE_TIMEFRAME)
+                    bars = resampler.resample_candles(base, timeframe) if base else None
+                self._bars[key] = bars or []
+                self._open_times[key] = [bar[0] for bar in self._bars[key]]
+            return self._bars[key], self._open_times[key]
+
+    def _simulate_network(self, method):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            error_type = self.random.choice(ERROR_TYPES)
+            raise error_type(f"replay: simulated {error_type.__name__} in {method}")
+
+    def _delay(self):
+        return self.random.uniform(0, 2 * self.latency) if self.latency else 0
+
+    # ─── رابط ccxt ─────────────────────────────────────────
+
+    def _load_markets(self):
+        markets = {}
+        for symbol in self.source.symbols():
+            base, rest = symbol.split("/", 1)
+            quote = rest.split(":", 1)[0]
+            markets[symbol] = {
+                'id': symbol.replace('/', '').split(':')[0],
+                'symbol': symbol,
+                'base': base,
+                'quote': quote,
+                'type': 'swap' if ':' in symbol else 'spot',
+                'active': True,
+            }
+        self.markets = markets
+        return markets
+
+    def _fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None):
+        bars, open_times = self._series(symbol, timeframe)
+        if not bars:
+            raise ccxt.BadSymbol(f"replay: no candles for {symbol} {timeframe}")
+
+        end = bisect.bisect_right(open_times, self.milliseconds())
+        if since is None:
+            start = max(end - min(limit or DEFAULT_LIMIT, MAX_LIMIT), 0)
+        else:
+            start = bisect.bisect_left(open_times, since)
+            end = min(end, start + min(limit or MAX_LIMIT, MAX_LIMIT))
+        # کپی تا caller نتونه دیتای کش رو تغییر بده
+        return [list(bar) for bar in bars[start:end]]
+
+    def _fetch_tickers(self, symbols=None):
+        now = self.milliseconds()
+        tickers = {}
+        for symbol in symbols or self.source.symbols():
+            bars, open_times = self._series(symbol, "1m")
+            end = bisect.bisect_right(open_times, now)
+            if not end:
+                continue
+            prefix = self._quote_volume_prefix(symbol, bars)
+            start = bisect.bisect_left(open_times, now - DAY_MS)
+            last = bars[end - 1]
+            tickers[symbol] = {
+                'symbol': symbol,
+                'timestamp': now,
+                'last': last[4],
+                'close': last[4],
+                'quoteVolume': prefix[end] - prefix[start],
+            }
+        return tickers
+
+    def _quote_volume_prefix(self, symbol, bars):
+        prefix = self._quote_volume.get(symbol)
+        if prefix is None:
+            prefix = [0.0]
+            for bar in bars:
+                prefix.append(prefix[-1] + bar[4] * bar[5])
+            self._quote_volume[symbol] = prefix
+        return prefix
+
+    def load_markets(self, reload=False):
+        if self.markets and not reload:
+            return self.markets
+        time.sleep(self._delay())
+        self._simulate_network("load_markets")
+        return self._load_markets()
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params=None):
+        time.sleep(self._delay())
+        self._simulate_network("fetch_ohlcv")
+        return self._fetch_ohlcv(symbol, timeframe, since, limit)
+
+    def fetch_tickers(self, symbols=None, params=None):
+        time.sleep(self._delay())
+        self._simulate_network("fetch_tickers")
+        return self._fetch_tickers(symbols)
+
+    def close(self):
+        pass
+
+
+class AsyncReplayExchange(ReplayExchange):
+    """همون ReplayExchange با رابط ccxt.async_support"""
+
+    async def load_markets(self, reload=False):
+        if self.markets and not reload:
+            return self.markets
+        await asyncio.sleep(self._delay())
+        self._simulate_network("load_markets")
+        return self._load_markets()
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=None, params=None):
+        await asyncio.sleep(self._delay())
+        self._simulate_network("fetch_ohlcv")
+        return self._fetch_ohlcv(symbol, timeframe, since, limit)
+
+    async def fetch_tickers(self, symbols=None, params=None):
+        await asyncio.sleep(self._delay())
+        self._simulate_network("fetch_tickers")
+        return self._fetch_tickers(symbols)
+
+    async def close(self):
+        pass
+
+
+def create_replay_exchange(asynchronous=False, source=REPLAY_SOURCE):
+    """ساخت صرافی replay از تنظیمات REPLAY_* (برای main / async_fetcher / get_symbols)"""
+    start_ms = int(REPLAY_START) if REPLAY_START else None
+    exchange_class = AsyncReplayExchange if asynchronous else ReplayExchange
+    exchange = exchange_class(open_source(source), start_ms=start_ms)
+    print(f"⏪ replay exchange : {source} | speed x{exchange.clock.speed} "
+          f"| latency {exchange.latency}s | errors {exchange.error_rate:.0%}")
+    return exchange
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "export":
+        print(f"✅ {export_store(sys.argv[2], sys.argv[3])} files exported")
+    else:
+        print("usage: python replay_exchange.py export <db> <directory>")
@@ -0,0 +1,71 @@
+"""
+ساخت کندل‌های 5m / 15m / 1h / 4h از کندل‌های 1m ذخیره شده
+
+همه‌ی تایم‌فریم‌ها از همون معاملات ساخته میشن، پس به جای 5 درخواست
+fetch_ohlcv برای هر نماد فقط 1m از صرافی گرفته میشه و بقیه محلی ساخته میشن.
+مرز کندل‌ها مثل صرافی روی epoch (UTC) تراز میشه.
+
+تاریخچه‌ی اولیه‌ی هر تایم‌فریم (برای گرم شدن RSI) یک بار از صرافی گرفته میشه؛
+از اون به بعد ادامه‌ی کندل‌ها از 1m ساخته میشه.
+"""
+
+import ohlcv_store
+
+
+BASE_TIMEFRAME = "1m"
+RESAMPLED_TIMEFRAMES = ["5m", "15m", "1h", "4h"]
+
+
+def bucket_start(open_time, tf_ms):
+    """شروع کندل تایم‌فریم بالاتر که این open_time داخلش میفته"""
+    return open_time - open_time % tf_ms
+
+
+def resample_candles(bars, timeframe):
+    """
+    تجمیع کندل‌های 1m (فرمت fetch_ohlcv) به تایم‌فریم بالاتر
+    open=اولی، high=بیشترین، low=کمترین، close=آخری، volume=جمع
+    """
+    tf_ms = ohlcv_store.TIMEFRAME_MS[timeframe]
+    result = []
+    for open_time, o, h, l, c, v in bars:
+        start = bucket_start(open_time, tf_ms)
+        if result and result[-1][0] == start:
+            candle = result[-1]
+            candle[2] = max(candle[2], h)
+            candle[3] = min(candle[3], l)
+            candle[4] = c
+            candle[5] += v
+        else:
+            result.append([start, o, h, l, c, v])
+    return result
+
+
+def get_resample_since(cursor, symbol_id, timeframe, now_ms=None):
+    """
+    open_time آخرین کندل این تایم‌فریم اگه بشه ادامه‌ش رو از 1m ساخت، وگرنه None
+    (None یعنی تاریخچه‌ی این تایم‌فریم نیست یا 1m از شروع اون کندل ذخیره نشده
+    → باید از صرافی گرفته بشه)
+    now_ms: ساعت صرافی (exchange.milliseconds()) - در replay ساعت مجازیه
+    """
+    since = ohlcv_store.get_fetch_since(cursor, symbol_id, timeframe, now_ms=now_ms)
+    if since is None:
+        return None
+    if not ohlcv_store.has_candle(cursor, symbol_id, BASE_TIMEFRAME, since):
+        return None
+    return since
+
+
+def resample_from_store(cursor, symbol_id, timeframe, since):
+    """
+    ساخت و ذخیره‌ی کندل‌های تایم‌فریم از since به بعد
+    خروجی: (bars, as_of_ms)
+    as_of_ms = open_time آخرین کندل 1m؛ کندلی بسته حساب میشه که قبل از
+    این زمان تموم شده باشه (آخرین 1m ممکنه هنوز باز باشه)
+    """
+    base_bars = ohlcv_store.load_candles_since(cursor, symbol_id, BASE_TIMEFRAME, since)
+    if not base_bars:
+        return [], None
+    bars = resample_candles(base_bars, timeframe)
+    ohlcv_store.save_candles(cursor, symbol_id, timeframe, bars)
+    return bars, base_bars[-1][0]
@@ -0,0 +1,155 @@
+"""
+موتور RSI افزایشی (Wilder) برای هر (نماد، تایم‌فریم)
+
+به جای محاسبه‌ی دوباره‌ی RSI روی 200 کندل با ta در هر fetch،
+میانگین سود و ضرر (Wilder) نگه داشته میشه و با هر کندل بسته شده
+در O(1) آپدیت میشه. برای کندل در حال شکل‌گیری مقدار موقت (peek)
+برگردونده میشه بدون اینکه state تغییر کنه.
+
+فرمول دقیقا مثل ta.momentum.RSIIndicator:
+    ewm(alpha=1/window, adjust=False) با مقدار اولیه‌ی 0 روی اولین کندل
+پس بعد از گرم شدن (حدود 200 کندل) خروجی با ta یکیه.
+
+state هر (نماد، تایم‌فریم) توی جدول rsi_state ذخیره میشه تا بعد از
+ری‌استارت نیازی به گرم کردن دوباره نباشه.
+"""
+
+import time
+
+
+RSI_WINDOW = 14
+
+# کش state ها در حافظه: {(symbol_id, timeframe): WilderRSI}
+_states = {}
+
+
+class WilderRSI:
+    """state یک RSI (میانگین سود/ضرر Wilder + آخرین کندل بسته شده)"""
+
+    def __init__(self, symbol_id, timeframe, window=RSI_WINDOW):
+        self.symbol_id = symbol_id
+        self.timeframe = timeframe
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.avg_gain = 0.0
+        self.avg_loss = 0.0
+        self.last_close = None
+        self.last_open_time = None
+        self.count = 0  # تعداد کندل‌های بسته شده‌ی دیده شده
+
+    @staticmethod
+    def _rsi(avg_gain, avg_loss):
+        if avg_loss == 0:
+            return 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def _next_averages(self, close):
+        """میانگین‌های بعدی با یک close جدید (بدون تغییر state)"""
+        if self.last_close is None:
+            # اولین کندل: مثل ta، diff=NaN → سود و ضرر 0
+            return 0.0, 0.0
+        change = close - self.last_close
+        gain = change if change > 0 else 0.0
+        loss = -change if change < 0 else 0.0
+        alpha = 1 / self.window
+        avg_gain = self.avg_gain + alpha * (gain - self.avg_gain)
+        avg_loss = self.avg_loss + alpha * (loss - self.avg_loss)
+        return avg_gain, avg_loss
+
+    def update(self, open_time, close):
+        """اعمال یک کندل بسته شده - O(1)"""
+        self.avg_gain, self.avg_loss = self._next_averages(close)
+        self.last_close = close
+        self.last_open_time = open_time
+        self.count += 1
+
+    @property
+    def value(self):
+        """RSI آخرین کندل بسته شده یا None اگه هنوز گرم نشده"""
+        if self.count < self.window:
+            return None
+        return self._rsi(self.avg_gain, self.avg_loss)
+
+    def peek(self, close):
+        """RSI موقت با قیمت کندل در حال شکل‌گیری (state عوض نمیشه)"""
+        if self.count + 1 < self.window:
+            return None
+        avg_gain, avg_loss = self._next_averages(close)
+        return self._rsi(avg_gain, avg_loss)
+
+    def needs_warmup(self, bars, tf_ms):
+        """
+        آیا کندل‌های ورودی برای ادامه‌ی state کافی نیستن؟
+        (state خالیه یا بین آخرین کندل state و اولین کندل ورودی فاصله افتاده)
+        """
+        if self.count == 0 or not bars:
+            return True
+        return bars[0][0] > self.last_open_time + tf_ms
+
+    def apply_candles(self, bars, tf_ms, now_ms=None):
+        """
+        اعمال کندل‌ها با فرمت fetch_ohlcv
+        کندل‌های بسته شده‌ی جدید state رو جلو می‌برن، کندل باز فقط peek میشه
+        خروجی: RSI (موقت اگه کندل باز داریم) یا None
+        """
+        if now_ms is None:
+            now_ms = int(time.time() * 1000)
+
+        forming_close = None
+        for bar in bars:
+            open_time, close = bar[0], bar[4]
+            if open_time + tf_ms > now_ms:
+                forming_close = close
+            elif self.last_open_time is None or open_time > self.last_open_time:
+                self.update(open_time, close)
+
+        if forming_close is not None:
+            return self.peek(forming_close)
+        return self.value
+
+    def to_row(self):
+        return (self.symbol_id, self.timeframe, self.window, self.avg_gain, self.avg_loss,
+                self.last_close, self.last_open_time, self.count)
+
+
+def get_state(cursor, symbol_id, timeframe):
+    """state از کش حافظه، اگه نبود از جدول rsi_state، اگه نبود state خالی"""
+    key = (symbol_id, timeframe)
+    state = _states.get(key)
+    if state is not None:
+        return state
+
+    state = WilderRSI(symbol_id, timeframe)
+    cursor.execute("""
+        SELECT window, avg_gain, avg_loss, last_close, last_open_time, count
+        FROM rsi_state
+        WHERE symbol_id = ? AND timeframe = ?
+    """, (symbol_id, timeframe))
+    row = cursor.fetchone()
+    if row:
+        (state.window, state.avg_gain, state.avg_loss,
+         state.last_close, state.last_open_time, state.count) = row
+
+    _states[key] = state
+    return state
+
+
+def forget_states(symbol_ids):
+    """
+    پاک کردن state های حافظه‌ی این نمادها (همه‌ی تایم‌فریم‌ها)؛ بار بعد از
+    rsi_state خونده یا از کندل‌ها گرم میشن (مثلا نماد تازه به این worker رسیده)
+    """
+    symbol_ids = set(symbol_ids)
+    for key in [key for key in _states if key[0] in symbol_ids]:
+        _states.pop(key, None)
+
+
+def save_state(cursor, state):
+    """ذخیره state در جدول rsi_state (commit با caller)"""
+    cursor.execute("""
+        INSERT OR REPLACE INTO rsi_state
+        (symbol_id, timeframe, window, avg_gain, avg_loss, last_close, last_open_time, count)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, state.to_row())
@@ -0,0 +1,139 @@
+"""
+بافر حلقوی RSI های اخیر برای هر (نماد، تایم‌فریم)
+
+get_previous_rsi قبلا برای هر fetch یک کوئری BETWEEN میزد و اگه چیزی
+پیدا نمیشد با ORDER BY ABS(julianday(...)) کل ردیف‌های اون نماد رو اسکن
+میکرد. الان (timestamp, rsi) های اخیر کنار fetcher توی حافظه نگه داشته
+میشن و پیدا کردن مقدار قبلی یک bisect روی بافره.
+"""
+
+import bisect
+import threading
+import time
+
+
+# ظرفیت هر بافر (1m هر 30 ثانیه ذخیره میشه → 64 تا یعنی ~30 دقیقه)
+HISTORY_SIZE = 64
+
+# فاصله‌ی مقدار قبلی برای هر تایم‌فریم (دقیقه): هدف ± تلورانس
+PREVIOUS_RSI_WINDOWS = {
+    "1m":  {"target": 1,   "tolerance": 0.5},   # ±30 ثانیه
+    "5m":  {"target": 5,   "tolerance": 2},     # ±2 دقیقه
+    "15m": {"target": 15,  "tolerance": 5},
+    "1h":  {"target": 60,  "tolerance": 15},
+    "4h":  {"target": 240, "tolerance": 60}
+}
+
+
+class RsiRingBuffer:
+    """بافر حلقوی با اندازه‌ی ثابت از (timestamp, rsi) به ترتیب زمان"""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self._timestamps = [0.0] * size
+        self._rsi = [0.0] * size
+        self._start = 0
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, i):
+        """timestamp عنصر i ام (از قدیم به جدید) - برای bisect"""
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return self._timestamps[(self._start + i) % self.size]
+
+    def item(self, i):
+        index = (self._start + i) % self.size
+        return self._timestamps[index], self._rsi[index]
+
+    def append(self, timestamp, rsi):
+        """اضافه کردن مقدار جدید (قدیمی‌ترین در صورت پر بودن حذف میشه)"""
+        if self._count and timestamp < self[-1]:
+            return  # ترتیب زمانی باید حفظ بشه
+        if self._count < self.size:
+            index = (self._start + self._count) % self.size
+            self._count += 1
+        else:
+            index = self._start
+            self._start = (self._start + 1) % self.size
+        self._timestamps[index] = timestamp
+        self._rsi[index] = rsi
+
+    def find_previous(self, min_time, max_time):
+        """
+        آخرین مقدار در بازه‌ی [min_time, max_time]
+        اگه نبود: جدیدترین مقدار (نزدیک‌ترین به الان، مثل fallback قبلی)
+        خروجی: (timestamp, rsi) یا None
+        """
+        if not self._count:
+            return None
+        i = bisect.bisect_right(self, max_time) - 1
+        if i >= 0:
+            timestamp, rsi = self.item(i)
+            if timestamp >= min_time:
+                return timestamp, rsi
+        return self.item(self._count - 1)
+
+
+class RsiHistory:
+    """بافرهای همه‌ی (نماد، تایم‌فریم) ها"""
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self._buffers = {}
+        self._lock = threading.Lock()
+
+    def _buffer(self, symbol_id, timeframe):
+        key = (symbol_id, timeframe)
+        buffer = self._buffers.get(key)
+        if buffer is None:
+            buffer = self._buffers[key] = RsiRingBuffer(self.size)
+        return buffer
+
+    def append(self, symbol_id, timeframe, timestamp, rsi):
+        with self._lock:
+            self._buffer(symbol_id, timeframe).append(timestamp, rsi)
+
+    def get_previous_rsi(self, symbol_id, timeframe, now=None):
+        """
+        مقدار RSI حدود یک بازه قبل (PREVIOUS_RSI_WINDOWS) - بدون دیتابیس
+        خروجی: dict با فیلدهای rsi، timestamp یا None اگه چیزی پیدا نشد
+        """
+        if now is None:
+            now = time.time()
+        cfg = PREVIOUS_RSI_WINDOWS.get(timeframe, {"target": 5, "tolerance": 2})
+        target_time = now - cfg["target"] * 60
+        tolerance = cfg["tolerance"] * 60
+
+        with self._lock:
+            buffer = self._buffers.get((symbol_id, timeframe))
+            found = buffer.find_previous(target_time - tolerance, target_time + tolerance) if buffer else None
+        if found is None:
+            return None
+        return {"rsi": found[1], "timestamp": found[0]}
+
+    def load(self, cursor, lookback_minutes=None):
+        """
+        پر کردن بافرها از rsi_data (یک کوئری، فقط موقع شروع)
+        فقط بازه‌ای که get_previous_rsi لازم داره خونده میشه
+        """
+        if lookback_minutes is None:
+            lookback_minutes = max(w["target"] + w["tolerance"] for w in PREVIOUS_RSI_WINDOWS.values())
+        since_ms = int((time.time() - lookback_minutes * 60) * 1000)
+        cursor.execute("""
+            SELECT symbol_id, timeframe, ts_ms, rsi
+            FROM rsi_data
+            WHERE ts_ms >= ?
+            ORDER BY ts_ms ASC
+        """, (since_ms,))
+        count = 0
+        for symbol_id, timeframe, ts_ms, rsi in cursor.fetchall():
+            if rsi is None or ts_ms is None:
+                continue
+            self.append(symbol_id, timeframe, ts_ms / 1000, rsi)
+            count += 1
+        return count
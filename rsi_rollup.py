@@ -0,0 +1,217 @@
+"""
+نگهداری محدود rsi_data + خلاصه‌سازی (downsampling) ردیف‌های قدیمی
+
+rsi_data برای هر (نماد، تایم‌فریم) حدود هر 30 ثانیه یک ردیف میگیره و
+هیچوقت پاک نمیشد. الان فقط RAW_RETENTION_HOURS اخیر با دقت کامل میمونه
+و ردیف‌های قدیمی‌تر در هر bucket به طول ROLLUP_BUCKET_MINUTES به یک ردیف
+rsi_rollup تبدیل میشن:
+    rsi_last / rsi_min / rsi_max
+    price_open / price_high / price_low / price_close
+    volume (جمع) و samples (تعداد ردیف‌های خام)
+
+فشرده‌سازی تکه‌تکه‌ست: هر مرحله فقط CHUNK_BUCKETS bucket از قدیمی‌ترین
+ردیف‌ها رو در یک تراکنش کوتاه (insert خلاصه + delete خام) انجام میده و
+بین مرحله‌ها STEP_PAUSE صبر میکنه. thread پس‌زمینه (start) هر مرحله رو با
+DBWriter.call روی خود thread نویسنده‌ی fetcher اجرا میکنه، پس connection
+نوشتن دومی نیست و سر قفل نوشتن رقابتی نمیشه؛ صف writer حداکثر چند ده
+میلی‌ثانیه عقب میفته (WAL: خواننده‌ها اصلا منتظر نمیمونن).
+
+خوندن: load_chart_series و get_price_near هر دو جدول رو با هم میخونن، پس
+نمودارها و tracker بدون توجه به عمر داده همون جواب رو میگیرن.
+
+اجرا:
+    python rsi_rollup.py        (یک دور کامل تا رسیدن به بازه‌ی خام)
+یا thread پس‌زمینه (start) که run.py راه میندازه. اجرای دستی یک پردازه‌ی
+جداست با connection نوشتن خودش (کنار fetcher با busy_timeout صبر میکنه).
+"""
+
+import os
+import threading
+import time
+
+import db_connection
+import history_store
+import time_utils
+
+
+# بازه‌ی نگهداری rsi_data با دقت کامل (ساعت)
+RAW_RETENTION_HOURS = float(os.environ.get("RSI_RAW_RETENTION_HOURS", "48"))
+# طول هر bucket خلاصه (دقیقه)
+ROLLUP_BUCKET_MINUTES = 5
+# تعداد bucket در هر تراکنش
+CHUNK_BUCKETS = 2
+# مکث بین دو مرحله (ثانیه) - فرصت نوشتن برای fetcher
+STEP_PAUSE = 0.2
+# فاصله‌ی چک دوباره وقتی چیزی برای فشرده‌سازی نیست (ثانیه)
+COMPACT_INTERVAL = 10 * 60
+
+ROLLUP_BUCKET_MS = ROLLUP_BUCKET_MINUTES * time_utils.MINUTE_MS
+
+ROLLUP_SQL = """
+    INSERT INTO rsi_rollup (symbol_id, timeframe, bucket_ms, rsi_last, rsi_min, rsi_max,
+                            price_open, price_high, price_low, price_close, volume, samples)
+    SELECT g.symbol_id, g.timeframe, g.bucket_ms, l.rsi, g.rsi_min, g.rsi_max,
+           f.price, g.price_high, g.price_low, l.price, g.volume, g.samples
+    FROM (
+        SELECT symbol_id, timeframe, ts_ms - ts_ms % ?1 AS bucket_ms,
+               MIN(rsi) AS rsi_min, MAX(rsi) AS rsi_max,
+               MAX(price) AS price_high, MIN(price) AS price_low,
+               SUM(volume) AS volume, COUNT(*) AS samples,
+               MIN(id) AS first_id, MAX(id) AS last_id
+        FROM rsi_data
+        WHERE ts_ms >= ?2 AND ts_ms < ?3
+        GROUP BY symbol_id, timeframe, bucket_ms
+    ) AS g
+    JOIN rsi_data AS f ON f.id = g.first_id
+    JOIN rsi_data AS l ON l.id = g.last_id
+    WHERE true
+    ON CONFLICT (symbol_id, timeframe, bucket_ms) DO UPDATE SET
+        rsi_last = excluded.rsi_last,
+        rsi_min = MIN(rsi_min, excluded.rsi_min),
+        rsi_max = MAX(rsi_max, excluded.rsi_max),
+        price_high = MAX(price_high, excluded.price_high),
+        price_low = MIN(price_low, excluded.price_low),
+        price_close = excluded.price_close,
+        volume = volume + excluded.volume,
+        samples = samples + excluded.samples
+"""
+
+# آمار
+stats = {'rows': 0, 'buckets': 0, 'steps': 0, 'errors': 0}
+
+
+def raw_cutoff_ms(now_ms=None):
+    """ردیف‌های قدیمی‌تر از این زمان (اول bucket) خلاصه میشن"""
+    if now_ms is None:
+        now_ms = time_utils.now_ms()
+    cutoff = now_ms - int(RAW_RETENTION_HOURS * time_utils.HOUR_MS)
+    return cutoff - cutoff % ROLLUP_BUCKET_MS
+
+
+def compact_step(conn, now_ms=None):
+    """
+    خلاصه کردن قدیمی‌ترین تکه‌ی rsi_data در یک تراکنش
+    conn: connection نوشتن (connect_writer یا connection ـه DBWriter.call)
+    خروجی: تعداد ردیف‌های خام حذف شده (0 یعنی چیزی نمونده)
+    """
+    cutoff = raw_cutoff_ms(now_ms)
+    oldest = conn.execute("SELECT MIN(ts_ms) FROM rsi_data WHERE ts_ms < ?", (cutoff,)).fetchone()[0]
+    if oldest is None:
+        return 0
+    start = oldest - oldest % ROLLUP_BUCKET_MS
+    end = min(start + CHUNK_BUCKETS * ROLLUP_BUCKET_MS, cutoff)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        buckets = conn.execute(ROLLUP_SQL, (ROLLUP_BUCKET_MS, start, end)).rowcount
+        deleted = conn.execute(
+            "DELETE FROM rsi_data WHERE ts_ms >= ? AND ts_ms < ?", (start, end)
+        ).rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+    stats['rows'] += deleted
+    stats['buckets'] += buckets
+    stats['steps'] += 1
+    return deleted
+
+
+def compact(conn=None, max_steps=None, pause=STEP_PAUSE, writer=None):
+    """
+    فشرده‌سازی تا رسیدن به بازه‌ی خام (یا max_steps مرحله)
+    writer: هر مرحله روی thread ـه DBWriter اجرا میشه (conn لازم نیست)
+    """
+    total = 0
+    steps = 0
+    while max_steps is None or steps < max_steps:
+        deleted = writer.call(compact_step) if writer is not None else compact_step(conn)
+        if not deleted:
+            break
+        total += deleted
+        steps += 1
+        if pause:
+            time.sleep(pause)
+    return total
+
+
+def run_compaction(writer):
+    """حلقه‌ی thread پس‌زمینه (نوشتن‌ها روی DBWriter ـه پردازه)"""
+    while True:
+        try:
+            total = compact(writer=writer)
+            if total:
+                print(f"🗜️ rsi_data compacted : {total} rows → {stats['buckets']} buckets total "
+                      f"(raw kept {RAW_RETENTION_HOURS:g}h)")
+        except Exception as e:
+            stats['errors'] += 1
+            print("⚠️ rsi_data compaction error:", e)
+        time.sleep(COMPACT_INTERVAL)
+
+
+def start(writer):
+    thread = threading.Thread(target=run_compaction, args=(writer,), name="rsi-compaction", daemon=True)
+    thread.start()
+    return thread
+
+
+# ─── خوندن (خام + خلاصه) ────────────────────────────────────
+
+def load_chart_series(cursor, symbol_id, timeframe, bucket_ms, points):
+    """
+    آخرین RSI / قیمت هر bucket نمودار (از قدیم به جدید) از rsi_data و rsi_rollup
+    بازه از آخرین ذخیره‌ی نماد به عقب حساب میشه (نماد قدیمی هم نمودار داره)
+    خروجی: [(ts_ms, rsi, price)]
+    """
+    cursor.execute("""
+        SELECT COALESCE(
+            (SELECT MAX(ts_ms) FROM rsi_data WHERE symbol_id = ?1 AND timeframe = ?2),
+            (SELECT MAX(bucket_ms) FROM rsi_rollup WHERE symbol_id = ?1 AND timeframe = ?2)
+        )
+    """, (symbol_id, timeframe))
+    last_ms = cursor.fetchone()[0]
+    if last_ms is None:
+        return []
+    since = last_ms - bucket_ms * points
+
+    cursor.execute("""
+        SELECT MAX(ts_ms), rsi, price
+        FROM (
+            SELECT ts_ms, rsi, price
+            FROM rsi_data
+            WHERE symbol_id = ?1 AND timeframe = ?2 AND ts_ms >= ?3
+            UNION ALL
+            SELECT bucket_ms, rsi_last, price_close
+            FROM rsi_rollup
+            WHERE symbol_id = ?1 AND timeframe = ?2 AND bucket_ms >= ?3
+        )
+        GROUP BY ts_ms / ?4
+        ORDER BY ts_ms / ?4 DESC
+        LIMIT ?5
+    """, (symbol_id, timeframe, since, bucket_ms, points))
+    rows = cursor.fetchall()
+    rows.reverse()
+    return rows
+
+
+def get_price_near(cursor, symbol_id, target_ms, window_ms):
+    """قیمت نزدیک‌ترین bucket خلاصه به target_ms (±window_ms) یا None"""
+    start_ms, end_ms = target_ms - window_ms - ROLLUP_BUCKET_MS, target_ms + window_ms
+    results = history_store.execute(cursor, """
+        SELECT price_close
+        FROM {rsi_rollup}
+        WHERE symbol_id = ? AND bucket_ms BETWEEN ? AND ?
+        ORDER BY ABS(bucket_ms + ? - ?)
+        LIMIT 1
+    """, start_ms, end_ms, (symbol_id, start_ms, end_ms, ROLLUP_BUCKET_MS // 2, target_ms))
+    return results[0][0] if results else None
+
+
+if __name__ == "__main__":
+    conn = db_connection.connect_writer()
+    print(f"🗜️ compacting rsi_data older than {RAW_RETENTION_HOURS:g}h "
+          f"into {ROLLUP_BUCKET_MINUTES}m buckets...")
+    total = compact(conn)
+    print(f"✅ {total} rows compacted | {stats['buckets']} buckets | {stats['steps']} steps")
+    conn.close()
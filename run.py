@@ -2,15 +2,41 @@ import threading
 import time
 from db_setup import create_tables
 from app import app
-from main import run_fetcher_loop
+import main
+from main import run_fetcher_loop, start_market_cache
+import async_fetcher
+import sharded_fetcher
+import ws_stream
+import multi_exchange
+import rsi_rollup
+import history_store
+
+# "async" = fetcher همزمان با asyncio (سریع‌تر) | "sync" = حلقه‌ی قدیمی main.py
+# "sharded" = چند پردازه (sharded_fetcher) برای تعداد نماد زیاد
+# "stream" = دریافت کندل‌ها با WebSocket (ws_stream) به جای polling
+# "multi" = یک worker برای هر صرافی (multi_exchange)، هر نماد از تازه‌ترین صرافی
+FETCH_MODE = "async"
+
+FETCHERS = {
+    "async": async_fetcher.run_fetcher_loop,
+    "sync": run_fetcher_loop,
+    "sharded": sharded_fetcher.run_coordinator,
+    "stream": ws_stream.run_stream_loop,
+    "multi": multi_exchange.run_coordinator,
+}
 
 def run_flask():
     app.run(debug=True, port=5000, use_reloader=False)
 
 if __name__ == "__main__":
     create_tables()  # اطمینان از ساخت دیتابیس
+    # کارهای نگهداری روی thread نویسنده‌ی همین پردازه (main.writer) اجرا میشن
+    rsi_rollup.start(main.writer)  # خلاصه‌سازی rsi_data های قدیمی در پس‌زمینه
+    history_store.start(main.writer)  # انتقال داده‌های قدیمی به history/ (فایل هفتگی)
+    start_market_cache()  # کش بازارهای صرافی (دانلود بار اول + refresh پس‌زمینه)
 
-    t1 = threading.Thread(target=run_fetcher_loop, daemon=True)
+    fetcher = FETCHERS[FETCH_MODE]
+    t1 = threading.Thread(target=fetcher, daemon=True)
     t2 = threading.Thread(target=run_flask, daemon=True)
 
     t1.start()
@@ -0,0 +1,53 @@
+"""
+ایندکس درون‌حافظه‌ای آخرین زمان ذخیره‌ی rsi_data برای هر (نماد، تایم‌فریم)
+
+قبلا get_lastrsi_save_times برای هر نماد و هر تایم‌فریم یک کوئری
+MAX(timestamp) ... GROUP BY روی rsi_data میزد. الان یک بار موقع شروع با
+یک کوئری گروهی پر میشه و با هر insert آپدیت میشه؛ زمان‌بند از همین
+ایندکس میخونه.
+"""
+
+import threading
+
+
+class LastSaveIndex:
+    """{(symbol_id, timeframe): epoch آخرین ذخیره}"""
+
+    def __init__(self):
+        self._times = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, cursor):
+        """پر کردن ایندکس با یک کوئری گروهی (فقط یک بار موقع شروع)"""
+        cursor.execute("""
+            SELECT symbol_id, timeframe, MAX(ts_ms)
+            FROM rsi_data
+            GROUP BY symbol_id, timeframe
+        """)
+        times = {}
+        for symbol_id, timeframe, last_ms in cursor.fetchall():
+            if last_ms is None:
+                continue
+            times[(symbol_id, timeframe)] = last_ms / 1000
+        with self._lock:
+            self._times = times
+            self.loaded = True
+        return len(times)
+
+    def mark(self, symbol_id, timeframe, when):
+        """ثبت ذخیره‌ی جدید (epoch ثانیه)"""
+        with self._lock:
+            key = (symbol_id, timeframe)
+            if when > self._times.get(key, 0):
+                self._times[key] = when
+
+    def get(self, symbol_id, timeframe):
+        """آخرین زمان ذخیره یا None"""
+        with self._lock:
+            return self._times.get((symbol_id, timeframe))
+
+    def get_symbol(self, symbol_id):
+        """{timeframe: epoch} برای یک نماد (ورودی last_runs زمان‌بند)"""
+        with self._lock:
+            return {tf: t for (sid, tf), t in self._times.items() if sid == symbol_id}
@@ -0,0 +1,217 @@
+"""
+زمان‌بند fetch بر اساس بسته شدن کندل‌ها (min-heap)
+
+هر (نماد، تایم‌فریم) یک job با زمان سررسید (next_due) داره.
+زمان سررسید = زودترین بین:
+    - بسته شدن کندل بعدی (+ چند ثانیه تاخیر تا صرافی کندل رو نهایی کنه)
+    - آخرین اجرا + فاصله‌ی refresh داخل کندل (INTRA_CANDLE_REFRESH)
+پس حلقه‌ی fetcher دقیقا وقتی بیدار میشه که کاری هست و بیشترین سن
+دیتای هر تایم‌فریم محدوده (refresh + تاخیر صف).
+"""
+
+import heapq
+import threading
+import time
+
+
+# طول هر تایم‌فریم به ثانیه
+TIMEFRAME_SECONDS = {
+    "1m": 60,
+    "5m": 5 * 60,
+    "15m": 15 * 60,
+    "1h": 60 * 60,
+    "4h": 4 * 60 * 60,
+}
+
+# فاصله‌ی refresh داخل کندل (ثانیه) - RSI کندل باز با این فاصله آپدیت میشه
+INTRA_CANDLE_REFRESH = {
+    "1m": 30,
+    "5m": 2 * 60,
+    "15m": 5 * 60,
+    "1h": 20 * 60,
+    "4h": 60 * 60,
+}
+
+# تاخیر بعد از بسته شدن کندل (ثانیه) تا صرافی کندل رو نهایی کنه
+CLOSE_DELAY = 1.0
+
+
+class CandleScheduler:
+    """صف اولویت (next_due_time, symbol_id, timeframe) برای fetch"""
+
+    def __init__(self, timeframes, refresh=None, close_delay=CLOSE_DELAY):
+        self.timeframes = list(timeframes)
+        self.refresh = dict(INTRA_CANDLE_REFRESH if refresh is None else refresh)
+        self.close_delay = close_delay
+
+        self._heap = []
+        self._due = {}       # {(symbol_id, timeframe): due} - مقدار معتبر هر job
+        self.symbols = {}    # {symbol_id: future_symbol}
+        self.factors = {}    # {symbol_id: ضریب refresh} - کمتر از 1 یعنی سریع‌تر
+        self.scale = 1.0     # ضریب سراسری refresh (برای ماندن در بودجه‌ی درخواست)
+        self._lock = threading.Lock()
+
+        # آمار تاخیر (lateness = زمان اجرا - زمان سررسید)
+        self.jobs_run = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    def next_due(self, timeframe, last_run, factor=1.0):
+        """
+        زمان سررسید بعدی یک تایم‌فریم بعد از اجرا در last_run
+        factor: ضریب فاصله‌ی refresh داخل کندل (بسته شدن کندل همیشه سر وقته)
+        """
+        tf_seconds = TIMEFRAME_SECONDS[timeframe]
+        next_close = (int(last_run // tf_seconds) + 1) * tf_seconds + self.close_delay
+        refresh = self.refresh.get(timeframe)
+        if refresh:
+            return min(next_close, last_run + refresh * factor)
+        return next_close
+
+    def refresh_factor(self, symbol_id):
+        """ضریب refresh موثر یک نماد (ضریب خودش × ضریب سراسری)"""
+        return self.factors.get(symbol_id, 1.0) * self.scale
+
+    def set_factor(self, symbol_id, factor):
+        """ضریب refresh یک نماد (از اجرای بعدی اعمال میشه)"""
+        with self._lock:
+            if symbol_id in self.symbols:
+                self.factors[symbol_id] = factor
+
+    def set_scale(self, scale):
+        """ضریب سراسری refresh (از اجرای بعدی اعمال میشه)"""
+        with self._lock:
+            self.scale = scale
+
+    def _push(self, symbol_id, timeframe, due):
+        self._due[(symbol_id, timeframe)] = due
+        heapq.heappush(self._heap, (due, symbol_id, timeframe))
+
+    def add_symbol(self, symbol_id, SYMBOL, last_runs=None, now=None):
+        """
+        اضافه کردن نماد به صف
+        last_runs: {timeframe: epoch ثانیه آخرین ذخیره} تا بعد از ری‌استارت
+        تایم‌فریم‌هایی که تازه ذخیره شدن دوباره فوری گرفته نشن
+        """
+        if now is None:
+            now = time.time()
+        last_runs = last_runs or {}
+        with self._lock:
+            self.symbols[symbol_id] = SYMBOL
+            for tf in self.timeframes:
+                last_run = last_runs.get(tf)
+                due = now if last_run is None else self.next_due(tf, last_run, self.refresh_factor(symbol_id))
+                self._push(symbol_id, tf, due)
+
+    def remove_symbol(self, symbol_id):
+        """حذف نماد (entry های heap به صورت lazy دور ریخته میشن)"""
+        with self._lock:
+            self.symbols.pop(symbol_id, None)
+            self.factors.pop(symbol_id, None)
+            for tf in self.timeframes:
+                self._due.pop((symbol_id, tf), None)
+
+    def sync_symbols(self, symbols, last_runs_lookup=None, now=None):
+        """
+        هماهنگ کردن صف با نمادهای فعال (خروجی get_active_symbols)
+        last_runs_lookup(symbol_id) فقط برای نمادهای جدید صدا زده میشه
+        """
+        active = {}
+        for symbol_id, future_symbol, base_symbol in symbols:
+            active[symbol_id] = future_symbol
+
+        for symbol_id in list(self.symbols):
+            if symbol_id not in active:
+                self.remove_symbol(symbol_id)
+
+        for symbol_id, future_symbol in active.items():
+            if symbol_id not in self.symbols:
+                last_runs = last_runs_lookup(symbol_id) if last_runs_lookup else None
+                self.add_symbol(symbol_id, future_symbol, last_runs, now)
+            else:
+                self.symbols[symbol_id] = future_symbol
+
+    def _clean_top(self):
+        """دور ریختن entry های نامعتبر بالای heap"""
+        while self._heap:
+            due, symbol_id, timeframe = self._heap[0]
+            if self._due.get((symbol_id, timeframe)) == due:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now=None):
+        """
+        برداشتن همه‌ی job های سررسید شده
+        خروجی: [(symbol_id, SYMBOL, [timeframes...]), ...] به ترتیب سررسید،
+        تایم‌فریم‌های هر نماد به ترتیب self.timeframes (1m اول)
+        """
+        if now is None:
+            now = time.time()
+        grouped = {}
+        latenesses = []
+        with self._lock:
+            while True:
+                self._clean_top()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                due, symbol_id, timeframe = heapq.heappop(self._heap)
+                del self._due[(symbol_id, timeframe)]
+                grouped.setdefault(symbol_id, []).append(timeframe)
+                latenesses.append(now - due)
+
+            if latenesses:
+                self.jobs_run += len(latenesses)
+                self.last_lateness = max(latenesses)
+                self.max_lateness = max(self.max_lateness, self.last_lateness)
+                self.total_lateness += sum(latenesses)
+
+            return [
+                (symbol_id, self.symbols.get(symbol_id),
+                 [tf for tf in self.timeframes if tf in timeframes])
+                for symbol_id, timeframes in grouped.items()
+            ]
+
+    def reschedule(self, symbol_id, timeframes, last_run=None):
+        """برنامه‌ریزی دوباره‌ی job ها بعد از اجرا"""
+        if last_run is None:
+            last_run = time.time()
+        with self._lock:
+            if symbol_id not in self.symbols:
+                return
+            factor = self.refresh_factor(symbol_id)
+            for tf in timeframes:
+                self._push(symbol_id, tf, self.next_due(tf, last_run, factor))
+
+    def defer(self, symbol_id, timeframes, due):
+        """برنامه‌ریزی job ها در یک زمان مشخص (retry بعد از خطا / circuit breaker)"""
+        with self._lock:
+            if symbol_id not in self.symbols:
+                return
+            for tf in timeframes:
+                self._push(symbol_id, tf, due)
+
+    def seconds_until_next(self, now=None):
+        """ثانیه تا سررسید بعدی (None اگه صف خالیه)"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            self._clean_top()
+            if not self._heap:
+                return None
+            return max(self._heap[0][0] - now, 0.0)
+
+    def stats(self, now=None):
+        """عمق صف و آمار تاخیر"""
+        if now is None:
+            now = time.time()
+        with self._lock:
+            overdue = sum(1 for due in self._due.values() if due <= now)
+            return {
+                'queue_depth': len(self._due),
+                'overdue': overdue,
+                'jobs_run': self.jobs_run,
+                'last_lateness': round(self.last_lateness, 3),
+                'max_lateness': round(self.max_lateness, 3),
+                'avg_lateness': round(self.total_lateness / self.jobs_run, 3) if self.jobs_run else 0.0,
+            }
@@ -5,8 +5,10 @@
 
 from datetime import datetime
 import json
-import winsound
 import pytz
+import alerts
+import time_utils
+import history_store
 import advanced_indicator as ai
 import pattern_recognition as pr
 import statistical_analysis as sa
@@ -104,20 +106,19 @@ def save_signals_v6_sell_only(cursor, symbol_id, SYMBOL, last_price, rsi_values,
         cursor.execute(
             """INSERT INTO signals 
             (symbol_id, price, symbol_name, rsi_values, signal_type, advance_score, score, 
-             signal_label, quality, convergence_count, price_trend, time, testmode) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+             signal_label, quality, convergence_count, price_trend, time, time_ms, testmode) 
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (symbol_id, last_price, SYMBOL,
              json.dumps(rsi_values),
              json.dumps(full_data, default=str),
              final_score, score, signal_label,
              int(adjusted_confidence), convergence_count,
              result['stat_analysis']['bollinger']['signal'] if result['stat_analysis'] else 'neutral',
-             now, 'v6_sell_only')  # ✅ testmode جدید
+             now, time_utils.to_ms(now), 'v6_sell_only')  # ✅ testmode جدید
         )
         
         # آلارم
-        for _ in range(4):
-            winsound.Beep(2200, 150)
+        alerts.send(SYMBOL, 'v6_sell_only', f"V6 SELL | Score: {final_score:+.1f} | Conf: {adjusted_confidence:.1f}%", level=4, score=round(final_score, 1), confidence=round(adjusted_confidence, 1))
         print(f"\n🔔🔔🔔🔔 V6 SELL SIGNAL! {SYMBOL}")
         print(f"Score: {final_score:+.1f} | Conf: {adjusted_confidence:.1f}%")
         
@@ -217,20 +218,19 @@ def save_signals_v7_ultra_premium(cursor, symbol_id, SYMBOL, last_price, rsi_val
         cursor.execute(
             """INSERT INTO signals 
             (symbol_id, price, symbol_name, rsi_values, signal_type, advance_score, score, 
-             signal_label, quality, convergence_count, price_trend, time, testmode) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+             signal_label, quality, convergence_count, price_trend, time, time_ms, testmode) 
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (symbol_id, last_price, SYMBOL,
              json.dumps(rsi_values),
              json.dumps(full_data, default=str),
              final_score, score, signal_label,
              int(adjusted_confidence), convergence_count,
              result['stat_analysis']['bollinger']['signal'] if result['stat_analysis'] else 'neutral',
-             now, 'v7_ultra')  # ✅ testmode جدید
+             now, time_utils.to_ms(now), 'v7_ultra')  # ✅ testmode جدید
         )
         
         # آلارم ویژه!
-        for _ in range(5):
-            winsound.Beep(2500, 100)
+        alerts.send(SYMBOL, 'v7_ultra', f"V7 ULTRA PREMIUM | Score: {final_score:+.1f} | Conf: {adjusted_confidence:.1f}%", level=5, score=round(final_score, 1), confidence=round(adjusted_confidence, 1))
         print(f"\n🔔🔔🔔🔔🔔 V7 ULTRA PREMIUM! {SYMBOL}")
         print(f"Score: {final_score:+.1f} | Conf: {adjusted_confidence:.1f}%")
         
@@ -515,41 +515,38 @@ def save_signals_v5(cursor, symbol_id, SYMBOL, last_price, rsi_values, rsi_trend
         cursor.execute(
             """INSERT INTO signals 
             (symbol_id, price, symbol_name, rsi_values, signal_type, advance_score, score, 
-             signal_label, quality, convergence_count, price_trend, time, testmode) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+             signal_label, quality, convergence_count, price_trend, time, time_ms, testmode) 
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (symbol_id, last_price, SYMBOL,
              json.dumps(rsi_values),
              json.dumps(full_data, default=str),
              final_score, score, signal_label,
              int(adjusted_confidence), convergence_count,
              result['stat_analysis']['bollinger']['signal'] if result['stat_analysis'] else 'neutral',
-             now, 'v5_fixed')
+             now, time_utils.to_ms(now), 'v5_fixed')
         )
         
         # آلارم بر اساس کیفیت
         if adjusted_confidence >= 80 and risk_level < 60:
-            for _ in range(5):
-                winsound.Beep(2400, 120)
+            alert_level = 5
             print(f"\n🔔🔔🔔🔔🔔 EXCEPTIONAL! {SYMBOL}")
             
         elif adjusted_confidence >= 75:
-            for _ in range(4):
-                winsound.Beep(2200, 150)
+            alert_level = 4
             print(f"\n🔔🔔🔔🔔 EXCELLENT! {SYMBOL}")
             
         elif adjusted_confidence >= 70:
-            for _ in range(3):
-                winsound.Beep(2000, 200)
+            alert_level = 3
             print(f"\n🔔🔔🔔 VERY GOOD! {SYMBOL}")
             
         elif adjusted_confidence >= 65:
-            for _ in range(2):
-                winsound.Beep(1600, 250)
+            alert_level = 2
             print(f"\n🔔🔔 GOOD! {SYMBOL}")
         else:
-            winsound.Beep(1200, 300)
+            alert_level = 1
             print(f"\n🔔 Signal: {SYMBOL}")
         
+        alerts.send(SYMBOL, 'v5_fixed', f"{signal_label} | Score: {final_score:+.1f} | Conf: {adjusted_confidence:.1f}% | Risk: {risk_level:.1f}", level=alert_level, score=round(final_score, 1), confidence=round(adjusted_confidence, 1), risk=round(risk_level, 1))
         print(f"Score: {final_score:+.1f} | Conf: {adjusted_confidence:.1f}% | Risk: {risk_level:.1f}")
         
         return True
@@ -716,38 +713,37 @@ def save_signals_v4(cursor, symbol_id, SYMBOL, last_price, rsi_values, rsi_trend
         cursor.execute(
             """INSERT INTO signals 
             (symbol_id, price, symbol_name, rsi_values, signal_type, advance_score, score, 
-             signal_label, quality, convergence_count, price_trend, time, testmode) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+             signal_label, quality, convergence_count, price_trend, time, time_ms, testmode) 
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (symbol_id, last_price, SYMBOL,
              json.dumps(rsi_values),
              json.dumps(pattern_data, default=str) if pattern_data else json.dumps(rsi_trends),
              final_score, score, signal_label,
              int(confidence), convergence_count,
              result['pattern_analysis']['support_resistance']['position'] if result['pattern_analysis'] else 'neutral',
-             now, 'v4_patterns: PR')
+             now, time_utils.to_ms(now), 'v4_patterns: PR')
         )
         
         # آلارم با سطح‌های مختلف
         if confidence >= 80:
-            for _ in range(4):
-                winsound.Beep(2200, 150)
+            alert_level = 4
             print(f"\n🔔🔔🔔🔔 EXCEPTIONAL! {SYMBOL}")
             print(f"Score: {final_score} | Confidence: {confidence:.1f}%")
         elif confidence >= 70:
-            for _ in range(3):
-                winsound.Beep(2000, 200)
+            alert_level = 3
             print(f"\n🔔🔔🔔 EXCELLENT! {SYMBOL}")
             print(f"Score: {final_score} | Confidence: {confidence:.1f}%")
         elif confidence >= 60:
-            for _ in range(2):
-                winsound.Beep(1600, 250)
+            alert_level = 2
             print(f"\n🔔🔔 GOOD! {SYMBOL}")
             print(f"Score: {final_score} | Confidence: {confidence:.1f}%")
         else:
-            winsound.Beep(1200, 300)
+            alert_level = 1
             print(f"\n🔔 Signal: {SYMBOL}")
             print(f"Score: {final_score} | Confidence: {confidence:.1f}%")
         
+        alerts.send(SYMBOL, 'v4_patterns', f"{signal_label} | Score: {final_score} | Confidence: {confidence:.1f}%", level=alert_level, score=final_score, confidence=round(confidence, 1))
+        
         return True
         
     except Exception as e:
@@ -1117,21 +1113,29 @@ def calculate_advanced_score(rsi_values, rsi_trends, rsi_changes, price_trend=No
     return round(total_score, 2)
 
 
+def get_recent_prices(cursor, symbol_id, limit, columns="price"):
+    """
+    آخرین limit قیمت نماد (از جدید به قدیم) بدون توجه به عمرشون
+    (بعد از قطعی طولانی یا در replay هم خالی نمیشه؛ ایندکس symbol_id, ts_ms
+    فقط همین limit ردیف رو میخونه)
+    اگه data.db کمتر از limit ردیف داشت بقیه از فایل‌های history/ خونده میشه
+    """
+    return history_store.execute_ordered(cursor, f"""
+        SELECT {columns}
+        FROM {{rsi_data}}
+        WHERE symbol_id = ?
+        ORDER BY ts_ms DESC
+        LIMIT ?
+    """, limit, (symbol_id,))
+
+
 def calculate_price_trend_for_scalping(cursor, symbol_id, current_price):
     """
     ✅ روند قیمت برای scalping (کوتاه‌مدت)
     
     فقط 10-15 تا قیمت اخیر رو چک میکنه
     """
-    query = """
-        SELECT price
-        FROM rsi_data
-        WHERE symbol_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 15
-    """
-    cursor.execute(query, (symbol_id,))
-    results = cursor.fetchall()
+    results = get_recent_prices(cursor, symbol_id, 15)
     
     if len(results) < 5:
         return "neutral"
@@ -1163,15 +1167,7 @@ def calculate_price_trend_by_timeframe(cursor, symbol_id, current_price):
     # محاسبه تعداد دیتا (هر 30 ثانیه = 2 دیتا در دقیقه)
     data_count = minutes_lookback * 2
     
-    query = """
-        SELECT price, timestamp
-        FROM rsi_data
-        WHERE symbol_id = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """
-    cursor.execute(query, (symbol_id, data_count))
-    results = cursor.fetchall()
+    results = get_recent_prices(cursor, symbol_id, data_count, "price, ts_ms")
     
     # ✅ اگه دیتا کمه، neutral برمیگردونیم
     if len(results) < 5:
@@ -1225,7 +1221,7 @@ def calculate_multi_timeframe_trend(cursor, symbol_id, current_price):
         SELECT price
         FROM rsi_data
         WHERE symbol_id = ?
-        ORDER BY timestamp DESC
+        ORDER BY ts_ms DESC
         LIMIT 50
     """
     cursor.execute(query, (symbol_id,))
@@ -1308,15 +1304,7 @@ def calculate_price_trend_smart(cursor, symbol_id, current_price, rsi_values):
         threshold = 0.3
     
     # گرفتن قیمت‌ها
-    query = """
-        SELECT price
-        FROM rsi_data
-        WHERE symbol_id = ?
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """
-    cursor.execute(query, (symbol_id, lookback))
-    results = cursor.fetchall()
+    results = get_recent_prices(cursor, symbol_id, lookback)
     
     if len(results) < max(3, lookback // 2):
         return "neutral"
@@ -1341,15 +1329,7 @@ def calculate_price_trend_simple(cursor, symbol_id, current_price):
     """
     ✅ روش ساده: مقایسه با میانگین 5 قیمت قبلی
     """
-    query = """
-        SELECT price
-        FROM rsi_data
-        WHERE symbol_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 5
-    """
-    cursor.execute(query, (symbol_id,))
-    results = cursor.fetchall()
+    results = get_recent_prices(cursor, symbol_id, 5)
     
     if len(results) < 3:
         return "neutral"
@@ -1371,15 +1351,7 @@ def calculate_price_trend(cursor, symbol_id):
     ✅ محاسبه روند قیمت با EMA
     """
     # گرفتن 50 تا آخرین قیمت
-    query = """
-        SELECT price, timestamp
-        FROM rsi_data
-        WHERE symbol_id = ?
-        ORDER BY timestamp DESC
-        LIMIT 50
-    """
-    cursor.execute(query, (symbol_id,))
-    results = cursor.fetchall()
+    results = get_recent_prices(cursor, symbol_id, 50, "price, ts_ms")
     
     if len(results) < 20:
         return "neutral"
@@ -1416,7 +1388,7 @@ def calculate_volume_trend(cursor, symbol_id):
         SELECT volume
         FROM rsi_data
         WHERE symbol_id = ?
-        ORDER BY timestamp DESC
+        ORDER BY ts_ms DESC
         LIMIT 20
     """
     cursor.execute(query, (symbol_id,))
@@ -1507,30 +1479,30 @@ def save_signals_v3(cursor, symbol_id, SYMBOL, last_price, rsi_values, rsi_trend
         cursor.execute(
             """INSERT INTO signals 
             (symbol_id, price, symbol_name, rsi_values, signal_type, advance_score, score, 
-             signal_label, quality, convergence_count, price_trend, time, testmode) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+             signal_label, quality, convergence_count, price_trend, time, time_ms, testmode) 
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (symbol_id, last_price, SYMBOL, 
              json.dumps(rsi_values), 
              json.dumps(result['indicators'], default=str),  # ذخیره اندیکاتورها
              final_score, score, signal_label, 
              int(confidence), convergence_count, 
              result['indicators']['adx']['direction'] if result['indicators'] else 'neutral',
-             now, 'v3_indicators')
+             now, time_utils.to_ms(now), 'v3_indicators')
         )
         
         # آلارم
         if confidence >= 75:
-            for _ in range(3):
-                winsound.Beep(2000, 200)
+            alert_level = 3
             print(f"🔔🔔🔔 EXCELLENT! {SYMBOL}")
         elif confidence >= 60:
-            for _ in range(2):
-                winsound.Beep(1600, 250)
+            alert_level = 2
             print(f"🔔🔔 GOOD! {SYMBOL}")
         else:
-            winsound.Beep(1200, 300)
+            alert_level = 1
             print(f"🔔 Signal: {SYMBOL}")
         
+        alerts.send(SYMBOL, 'v3_indicators', f"{signal_label} | Score: {final_score} | Confidence: {confidence:.1f}%", level=alert_level, score=final_score, confidence=round(confidence, 1))
+        
         return True
         
     except Exception as e:
@@ -1807,28 +1779,27 @@ def save_signals_v2(cursor, symbol_id, SYMBOL, last_price, rsi_values, rsi_trend
         cursor.execute(
             """INSERT INTO signals 
             (symbol_id, price, symbol_name, rsi_values, signal_type, advance_score, score, 
-             signal_label, quality, convergence_count, price_trend, time,testmode) 
-            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?)""",
+             signal_label, quality, convergence_count, price_trend, time, time_ms, testmode) 
+            VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)""",
             (symbol_id, last_price, SYMBOL, json.dumps(rsi_values), json.dumps(rsi_trends),
              advanced_score, score, signal_label, quality_final, convergence_count, 
-             result['price_trend'], now,'savesignal2')
+             result['price_trend'], now, time_utils.to_ms(now), 'savesignal2')
         )
         
         # آلارم
         if quality_final >= 75:
-            for _ in range(3):
-                winsound.Beep(2000, 200)
+            alert_level = 3
             print(f"🔔🔔🔔 EXCELLENT! {SYMBOL} | Score: {advanced_score} | Quality: {quality_final}%")
             
         elif quality_final >= 60:
-            for _ in range(2):
-                winsound.Beep(1600, 250)
+            alert_level = 2
             print(f"🔔🔔 GOOD! {SYMBOL} | Score: {advanced_score} | Quality: {quality_final}%")
             
         else:
-            winsound.Beep(1200, 300)
+            alert_level = 1
             print(f"🔔 Signal: {SYMBOL} | Score: {advanced_score} | Quality: {quality_final}%")
         
+        alerts.send(SYMBOL, 'savesignal2', f"{signal_label} | Score: {advanced_score} | Quality: {quality_final}%", level=alert_level, score=advanced_score, quality=quality_final)
         print(f"   💰 Price: {result['price_trend']} ({result['price_change']:+.2f}%)")
         print(f"   📊 Volume: {result['volume_status']} ({result['volume_ratio']:.2f}x)")
         print(f"   🚀 RSI Momentum: {result['rsi_momentum']:+.2f}")
@@ -1862,30 +1833,31 @@ def save_signals(c_cursor , symbol_id , SYMBOL , last_price, rsi_values, rsi_tre
 
         now = datetime.now(tz_tehran)
         c_cursor.execute(
-            "INSERT INTO signals (symbol_id, price, symbol_name, rsi_values, signal_type ,advance_score ,score , signal_label, quality, convergence_count,price_trend,time,testmode ) VALUES (?, ?,?, ?, ?, ?, ?,?,?,?,?,?,?)",
-            (symbol_id, last_price, SYMBOL, json.dumps(rsi_values), json.dumps(rsi_trends) ,advanced_score ,score ,signal_label, quality, convergence_count, price_trend,now, 'savesignal')
+            "INSERT INTO signals (symbol_id, price, symbol_name, rsi_values, signal_type ,advance_score ,score , signal_label, quality, convergence_count,price_trend,time,time_ms,testmode ) VALUES (?, ?,?, ?, ?, ?, ?,?,?,?,?,?,?,?)",
+            (symbol_id, last_price, SYMBOL, json.dumps(rsi_values), json.dumps(rsi_trends) ,advanced_score ,score ,signal_label, quality, convergence_count, price_trend,now, time_utils.to_ms(now), 'savesignal')
         )
 
 
         # آلارم بر اساس کیفیت
+        alert_level = None
         if quality >= 85:
-            for _ in range(3):
-                winsound.Beep(2000, 200)
+            alert_level = 3
             print(f"🔔🔔🔔 EXCELLENT! {SYMBOL} | Score: {advanced_score} | Quality: {quality}% | Conv: {convergence_count}/5")
             
         elif quality >= 75:
-            for _ in range(2):
-                winsound.Beep(1600, 250)
+            alert_level = 2
             print(f"🔔🔔 GOOD! {SYMBOL} | Score: {advanced_score} | Quality: {quality}% | Conv: {convergence_count}/5")
             
         elif quality >= 60:
-            winsound.Beep(1200, 300)
+            alert_level = 1
             print(f"🔔 Signal: {SYMBOL} | Score: {advanced_score} | Quality: {quality}% | Conv: {convergence_count}/5")
 
         elif advanced_score >30 or advanced_score<-30:
-            freq = 1600 
-            winsound.Beep(freq, 400)
+            alert_level = 1
             print(f"✅ signal saved: {SYMBOL} - {signal_label}")
+
+        if alert_level:
+            alerts.send(SYMBOL, 'savesignal', f"{signal_label} | Score: {advanced_score} | Quality: {quality}% | Conv: {convergence_count}/5", level=alert_level, score=advanced_score, quality=quality)
         return True
         # conn.commit()
     return False
@@ -0,0 +1,91 @@
+"""
+غربال دو مرحله‌ای نمادها قبل از تحلیل سنگین
+
+مرحله‌ی 1 (ارزون): امتیاز RSI (calculate_score) و امتیاز پیشرفته
+(calculate_advanced_score) که فقط از RSI ها حساب میشن و برای همه‌ی
+نمادها اجرا میشن.
+مرحله‌ی 2 (سنگین): save_signals_v3 تا v7 که هر کدوم rsi_data میخونن و
+MACD / ADX / EMA / الگو / آمار حساب میکنن. فقط برای نمادهایی اجرا
+میشه که:
+    - |advance_score| یا |score| از آستانه بیشتره، یا
+    - بین همه‌ی نمادها جزو TOP_K تا با بیشترین |advance_score| هستن
+"""
+
+import heapq
+import threading
+
+
+# تعداد نمادهای برتر که همیشه تحلیل کامل میشن
+TOP_K = 10
+# آستانه‌ی |advance_score| برای تحلیل کامل (فیلترهای v3 تا v7 حداقل 25 میخوان)
+MIN_ADVANCED_SCORE = 15
+# آستانه‌ی |score| (امتیاز ساده‌ی RSI)
+MIN_SCORE = 20
+
+
+class Screener:
+    """آخرین امتیاز ارزون هر نماد + تصمیم اجرای مرحله‌ی سنگین"""
+
+    def __init__(self, top_k=TOP_K, min_advanced_score=MIN_ADVANCED_SCORE, min_score=MIN_SCORE):
+        self.top_k = top_k
+        self.min_advanced_score = min_advanced_score
+        self.min_score = min_score
+
+        self.scores = {}      # {symbol_id: (score, advanced_score)}
+        self._top = None      # کش top-K (با هر آپدیت باطل میشه)
+        self._lock = threading.Lock()
+
+        # آمار هر مرحله
+        self.screened = 0     # تعداد اجرای مرحله‌ی 1
+        self.deep = 0         # تعداد اجرای مرحله‌ی 2
+        self.by_threshold = 0
+        self.by_rank = 0
+
+    def update(self, symbol_id, score, advanced_score):
+        """ثبت امتیاز ارزون تازه‌ی یک نماد"""
+        with self._lock:
+            self.scores[symbol_id] = (score or 0, advanced_score or 0)
+            self._top = None
+
+    def sync_symbols(self, symbols):
+        """حذف نمادهای غیرفعال از رتبه‌بندی (خروجی get_active_symbols)"""
+        active = {symbol_id for symbol_id, future_symbol, base_symbol in symbols}
+        with self._lock:
+            for symbol_id in list(self.scores):
+                if symbol_id not in active:
+                    del self.scores[symbol_id]
+                    self._top = None
+
+    def _top_symbols(self):
+        if self._top is None:
+            self._top = set(heapq.nlargest(
+                self.top_k, self.scores, key=lambda s: abs(self.scores[s][1])
+            ))
+        return self._top
+
+    def is_candidate(self, symbol_id):
+        """آیا نماد باید وارد مرحله‌ی سنگین بشه؟ (آمار هم ثبت میشه)"""
+        with self._lock:
+            self.screened += 1
+            score, advanced_score = self.scores.get(symbol_id, (0, 0))
+
+            if abs(advanced_score) >= self.min_advanced_score or abs(score) >= self.min_score:
+                self.by_threshold += 1
+            elif advanced_score and symbol_id in self._top_symbols():
+                self.by_rank += 1
+            else:
+                return False
+
+            self.deep += 1
+            return True
+
+    def stats(self):
+        with self._lock:
+            return {
+                'tracked': len(self.scores),
+                'screened': self.screened,
+                'deep': self.deep,
+                'skipped': self.screened - self.deep,
+                'by_threshold': self.by_threshold,
+                'by_rank': self.by_rank,
+            }
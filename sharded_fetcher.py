@@ -0,0 +1,247 @@
+"""
+fetcher چند پردازه‌ای (sharded) برای همه‌ی نمادهای فعال
+
+coordinator نمادهای فعال جدول symbols رو با consistent hashing بین
+NUM_WORKERS پردازه تقسیم میکنه. هر worker همون حلقه‌ی async_fetcher رو
+فقط روی shard خودش اجرا میکنه. با فعال/غیرفعال شدن نمادها فقط نمادهای
+همون بخش از حلقه جابجا میشن (بقیه روی worker قبلی میمونن).
+
+همه‌ی نوشتن‌های worker ها (RemoteWriter) با یک صف به coordinator میرن و
+فقط DBWriter خود coordinator توی دیتابیس می‌نویسه، پس SQLite یک
+نویسنده داره. نرخ limiter و بودجه‌ی درخواست (polling) هم بین worker ها
+تقسیم میشه تا جمعشون از سقف صرافی بیشتر نشه.
+
+اجرا:
+    python sharded_fetcher.py
+"""
+
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import async_fetcher
+import db_writer
+import main
+import polling
+import rate_limiter
+import rsi_engine
+import screening
+
+
+# تعداد پردازه‌های fetch
+NUM_WORKERS = max(1, min(os.cpu_count() or 1, 8))
+# تعداد نقطه‌ی مجازی هر worker روی حلقه‌ی hash
+REPLICAS = 100
+# فاصله‌ی چک نمادهای فعال و سلامت worker ها (ثانیه)
+SHARD_SYNC_INTERVAL = 10
+# worker ای که snapshot قیمت همه‌ی نمادها (fetch_tickers) رو میگیره
+TICKER_WORKER = 0
+# حداکثر انتظار worker برای تایید flush از coordinator (ثانیه)
+FLUSH_TIMEOUT = 30
+
+
+def _hash(value):
+    return int(hashlib.md5(value.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """حلقه‌ی consistent hashing (هر worker با REPLICAS نقطه‌ی مجازی)"""
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        self.ring = sorted(
+            (_hash(f"{node}:{i}"), node)
+            for node in nodes
+            for i in range(replicas)
+        )
+        self.keys = [h for h, node in self.ring]
+
+    def node_for(self, key):
+        index = bisect.bisect(self.keys, _hash(str(key))) % len(self.keys)
+        return self.ring[index][1]
+
+
+def assign_shards(symbols, ring, num_workers):
+    """تقسیم نمادها (خروجی get_active_symbols) بین worker ها بر اساس symbol_id"""
+    shards = [[] for _ in range(num_workers)]
+    for symbol in symbols:
+        shards[ring.node_for(symbol[0])].append(symbol)
+    return shards
+
+
+# ─── سمت worker ─────────────────────────────────────────────
+
+class RemoteWriter(db_writer.DBWriter):
+    """
+    writer یک worker: دسته‌ها به جای دیتابیس به صف coordinator میرن
+    flush تا وقتی coordinator واقعا بنویسه صبر میکنه (read-your-writes)
+    token های flush یک nonce مخصوص این پردازه دارن: ack های باقیمونده‌ی
+    worker قبلی (قبل از restart) توی همون ack_queue، flush جدید رو تایید نمیکنن
+    """
+
+    def __init__(self, worker_id, write_queue, ack_queue):
+        super().__init__(db_name=None)
+        self.name = f"remote-writer-{worker_id}"
+        self.worker_id = worker_id
+        self.write_queue = write_queue
+        self.ack_queue = ack_queue
+        self._nonce = os.urandom(8).hex()
+        self._tokens = itertools.count(1)
+
+    def connect(self):
+        return None
+
+    def _write_batch(self, conn, batch):
+        self.write_queue.put(("write", batch))
+        self.rows_written += len(batch)
+        self.batches_written += 1
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        super().flush(timeout)  # دسته‌های محلی ارسال بشن
+        number = next(self._tokens)
+        self.write_queue.put(("flush", self.worker_id, (self._nonce, number)))
+        deadline = time.time() + timeout
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                print(f"⚠️ worker {self.worker_id}: flush timeout")
+                return
+            try:
+                nonce, acked = self.ack_queue.get(timeout=remaining)
+            except queue.Empty:
+                continue
+            if nonce == self._nonce and acked >= number:
+                return
+
+
+class ShardState:
+    """آخرین shard دریافتی از coordinator"""
+
+    def __init__(self, control_queue):
+        self.control_queue = control_queue
+        self.symbols = []
+        self.ticker_symbols = []
+
+    def _apply(self, message):
+        kind, symbols, ticker_symbols = message
+        if kind == "shard":
+            # state حافظه‌ی نمادهای تازه رسیده شاید مال دفعه‌ی قبلیه که این worker داشتشون
+            previous = {symbol[0] for symbol in self.symbols}
+            rsi_engine.forget_states(symbol[0] for symbol in symbols if symbol[0] not in previous)
+            self.symbols = symbols
+            self.ticker_symbols = ticker_symbols
+
+    def wait(self):
+        """صبر برای اولین shard"""
+        self._apply(self.control_queue.get())
+
+    def get_symbols(self):
+        while True:
+            try:
+                self._apply(self.control_queue.get_nowait())
+            except queue.Empty:
+                return self.symbols
+
+    def get_ticker_symbols(self):
+        return self.ticker_symbols
+
+
+def worker_main(worker_id, num_workers, control_queue, write_queue, ack_queue):
+    """نقطه‌ی ورود پردازه‌ی worker"""
+    main.use_writer(RemoteWriter(worker_id, write_queue, ack_queue))
+    main.FETCHER_NAME = f"worker-{worker_id}"
+    # نرخ limiter، بودجه‌ی درخواست و تعداد نمادهای تحلیل کامل بین worker ها تقسیم میشه
+    rate_limiter.limiter.set_rate(
+        rate_limiter.RATE_PER_SECOND / num_workers,
+        max(rate_limiter.BURST_CAPACITY / num_workers, max(rate_limiter.ENDPOINT_WEIGHTS.values()))
+    )
+    main.adaptive_polling.budget = polling.REQUEST_BUDGET_PER_MINUTE / num_workers
+    main.screener.top_k = max(1, screening.TOP_K // num_workers)
+    # کش بازارها رو coordinator دانلود میکنه؛ worker فقط فایل رو میخونه
+    main.start_market_cache(refresh=False)
+
+    shard = ShardState(control_queue)
+    shard.wait()
+    print(f"🧩 worker {worker_id} started : {len(shard.symbols)} symbols")
+    async_fetcher.run_fetcher_loop(shard.get_symbols, shard.get_ticker_symbols)
+
+
+# ─── سمت coordinator ────────────────────────────────────────
+
+def drain_writes(write_queue, ack_queues):
+    """نوشتن دسته‌های worker ها با DBWriter coordinator + جواب flush ها"""
+    while True:
+        item = write_queue.get()
+        if item[0] == "write":
+            for sql, params in item[1]:
+                main.writer.put(sql, params)
+        elif item[0] == "flush":
+            worker_id, token = item[1], item[2]
+            main.writer.flush()
+            ack_queues[worker_id].put(token)
+
+
+def run_coordinator(num_workers=NUM_WORKERS):
+    """تقسیم نمادها بین worker ها، rebalance و راه‌اندازی دوباره‌ی worker های مرده"""
+    # قبل از بالا اومدن worker ها تا با کش خالی هر کدوم جدا دانلود نکنن
+    main.start_market_cache()
+    ctx = multiprocessing.get_context("spawn")
+    write_queue = ctx.Queue()
+    ack_queues = [ctx.Queue() for _ in range(num_workers)]
+    control_queues = [ctx.Queue() for _ in range(num_workers)]
+
+    threading.Thread(
+        target=drain_writes, args=(write_queue, ack_queues),
+        name="shard-writes", daemon=True
+    ).start()
+
+    ring = HashRing(range(num_workers))
+    workers = [None] * num_workers
+    sent_shards = [None] * num_workers
+    last_symbols = None
+
+    while True:
+        symbols = main.get_active_symbols()
+        shards = assign_shards(symbols, ring, num_workers)
+        symbols_changed = symbols != last_symbols
+
+        if last_symbols is not None and symbols_changed:
+            added = set(symbols) - set(last_symbols)
+            removed = set(last_symbols) - set(symbols)
+            print(f"🔀 rebalance : +{len(added)} -{len(removed)} symbols")
+        last_symbols = symbols
+
+        for worker_id in range(num_workers):
+            process = workers[worker_id]
+            if process is None or not process.is_alive():
+                if process is not None:
+                    print(f"⚠️ worker {worker_id} exited ({process.exitcode}) - restarting")
+                process = ctx.Process(
+                    target=worker_main,
+                    args=(worker_id, num_workers, control_queues[worker_id],
+                          write_queue, ack_queues[worker_id]),
+                    name=f"fetch-worker-{worker_id}", daemon=True
+                )
+                process.start()
+                workers[worker_id] = process
+                sent_shards[worker_id] = None
+
+            ticker_worker = worker_id == TICKER_WORKER
+            if shards[worker_id] != sent_shards[worker_id] or (ticker_worker and symbols_changed):
+                control_queues[worker_id].put(
+                    ("shard", shards[worker_id], symbols if ticker_worker else [])
+                )
+                sent_shards[worker_id] = shards[worker_id]
+
+        sizes = " ".join(str(len(shard)) for shard in shards)
+        print(f"🧩 shards : [{sizes}] | db pending : {main.writer.stats()['pending']} "
+              f"--- now : {time.strftime('%H:%M:%S')}")
+        time.sleep(SHARD_SYNC_INTERVAL)
+
+
+if __name__ == "__main__":
+    run_coordinator()
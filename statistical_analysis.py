@@ -374,10 +374,10 @@ def analyze_statistical(cursor, symbol_id, current_price):
     """
     # دریافت دیتا
     query = """
-        SELECT price as close, price as high, price as low, timestamp
+        SELECT price as close, price as high, price as low, ts_ms AS timestamp
         FROM rsi_data
         WHERE symbol_id = ?
-        ORDER BY timestamp DESC
+        ORDER BY ts_ms DESC
         LIMIT 100
     """
     cursor.execute(query, (symbol_id,))
@@ -0,0 +1,125 @@
+"""
+مقایسه‌ی rsi_engine.WilderRSI با ta.momentum.RSIIndicator
+
+سری‌های تصادفی close از همه‌ی مسیرهای موتور رد میشن (گرم شدن، catch-up
+با apply_candles، بازیابی state از rsi_state) و هر مقدار باید با ta یکی باشه.
+
+اجرا (از ریشه‌ی repo):
+    python -m pytest -q tests
+"""
+
+import random
+
+import pandas as pd
+import pytest
+from ta.momentum import RSIIndicator
+
+import db_connection
+import db_setup
+import rsi_engine
+
+
+TOLERANCE = 1e-6
+TF_MS = 60 * 1000
+START_MS = 1_700_000_000_000
+
+
+def random_closes(seed, length=300, start=100.0):
+    rng = random.Random(seed)
+    closes = [start]
+    for i in range(length - 1):
+        # گاهی قیمت ثابت میمونه (سود و ضرر صفر)
+        step = 0.0 if i % 17 == 0 else rng.gauss(0, 1)
+        closes.append(max(0.01, closes[-1] + step))
+    return closes
+
+
+def ta_rsi(closes, window=rsi_engine.RSI_WINDOW):
+    """RSI هر کندل با ta (NaN قبل از گرم شدن → None)"""
+    series = RSIIndicator(pd.Series(closes), window=window).rsi()
+    return [None if pd.isna(value) else float(value) for value in series]
+
+
+def as_bars(closes):
+    return [[START_MS + i * TF_MS, c, c, c, c, 1.0] for i, c in enumerate(closes)]
+
+
+def assert_close(actual, expected, index):
+    if expected is None:
+        assert actual is None, f"candle {index}: expected None, got {actual}"
+    else:
+        assert actual is not None, f"candle {index}: expected {expected}, got None"
+        assert abs(actual - expected) < TOLERANCE, f"candle {index}: {actual} != {expected}"
+
+
+@pytest.fixture(autouse=True)
+def clear_state_cache():
+    rsi_engine._states.clear()
+    yield
+    rsi_engine._states.clear()
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_update_and_peek_match_ta(seed):
+    closes = random_closes(seed)
+    expected = ta_rsi(closes)
+    state = rsi_engine.WilderRSI(1, "1m")
+    for i, close in enumerate(closes):
+        # peek با کندل i قبل از بسته شدن همون RSI ای ـه که بعد از update میشه
+        assert_close(state.peek(close), expected[i], i)
+        state.update(START_MS + i * TF_MS, close)
+        assert_close(state.value, expected[i], i)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_apply_candles_catch_up_matches_ta(seed):
+    closes = random_closes(seed)
+    expected = ta_rsi(closes)
+    bars = as_bars(closes)
+    rng = random.Random(seed)
+    state = rsi_engine.WilderRSI(1, "1m")
+
+    # دسته‌های با اندازه‌ی تصادفی؛ کندل آخر هر دسته هنوز بازه (peek) و
+    # دسته‌ی بعد دوباره میادش، مثل fetch افزایشی با since
+    start = 0
+    while start < len(bars):
+        end = min(len(bars), start + rng.randint(1, 40))
+        now_ms = bars[end - 1][0] + TF_MS // 2
+        rsi = state.apply_candles(bars[start:end], TF_MS, now_ms)
+        assert_close(rsi, expected[end - 1], end - 1)
+        assert state.count == end - 1
+        start = end - 1 if end < len(bars) else end
+
+    # همه‌ی کندل‌ها بسته شدن
+    rsi = state.apply_candles(bars[-1:], TF_MS, bars[-1][0] + TF_MS)
+    assert_close(rsi, expected[-1], len(bars) - 1)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_state_restore_matches_ta(seed, tmp_path, monkeypatch):
+    monkeypatch.setattr(db_setup, "DB_NAME", str(tmp_path / "rsi.db"))
+    db_setup.create_tables()
+    conn = db_connection.connect_writer(db_setup.DB_NAME)
+    cursor = conn.cursor()
+
+    closes = random_closes(seed)
+    expected = ta_rsi(closes)
+    bars = as_bars(closes)
+    split = 120
+
+    state = rsi_engine.get_state(cursor, 1, "1m")
+    state.apply_candles(bars[:split], TF_MS, bars[split][0])
+    rsi_engine.save_state(cursor, state)
+    conn.commit()
+
+    # ری‌استارت: کش حافظه خالی، state از جدول rsi_state خونده میشه
+    rsi_engine._states.clear()
+    restored = rsi_engine.get_state(cursor, 1, "1m")
+    assert restored is not state
+    assert not restored.needs_warmup(bars[split:], TF_MS)
+    assert_close(restored.value, expected[split - 1], split - 1)
+
+    for i in range(split, len(bars)):
+        rsi = restored.apply_candles(bars[i:i + 1], TF_MS, bars[i][0] + TF_MS)
+        assert_close(rsi, expected[i], i)
+    conn.close()
@@ -0,0 +1,82 @@
+"""
+snapshot قیمت همه‌ی نمادهای فعال با یک درخواست fetch_tickers
+
+قیمت market_info قبلا فقط به عنوان اثر جانبی fetch کندل‌ها آپدیت میشد،
+پس برای نمادهای آخر صف چند دقیقه قدیمی بود. این مرحله هر
+TICKER_INTERVAL ثانیه قیمت آخر و حجم 24 ساعته‌ی همه رو با یک درخواست
+میگیره و در یک تراکنش (executemany) توی market_info می‌نویسه.
+
+snapshot ستون‌های خودش رو داره (ticker_price / ticker_ms / volume_24h)؛
+price / price_change / updated_ms فقط مال مسیر کندل‌ها و RSI هستن، پس
+وضعیت تازگی RSI داشبورد با snapshot ها ✅ نمیشه.
+"""
+
+import time_utils
+
+
+# فاصله‌ی بین دو snapshot (ثانیه)
+TICKER_INTERVAL = 5
+
+
+def get_ticker_symbols(exchange, symbols):
+    """
+    نگاشت نماد صرافی → symbol_id برای نمادهای فعال (خروجی get_active_symbols)
+    نمادهایی که صرافی نمیشناسه کنار گذاشته میشن تا کل درخواست خطا نده
+    """
+    symbol_ids = {}
+    for symbol_id, future_symbol, base_symbol in symbols:
+        market_symbol = future_symbol.strip()
+        if market_symbol in exchange.markets:
+            symbol_ids[market_symbol] = symbol_id
+    return symbol_ids
+
+
+def build_ticker_rows(symbol_ids, tickers):
+    """ردیف‌های آپدیت: (price, volume_24h, symbol_id)"""
+    rows = []
+    for market_symbol, ticker in tickers.items():
+        symbol_id = symbol_ids.get(market_symbol)
+        if symbol_id is None or ticker.get('last') is None:
+            continue
+        rows.append((ticker['last'], ticker.get('quoteVolume'), symbol_id))
+    return rows
+
+
+def save_ticker_rows(cursor, rows):
+    """
+    ذخیره‌ی snapshot در market_info (با WriterCursor همه در یک تراکنش نوشته میشن)
+    """
+    if not rows:
+        return 0
+    cursor.executemany(
+        "INSERT OR IGNORE INTO market_info (symbol_id) VALUES (?)",
+        [(row[2],) for row in rows]
+    )
+    cursor.executemany(f"""
+        UPDATE market_info
+        SET ticker_price = ?1,
+            volume_24h = ?2,
+            ticker_ms = {time_utils.SQL_NOW_MS}
+        WHERE symbol_id = ?3
+    """, rows)
+    return len(rows)
+
+
+def fetch_ticker_snapshot(exchange, cursor, symbols):
+    """مرحله‌ی snapshot با کلاینت همزمان (sync) ccxt"""
+    exchange.load_markets()
+    symbol_ids = get_ticker_symbols(exchange, symbols)
+    if not symbol_ids:
+        return 0
+    tickers = exchange.fetch_tickers(list(symbol_ids))
+    return save_ticker_rows(cursor, build_ticker_rows(symbol_ids, tickers))
+
+
+async def fetch_ticker_snapshot_async(exchange, cursor, symbols):
+    """مرحله‌ی snapshot با کلاینت async ccxt"""
+    await exchange.load_markets()
+    symbol_ids = get_ticker_symbols(exchange, symbols)
+    if not symbol_ids:
+        return 0
+    tickers = await exchange.fetch_tickers(list(symbol_ids))
+    return save_ticker_rows(cursor, build_ticker_rows(symbol_ids, tickers))
@@ -0,0 +1,75 @@
+"""
+تبدیل زمان‌ها به epoch میلی‌ثانیه UTC (عدد صحیح) و برعکس
+
+ستون‌های متنی زمان با منطقه‌های مختلف ذخیره شدن:
+    rsi_data.timestamp    : وقت تهران بدون منطقه ("%Y-%m-%d %H:%M:%S")
+    signals.time          : datetime تهران با منطقه ("... +03:30")
+    market_info.updated_at: CURRENT_TIMESTAMP (UTC)
+برای همین کنار هر کدوم یک ستون عددی UTC هست (rsi_data.ts_ms، signals.time_ms،
+market_info.updated_ms) که کوئری‌ها بازه‌ی زمانی / گروه‌بندی رو روی اون
+انجام میدن (بدون julianday / strftime روی هر ردیف). ستون‌های متنی فقط
+برای نمایش میمونن.
+"""
+
+import time
+from datetime import datetime
+
+import pytz
+
+
+tz_tehran = pytz.timezone("Asia/Tehran")
+
+DB_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+# اختلاف ثابت تهران با UTC (ایران از 1401 ساعت تابستانی نداره) - فقط برای
+# تبدیل دسته‌ای ستون‌های متنی قدیمی در migration
+TEHRAN_OFFSET_MS = 3 * HOUR_MS + 30 * MINUTE_MS
+
+# معادل CURRENT_TIMESTAMP در SQL به صورت epoch میلی‌ثانیه
+SQL_NOW_MS = "CAST(ROUND((julianday('now') - 2440587.5) * 86400000) AS INTEGER)"
+
+
+def sql_text_to_ms(column, offset_ms=0):
+    """
+    عبارت SQL تبدیل ستون متنی زمان به epoch میلی‌ثانیه
+    offset_ms: اختلاف منطقه‌ی متن با UTC (متن‌های با "+03:30" خودشون تبدیل میشن)
+    """
+    return (f"CAST(ROUND((julianday({column}) - 2440587.5) * 86400000) AS INTEGER)"
+            + (f" - {offset_ms}" if offset_ms else ""))
+
+
+def now_ms():
+    return int(time.time() * 1000)
+
+
+def to_ms(dt, tz=pytz.utc):
+    """datetime → epoch میلی‌ثانیه (datetime بدون منطقه با tz در نظر گرفته میشه)"""
+    if dt.tzinfo is None:
+        dt = tz.localize(dt)
+    return int(round(dt.timestamp() * 1000))
+
+
+def text_to_ms(text, tz=pytz.utc):
+    """متن زمان ("%Y-%m-%d %H:%M:%S" با یا بدون منطقه) → epoch میلی‌ثانیه"""
+    return to_ms(datetime.fromisoformat(text), tz)
+
+
+def tehran_text_to_ms(text):
+    """timestamp متنی rsi_data (وقت تهران) → epoch میلی‌ثانیه"""
+    return text_to_ms(text, tz_tehran)
+
+
+def from_ms(ms, tz=tz_tehran):
+    """epoch میلی‌ثانیه → datetime با منطقه‌ی tz"""
+    return datetime.fromtimestamp(ms / 1000, tz)
+
+
+def format_ms(ms, tz=tz_tehran, fmt=DB_TIME_FORMAT):
+    """epoch میلی‌ثانیه → متن نمایشی (پیش‌فرض وقت تهران)"""
+    if ms is None:
+        return ""
+    return from_ms(ms, tz).strftime(fmt)
@@ -7,16 +7,16 @@
 یا در main.py به عنوان thread جداگانه اجرا کنید
 """
 
-import sqlite3
 import time
 import schedule
 from datetime import datetime
 import performance_tracker as pt
+import db_connection
 
 
 def setup_database():
     """راه‌اندازی دیتابیس و جداول"""
-    conn = sqlite3.connect("data.db")
+    conn = db_connection.connect_writer()
     cursor = conn.cursor()
     
     # ساخت جدول performance
@@ -0,0 +1,149 @@
+"""
+سرور HTTP محلی برای تست آفلاین WebhookSink (alerts.py)
+
+هر POST به صورت JSON خونده و نگه داشته میشه (و در حالت serve چاپ میشه).
+با delay جواب هر درخواست چند ثانیه عقب میفته تا endpoint آویزون
+شبیه‌سازی بشه.
+
+اجرا:
+    python webhook_stub_server.py serve [port] [delay]
+    python webhook_stub_server.py check
+
+check سرور رو داخل همین پردازه بالا میاره و با یک AlertDispatcher که فقط
+WebhookSink داره این‌ها رو چک میکنه:
+    - هشدار به endpoint میرسه
+    - وقتی endpoint آویزونه، alert() (enqueue) بلاک نمیکنه
+    - هشدارهای تکراری (نماد، نوع) در صف یکی میشن و یک POST با count میرسه
+"""
+
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import alerts
+
+
+HOST = "127.0.0.1"
+PORT = 8000
+# حداکثر زمان مجاز یک enqueue در check (ثانیه)
+MAX_ENQUEUE_SECONDS = 0.05
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        alert = json.loads(self.rfile.read(length).decode("utf-8"))
+        with self.server.lock:
+            self.server.received.append(alert)
+        if self.server.verbose:
+            print(f"📨 {self.path} [{alert.get('kind')}] {alert.get('symbol')}: "
+                  f"{alert.get('message')} (x{alert.get('count')})")
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=PORT, delay=0, verbose=False):
+        super().__init__((HOST, port), StubHandler)
+        self.delay = delay
+        self.verbose = verbose
+        self.received = []
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{HOST}:{self.server_port}/hook"
+
+    def alerts_for(self, symbol):
+        with self.lock:
+            return [alert for alert in self.received if alert['symbol'] == symbol]
+
+
+def start_server(port=0, delay=0, verbose=False):
+    """سرور در thread پس‌زمینه (port=0 یعنی یک پورت آزاد)"""
+    server = StubServer(port, delay, verbose)
+    threading.Thread(target=server.serve_forever, name="webhook-stub", daemon=True).start()
+    return server
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def run_check(delay=1.0):
+    """چک‌های WebhookSink؛ خروجی: {اسم چک: (قبول شد؟، توضیح)}"""
+    server = start_server(delay=0)
+    dispatcher = alerts.AlertDispatcher([alerts.WebhookSink(server.url, timeout=delay + 2)])
+    dispatcher.start()
+    results = {}
+    try:
+        # 1) رسیدن هشدار
+        dispatcher.alert("BTC", "rsi_low", "RSI 25.00 | 1m", level=2, rsi=25.0)
+        ok = wait_for(lambda: server.alerts_for("BTC"))
+        got = server.alerts_for("BTC")
+        results['delivery'] = (
+            ok and got[0]['kind'] == "rsi_low" and got[0]['data'] == {'rsi': 25.0},
+            f"{len(got)} POST received"
+        )
+
+        # 2) endpoint آویزون: اولی worker رو نگه میداره، بقیه فقط صف میشن
+        server.delay = delay
+        dispatcher.alert("HANG", "rsi_low", "blocks the worker")
+        wait_for(lambda: server.alerts_for("HANG"))
+        slowest = 0.0
+        for i in range(200):
+            started = time.perf_counter()
+            dispatcher.alert(f"SYM{i % 20}", "rsi_high", f"RSI {70 + i % 5}")
+            slowest = max(slowest, time.perf_counter() - started)
+        results['non_blocking'] = (
+            slowest < MAX_ENQUEUE_SECONDS,
+            f"slowest enqueue {slowest * 1000:.2f} ms while endpoint hangs {delay:g}s"
+        )
+
+        # 3) یکی شدن تکراری‌ها: 200 هشدار روی 20 کلید → 20 POST با count=10
+        server.delay = 0
+        ok = wait_for(lambda: all(server.alerts_for(f"SYM{i}") for i in range(20)), timeout=delay + 10)
+        time.sleep(0.2)
+        counts = [alert['count'] for i in range(20) for alert in server.alerts_for(f"SYM{i}")]
+        results['coalescing'] = (
+            ok and len(counts) == 20 and all(count == 10 for count in counts),
+            f"{len(counts)} POST for 200 alerts on 20 keys | counts {sorted(set(counts))}"
+        )
+    finally:
+        dispatcher.stop()
+        server.shutdown()
+        server.server_close()
+    return results
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    if mode == "check":
+        results = run_check()
+        print("🧪 webhook sink check")
+        for name, (passed, detail) in results.items():
+            print(f"   {'✅' if passed else '❌'} {name:<14} {detail}")
+        sys.exit(0 if all(passed for passed, _ in results.values()) else 1)
+    else:
+        args = sys.argv[2:]
+        port = int(args[0]) if args else PORT
+        delay = float(args[1]) if len(args) > 1 else 0
+        server = StubServer(port, delay, verbose=True)
+        print(f"🧪 stub webhook server on {server.url}")
+        server.serve_forever()
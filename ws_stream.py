@@ -0,0 +1,439 @@
+"""
+حالت دریافت stream کندل‌ها با WebSocket (به جای polling REST)
+
+برای همه‌ی نمادهای فعال کانال کندل 1m صرافی (پروتکل public v2 بیت‌گت)
+subscribe میشه. هر آپدیت کندل توی بافر میره و حلقه‌ی پردازش، نمادهای
+آپدیت شده رو حداکثر هر MIN_SYMBOL_INTERVAL ثانیه روی thread ذخیره‌ی
+async_fetcher پردازش میکنه، پس خوندن WebSocket ها پشت flush و امتیازدهی
+نمیمونه:
+    - هر بار فقط RSI درون‌حافظه‌ای 1m (live_rsi) آپدیت میشه
+    - ذخیره با همون مسیر async_fetcher.process_symbol (ohlcv، rsi_data،
+      market_info و امتیازدهی) فقط وقتی که حلقه‌ی polling هم ذخیره میکرد:
+      با بسته شدن کندل 1m یا بعد از فاصله‌ی refresh داخل کندل از آخرین
+      ذخیره (main.last_save_index و main.job_scheduler)
+تایم‌فریم‌های بزرگ‌تر مثل حلقه‌ی عادی از 1m ذخیره شده ساخته میشن.
+
+نمادها روی چند اتصال (SYMBOLS_PER_CONNECTION) پخش میشن. هر اتصال بعد از
+قطع شدن با تاخیر RECONNECT_DELAYS دوباره وصل میشه، همه‌ی کانال‌هاش رو
+دوباره subscribe میکنه و فاصله‌ی قطعی با REST پر میشه (backfill همون
+run_due_jobs حلقه‌ی async).
+
+اجرا:
+    python ws_stream.py
+    WS_URL=ws://127.0.0.1:8765/ws STREAM_BACKFILL=0 python ws_stream.py   (سرور تست محلی)
+"""
+
+import asyncio
+import json
+import os
+import time
+
+import aiohttp
+
+import async_fetcher
+import main
+import ohlcv_store
+import resampler
+import rsi_engine
+
+
+WS_URL = os.environ.get("WS_URL", "wss://ws.bitget.com/v2/ws/public")
+INST_TYPE = "USDT-FUTURES"
+STREAM_TIMEFRAME = resampler.BASE_TIMEFRAME
+STREAM_TIMEFRAME_MS = ohlcv_store.TIMEFRAME_MS[STREAM_TIMEFRAME]
+CHANNEL = f"candle{STREAM_TIMEFRAME}"
+# پر کردن فاصله‌ی قطعی با REST بعد از هر اتصال (برای تست آفلاین 0)
+STREAM_BACKFILL = os.environ.get("STREAM_BACKFILL", "1") != "0"
+
+# تعداد کانال هر اتصال و تعداد کانال هر پیام subscribe
+SYMBOLS_PER_CONNECTION = 200
+SUBSCRIBE_BATCH = 50
+# ping متنی صرافی (ثانیه) و حداکثر سکوت قبل از اتصال دوباره
+PING_INTERVAL = 25
+READ_TIMEOUT = 60
+# تاخیر اتصال دوباره بعد از قطعی اول، دوم، ... (ثانیه)
+RECONNECT_DELAYS = [1, 2, 5, 10, 30]
+# فاصله‌ی حلقه‌ی پردازش و کمترین فاصله‌ی پردازش هر نماد (ثانیه)
+PROCESS_INTERVAL = 0.5
+MIN_SYMBOL_INTERVAL = 1.0
+# فاصله‌ی چک نمادهای فعال و چاپ آمار (ثانیه)
+SYMBOL_SYNC_INTERVAL = 30
+# تعداد نماد هر دسته‌ی backfill
+BACKFILL_BATCH = 20
+
+
+def inst_id(SYMBOL):
+    """id نماد در صرافی (BTC/USDT:USDT → BTCUSDT) - از markets اگه لود شده"""
+    SYMBOL = SYMBOL.strip()
+    markets = main.exchange.markets or {}
+    if SYMBOL in markets:
+        return markets[SYMBOL]['id']
+    return SYMBOL.split(":")[0].replace("/", "")
+
+
+def parse_candles(data):
+    """کندل‌های پیام صرافی (رشته) → [open_time, open, high, low, close, volume]"""
+    return [
+        [int(row[0]), float(row[1]), float(row[2]), float(row[3]), float(row[4]), float(row[5])]
+        for row in data
+    ]
+
+
+def subscribe_message(op, inst_ids):
+    return json.dumps({
+        'op': op,
+        'args': [{'instType': INST_TYPE, 'channel': CHANNEL, 'instId': i} for i in inst_ids],
+    })
+
+
+class StreamStats:
+    def __init__(self):
+        self.messages = 0
+        self.candles = 0
+        self.connects = 0
+        self.reconnects = 0
+        self.backfills = 0
+        self.processed = 0
+        self.live_updates = 0
+        self.errors = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.started = time.time()
+
+    def on_message(self, server_ts):
+        self.messages += 1
+        if server_ts:
+            lag = max(time.time() - server_ts / 1000, 0.0)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+
+    def as_dict(self):
+        elapsed = max(time.time() - self.started, 1.0)
+        return {
+            'messages': self.messages,
+            'messages_per_second': round(self.messages / elapsed, 1),
+            'candles': self.candles,
+            'processed': self.processed,
+            'live_updates': self.live_updates,
+            'connects': self.connects,
+            'reconnects': self.reconnects,
+            'backfills': self.backfills,
+            'errors': self.errors,
+            'last_lag': round(self.last_lag, 3),
+            'max_lag': round(self.max_lag, 3),
+        }
+
+
+class StreamConnection:
+    """
+    یک اتصال WebSocket با مجموعه‌ی کانال‌های خودش
+    on_candles(inst_id, candles) برای هر آپدیت و on_connect(inst_ids) بعد از
+    هر اتصال (برای backfill) صدا زده میشن
+    """
+
+    def __init__(self, index, on_candles, on_connect=None, url=WS_URL, stats=None):
+        self.index = index
+        self.url = url
+        self.on_candles = on_candles
+        self.on_connect = on_connect
+        self.stats = stats or StreamStats()
+        self.inst_ids = set()
+        self.ws = None
+        self.failures = 0
+        self.connects = 0
+        self._tasks = set()
+
+    def _start_backfill(self, inst_ids):
+        if self.on_connect and inst_ids:
+            task = asyncio.create_task(self.on_connect(inst_ids))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _send_subscribe(self, op, inst_ids):
+        inst_ids = sorted(inst_ids)
+        for i in range(0, len(inst_ids), SUBSCRIBE_BATCH):
+            await self.ws.send_str(subscribe_message(op, inst_ids[i:i + SUBSCRIBE_BATCH]))
+
+    async def set_inst_ids(self, inst_ids):
+        """تغییر کانال‌ها؛ اگه وصله فقط تفاوت subscribe / unsubscribe میشه"""
+        inst_ids = set(inst_ids)
+        added = inst_ids - self.inst_ids
+        removed = self.inst_ids - inst_ids
+        self.inst_ids = inst_ids
+        if self.ws is None or self.ws.closed:
+            return
+        try:
+            if removed:
+                await self._send_subscribe("unsubscribe", removed)
+            if added:
+                await self._send_subscribe("subscribe", added)
+                self._start_backfill(added)
+        except (aiohttp.ClientError, ConnectionError) as e:
+            print(f"⚠️ stream {self.index}: subscribe error:", e)
+
+    async def _ping(self):
+        while not self.ws.closed:
+            await asyncio.sleep(PING_INTERVAL)
+            await self.ws.send_str("ping")
+
+    def _handle(self, text):
+        if text == "pong":
+            return
+        message = json.loads(text)
+        arg = message.get('arg') or {}
+        if message.get('event') == "error":
+            print(f"⚠️ stream {self.index}: {message.get('msg')} {arg}")
+            return
+        data = message.get('data')
+        if not data or arg.get('channel') != CHANNEL:
+            return
+        self.stats.on_message(message.get('ts'))
+        candles = parse_candles(data)
+        self.stats.candles += len(candles)
+        self.on_candles(arg.get('instId'), candles)
+
+    async def _session(self, session):
+        async with session.ws_connect(self.url, receive_timeout=READ_TIMEOUT) as ws:
+            self.ws = ws
+            if self.connects:
+                self.stats.reconnects += 1
+            self.connects += 1
+            self.stats.connects += 1
+            self.failures = 0
+            if self.inst_ids:
+                # اتصال دوباره: همه‌ی کانال‌ها دوباره subscribe و فاصله‌ی قطعی backfill میشه
+                await self._send_subscribe("subscribe", self.inst_ids)
+                self._start_backfill(set(self.inst_ids))
+            pinger = asyncio.create_task(self._ping())
+            try:
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        try:
+                            self._handle(msg.data)
+                        except (ValueError, KeyError, IndexError, TypeError) as e:
+                            self.stats.errors += 1
+                            print(f"⚠️ stream {self.index}: bad message:", e)
+                    elif msg.type in (aiohttp.WSMsgType.ERROR, aiohttp.WSMsgType.CLOSED):
+                        break
+            finally:
+                pinger.cancel()
+                self.ws = None
+
+    async def run(self, session):
+        """اتصال + اتصال دوباره تا ابد"""
+        while True:
+            try:
+                await self._session(session)
+                print(f"🔌 stream {self.index}: disconnected")
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                print(f"⚠️ stream {self.index}: connection error:", e)
+            delay = RECONNECT_DELAYS[min(self.failures, len(RECONNECT_DELAYS) - 1)]
+            self.failures += 1
+            await asyncio.sleep(delay)
+
+
+class StreamIngestor:
+    """پخش نمادها روی اتصال‌ها، بافر کندل‌ها و پردازش با مسیر حلقه‌ی async"""
+
+    def __init__(self, exchange, session, url=WS_URL):
+        self.exchange = exchange
+        self.session = session
+        self.url = url
+        self.stats = StreamStats()
+        self.connections = []
+        self.tasks = []
+        self.symbols = {}      # {inst_id: (symbol_id, SYMBOL)}
+        self.assigned = {}     # {inst_id: connection}
+        self.pending = {}      # {symbol_id: {open_time: candle}} - کندل‌های ذخیره نشده
+        self.dirty = set()     # نمادهایی که از آخرین پردازش آپدیت گرفتن
+        self.live_rsi = {}     # {symbol_id: RSI درون‌حافظه‌ای 1m (موقت اگه کندل بازه)}
+        self.last_processed = {}
+        self.last_open_time = {}  # {symbol_id: open_time آخرین کندل 1m پردازش شده}
+        self.semaphore = asyncio.Semaphore(async_fetcher.MAX_CONCURRENT_REQUESTS)
+
+    def _new_connection(self):
+        connection = StreamConnection(len(self.connections), self.on_candles, self.backfill, self.url, self.stats)
+        self.connections.append(connection)
+        self.tasks.append(asyncio.create_task(connection.run(self.session)))
+        return connection
+
+    async def sync_symbols(self, symbols):
+        """هماهنگ کردن کانال‌ها با نمادهای فعال (نمادهای قبلی روی اتصال خودشون میمونن)"""
+        active = {inst_id(SYMBOL): (symbol_id, SYMBOL) for symbol_id, SYMBOL, base_symbol in symbols}
+        self.symbols = active
+        for i in list(self.assigned):
+            if i not in active:
+                del self.assigned[i]
+
+        counts = {connection: 0 for connection in self.connections}
+        for connection in self.assigned.values():
+            counts[connection] += 1
+        for i in active:
+            if i in self.assigned:
+                continue
+            connection = next((c for c in self.connections if counts[c] < SYMBOLS_PER_CONNECTION), None)
+            if connection is None:
+                connection = self._new_connection()
+                counts[connection] = 0
+            self.assigned[i] = connection
+            counts[connection] += 1
+
+        for connection in self.connections:
+            await connection.set_inst_ids({i for i, c in self.assigned.items() if c is connection})
+
+    def on_candles(self, inst, candles):
+        symbol = self.symbols.get(inst)
+        if symbol is None:
+            return
+        bars = self.pending.setdefault(symbol[0], {})
+        for candle in candles:
+            bars[candle[0]] = candle
+        self.dirty.add(symbol[0])
+
+    async def backfill(self, inst_ids):
+        """پر کردن فاصله‌ی قطعی با REST (همون run_due_jobs حلقه‌ی async)"""
+        if not STREAM_BACKFILL:
+            return
+        jobs = [
+            (self.symbols[i][0], self.symbols[i][1], list(main.TIMEFRAMES))
+            for i in inst_ids if i in self.symbols
+        ]
+        for i in range(0, len(jobs), BACKFILL_BATCH):
+            try:
+                await async_fetcher.run_due_jobs(self.exchange, self.semaphore, jobs[i:i + BACKFILL_BATCH])
+                self.stats.backfills += len(jobs[i:i + BACKFILL_BATCH])
+            except Exception as e:
+                print("⚠️ backfill error:", e)
+
+    def _resample_since(self, symbol_id, bars):
+        """
+        تایم‌فریم‌های resample شده فقط وقتی دوباره ساخته میشن که کندل 1m
+        بسته شده باشه: open_time جدیدترین کندل بعد از آخرین کندل پردازش
+        شده‌ی این نماده (اولین پردازش هم حساب میشه)
+        """
+        newest = bars[-1][0]
+        last_open_time = self.last_open_time.get(symbol_id)
+        if last_open_time is not None and newest <= last_open_time:
+            return {}
+        self.last_open_time[symbol_id] = newest
+        now_ms = self.exchange.milliseconds()  # ساعت صرافی (در replay مجازی)
+        resample_since = {}
+        for tf in resampler.RESAMPLED_TIMEFRAMES:
+            since = resampler.get_resample_since(main.cursor, symbol_id, tf, now_ms)
+            if since is not None:
+                resample_since[tf] = since
+        return resample_since
+
+    def save_due(self, symbol_id, bars, now):
+        """
+        آیا وقت ذخیره‌ست؟ مثل زمان‌بند polling: کندل 1m جدید (کندل قبلی بسته
+        شده) یا گذشتن فاصله‌ی refresh داخل کندل از آخرین ذخیره‌ی rsi_data
+        """
+        last_open_time = self.last_open_time.get(symbol_id)
+        if last_open_time is None or bars[-1][0] > last_open_time:
+            return True
+        last_save = main.last_save_index.get(symbol_id, STREAM_TIMEFRAME)
+        if last_save is None:
+            return True
+        job_scheduler = main.job_scheduler
+        return now >= job_scheduler.next_due(
+            STREAM_TIMEFRAME, last_save, job_scheduler.refresh_factor(symbol_id)
+        )
+
+    def update_live_rsi(self, symbol_id, bars):
+        """
+        فقط RSI درون‌حافظه‌ای (بدون نوشتن؛ روی persist_executor چون state های
+        RSI مال همون thread ـن). state خالی یا عقب افتاده رو مسیر ذخیره گرم میکنه
+        """
+        state = rsi_engine.get_state(main.cursor, symbol_id, STREAM_TIMEFRAME)
+        if state.needs_warmup(bars, STREAM_TIMEFRAME_MS):
+            return
+        rsi = state.apply_candles(bars, STREAM_TIMEFRAME_MS, self.exchange.milliseconds())
+        if rsi is not None:
+            self.live_rsi[symbol_id] = rsi
+
+    def persist_symbol(self, symbol_id, SYMBOL, bars):
+        """resample + ذخیره + امتیازدهی یک نماد (روی async_fetcher.persist_executor)"""
+        async_fetcher.process_symbol(
+            symbol_id, SYMBOL, {STREAM_TIMEFRAME: bars},
+            self._resample_since(symbol_id, bars), self.exchange.milliseconds()
+        )
+
+    async def process_pending(self):
+        now = time.time()
+        symbols_by_id = {symbol_id: SYMBOL for symbol_id, SYMBOL in self.symbols.values()}
+        for symbol_id in list(self.pending):
+            if now - self.last_processed.get(symbol_id, 0) < MIN_SYMBOL_INTERVAL:
+                continue
+            SYMBOL = symbols_by_id.get(symbol_id)
+            if SYMBOL is None:
+                self.pending.pop(symbol_id)
+                self.dirty.discard(symbol_id)
+                continue
+            candles = self.pending[symbol_id]
+            bars = [candles[t] for t in sorted(candles)]
+            save = self.save_due(symbol_id, bars, now)
+            if not save and symbol_id not in self.dirty:
+                continue
+            self.last_processed[symbol_id] = now
+            self.dirty.discard(symbol_id)
+            try:
+                # روی thread ذخیره: WebSocket ها در این مدت پیام میگیرن
+                if not save:
+                    await async_fetcher.run_persist(self.update_live_rsi, symbol_id, bars)
+                    self.stats.live_updates += 1
+                    continue
+                del self.pending[symbol_id]
+                await async_fetcher.run_persist(self.persist_symbol, symbol_id, SYMBOL, bars)
+                self.stats.processed += 1
+            except Exception as e:
+                self.stats.errors += 1
+                print("⚠️ Error:", e)
+
+    async def process_loop(self):
+        while True:
+            await asyncio.sleep(PROCESS_INTERVAL)
+            await self.process_pending()
+
+    def print_stats(self):
+        stats = self.stats.as_dict()
+        print(f"📡 stream : {len(self.symbols)} symbols on {len(self.connections)} connections "
+              f"| msg/s : {stats['messages_per_second']} | processed : {stats['processed']} "
+              f"| reconnects : {stats['reconnects']} | lag : {stats['last_lag']}s (max {stats['max_lag']}s) "
+              f"| db pending : {main.writer.stats()['pending']} --- now : {time.strftime('%H:%M:%S')}")
+        main.save_fetcher_status(extra={'stream': stats})
+
+
+async def run_stream_loop_async(url=WS_URL, get_symbols=None):
+    """حلقه‌ی اصلی حالت stream"""
+    if get_symbols is None:
+        get_symbols = main.get_active_symbols
+    exchange = async_fetcher.create_async_exchange()
+    main.load_last_save_index()
+    async with aiohttp.ClientSession() as session:
+        ingestor = StreamIngestor(exchange, session, url)
+        processor = asyncio.create_task(ingestor.process_loop())
+        print(f"📡 streaming {CHANNEL} from {url}")
+        try:
+            while True:
+                symbols = get_symbols()
+                main.screener.sync_symbols(symbols)
+                main.breakers.sync_symbols(symbols)
+                await ingestor.sync_symbols(symbols)
+                await asyncio.sleep(SYMBOL_SYNC_INTERVAL)
+                ingestor.print_stats()
+        finally:
+            processor.cancel()
+            for task in ingestor.tasks:
+                task.cancel()
+            await exchange.close()
+
+
+def run_stream_loop():
+    """نقطه‌ی ورود همزمان (برای thread در run.py)"""
+    asyncio.run(run_stream_loop_async())
+
+
+if __name__ == "__main__":
+    main.start_market_cache()
+    run_stream_loop()
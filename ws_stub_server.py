@@ -0,0 +1,170 @@
+"""
+سرور WebSocket محلی برای تست آفلاین ws_stream (همون پروتکل public v2 بیت‌گت)
+
+هر کانال subscribe شده هر UPDATE_INTERVAL ثانیه یک آپدیت کندل 1m با قیمت
+random walk میگیره. ping متنی جواب pong میگیره و با --drop اتصال‌ها هر
+چند ثانیه بسته میشن تا اتصال دوباره + subscribe دوباره تست بشه.
+
+اجرا:
+    python ws_stub_server.py serve [port] [interval] [drop_seconds]
+    python ws_stub_server.py bench [streams] [seconds] [interval] [drop_seconds]
+
+bench سرور رو داخل همین پردازه بالا میاره و [streams] کانال شبیه‌سازی شده رو
+با همون StreamConnection های ws_stream (بدون دیتابیس) subscribe میکنه و
+پیام در ثانیه، تاخیر و تعداد اتصال دوباره رو گزارش میده.
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+# فاصله‌ی آپدیت هر کانال (ثانیه)
+UPDATE_INTERVAL = 1.0
+MINUTE_MS = 60 * 1000
+
+
+class StubChannel:
+    """کندل در حال تشکیل یک نماد با قیمت random walk"""
+
+    def __init__(self, inst_id):
+        self.inst_id = inst_id
+        self.price = random.uniform(1, 1000)
+        self.open_time = None
+        self.candle = None
+
+    def tick(self, now_ms):
+        self.price *= 1 + random.gauss(0, 0.001)
+        open_time = now_ms - now_ms % MINUTE_MS
+        if open_time != self.open_time:
+            self.open_time = open_time
+            self.candle = [open_time, self.price, self.price, self.price, self.price, 0.0]
+        candle = self.candle
+        candle[2] = max(candle[2], self.price)
+        candle[3] = min(candle[3], self.price)
+        candle[4] = self.price
+        candle[5] += random.uniform(0, 10)
+        volume = candle[5]
+        return [str(candle[0])] + [f"{v:.6f}" for v in candle[1:5]] + [
+            f"{volume:.4f}", f"{volume * self.price:.4f}", f"{volume * self.price:.4f}"
+        ]
+
+
+async def handle_ws(request):
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+    app = request.app
+    app['connections'] += 1
+    channels = {}  # {instId: (arg, StubChannel)}
+
+    async def push():
+        while not ws.closed:
+            await asyncio.sleep(app['interval'])
+            now_ms = int(time.time() * 1000)
+            for arg, channel in list(channels.values()):
+                await ws.send_str(json.dumps({
+                    'action': 'update', 'arg': arg, 'data': [channel.tick(now_ms)], 'ts': now_ms,
+                }))
+                app['sent'] += 1
+
+    async def drop():
+        await asyncio.sleep(app['drop'])
+        await ws.close()
+
+    tasks = [asyncio.create_task(push())]
+    if app['drop']:
+        tasks.append(asyncio.create_task(drop()))
+    try:
+        async for msg in ws:
+            if msg.type != aiohttp.WSMsgType.TEXT:
+                continue
+            if msg.data == "ping":
+                await ws.send_str("pong")
+                continue
+            message = json.loads(msg.data)
+            for arg in message.get('args', []):
+                if message.get('op') == "subscribe":
+                    channels[arg['instId']] = (arg, StubChannel(arg['instId']))
+                elif message.get('op') == "unsubscribe":
+                    channels.pop(arg['instId'], None)
+                await ws.send_str(json.dumps({'event': message.get('op'), 'arg': arg}))
+    finally:
+        for task in tasks:
+            task.cancel()
+    return ws
+
+
+def create_app(interval=UPDATE_INTERVAL, drop=0):
+    app = web.Application()
+    app['interval'] = interval
+    app['drop'] = drop
+    app['connections'] = 0
+    app['sent'] = 0
+    app.router.add_get("/ws", handle_ws)
+    return app
+
+
+async def start_server(port=PORT, interval=UPDATE_INTERVAL, drop=0):
+    app = create_app(interval, drop)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, port).start()
+    return app, runner
+
+
+async def run_bench(streams=1000, seconds=30, interval=UPDATE_INTERVAL, drop=0, port=PORT):
+    """load test انتقال: streams کانال روی اتصال‌های ws_stream.StreamConnection"""
+    import ws_stream
+
+    app, runner = await start_server(port, interval, drop)
+    stats = ws_stream.StreamStats()
+    received = {}
+
+    def on_candles(inst, candles):
+        received[inst] = received.get(inst, 0) + 1
+
+    inst_ids = [f"SIM{i:05d}USDT" for i in range(streams)]
+    url = f"ws://{HOST}:{port}/ws"
+    async with aiohttp.ClientSession() as session:
+        connections = []
+        for index, start in enumerate(range(0, streams, ws_stream.SYMBOLS_PER_CONNECTION)):
+            connection = ws_stream.StreamConnection(index, on_candles, url=url, stats=stats)
+            await connection.set_inst_ids(inst_ids[start:start + ws_stream.SYMBOLS_PER_CONNECTION])
+            connections.append(connection)
+        tasks = [asyncio.create_task(c.run(session)) for c in connections]
+        await asyncio.sleep(seconds)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await runner.cleanup()
+
+    result = stats.as_dict()
+    result.update({
+        'streams': streams,
+        'connections': len(connections),
+        'streams_with_data': len(received),
+        'server_sent': app['sent'],
+    })
+    return result
+
+
+if __name__ == "__main__":
+    mode = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    args = [float(a) for a in sys.argv[2:]]
+    if mode == "bench":
+        streams, seconds, interval, drop = (args + [1000, 30, UPDATE_INTERVAL, 0][len(args):])[:4]
+        result = asyncio.run(run_bench(int(streams), seconds, interval, drop))
+        print("📈 websocket stream benchmark")
+        for key, value in result.items():
+            print(f"   {key:<20} {value}")
+    else:
+        port, interval, drop = (args + [PORT, UPDATE_INTERVAL, 0][len(args):])[:3]
+        print(f"🧪 stub websocket server on ws://{HOST}:{int(port)}/ws")
+        web.run_app(create_app(interval, drop), host=HOST, port=int(port), print=None)